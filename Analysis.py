@@ -2,12 +2,16 @@
 # -*- coding: utf-8 -*-
 # Add these imports at the top of your file
 from Bio.PDB import PDBParser, Selection
+import json
 import numpy as np
 import pandas as pd
+from scipy.spatial import KDTree
 from pathlib import Path
 from tqdm import tqdm
 import logging
 
+from ConSBind.output.store import load_results, parse_residues
+
 def pred_scores(prediction_file):
     predicted_residues = []
     scores = {
@@ -54,32 +58,254 @@ def pred_scores(prediction_file):
     
     return predicted_residues, scores
 
-def calculate_complexity(pdb_id, structure, structure_file, residue_map, known_residues):
+def load_store_predictions(store_file):
+    """
+    Load a consolidated results store (see ConSBind.output.store) in one read
+
+    Returns a dict mapping the lowercase structure id (e.g. 'pdb1dls') to the
+    list of its sites, each a dict with the site scores, methods, center, size
+    and residue list, so per-site structure is preserved.
+    """
+    sites, _ = load_results(store_file)
+    predictions = {}
+    for i in range(len(sites['pdb_id'])):
+        predictions.setdefault(str(sites['pdb_id'][i]).lower(), []).append({
+            'site': int(sites['site'][i]),
+            'methods': str(sites['methods'][i]).split(','),
+            'consensus_score': float(sites['consensus_score'][i]),
+            'binding_potential_score': float(sites['final_score'][i]),
+            'druggability_score': float(sites['druggability'][i]),
+            'knowledge_based_score': float(sites['knowledge_score'][i]),
+            'size': int(sites['size'][i]),
+            'center': np.array([sites['center_x'][i], sites['center_y'][i], sites['center_z'][i]]),
+            'residues': parse_residues(sites['residues'][i])
+        })
+    return predictions
+
+def store_scores(sites):
+    """
+    Same output as pred_scores, built from the sites of one structure in a
+    results store: residues merged over all sites and, like the text parser,
+    the scores of the last site listed
+    """
+    predicted_residues = [(chain, res_id) for site in sites for chain, res_id, _ in site['residues']]
+    last = sites[-1] if sites else {}
+    scores = {key: last.get(key) for key in ['consensus_score', 'binding_potential_score',
+                                             'druggability_score', 'knowledge_based_score']}
+    return predicted_residues, scores
+
+# Voxel offsets within the approximate van der Waals radius (1.5 grid units)
+# added around every binding site atom
+VDW_RADIUS_VOXELS = 1.5
+_r = int(VDW_RADIUS_VOXELS)
+_offsets = np.stack(np.meshgrid(*[np.arange(-_r, _r + 1)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+DILATION_OFFSETS = _offsets[np.sum(_offsets ** 2, axis=1) <= VDW_RADIUS_VOXELS ** 2]
+
+def voxel_keys(coord_sets, grid_spacing=1.0):
+    """
+    Dilated voxel sets of several atom coordinate arrays as sorted int64 keys
+
+    Every atom occupies the voxel nearest to it plus the DILATION_OFFSETS
+    around it. Voxel indices are packed into single integers on a grid
+    shared by all sets, so keys of different sets can be compared directly.
+    """
+    voxels = [np.round(np.asarray(coords) / grid_spacing).astype(np.int64) for coords in coord_sets]
+    origin = np.min([v.min(axis=0) for v in voxels], axis=0) - _r
+    dims = np.max([v.max(axis=0) for v in voxels], axis=0) + _r - origin + 1
+    
+    keys = []
+    for v in voxels:
+        dilated = (v[:, np.newaxis, :] + DILATION_OFFSETS - origin).reshape(-1, 3)
+        keys.append(np.unique((dilated[:, 0] * dims[1] + dilated[:, 1]) * dims[2] + dilated[:, 2]))
+    return keys
+
+# Standard amino acids
+STANDARD_AA_NAMES = {"ALA", "CYS", "ASP", "GLU", "PHE", "GLY", "HIS", "ILE",
+                       "LYS", "LEU", "MET", "ASN", "PRO", "GLN", "ARG",
+                       "SER", "THR", "VAL", "TRP", "TYR"}
+
+def structure_arrays(structure):
+    """
+    Flatten a parsed structure into atom and residue arrays in one walk
+    
+    Returns a dict with per-atom 'coords', 'atom_names' and 'bfactors',
+    per-residue 'resnames', the number of chains and a KDTree over all atoms.
+    """
+    coords, atom_names, bfactors, resnames = [], [], [], []
+    chain_count = 0
+    for model in structure:
+        for chain in model:
+            chain_count += 1
+            for residue in chain:
+                resnames.append(residue.get_resname())
+                for atom in residue:
+                    coords.append(atom.get_coord())
+                    atom_names.append(atom.get_name())
+                    bfactors.append(atom.get_bfactor())
+    
+    coords = np.array(coords, dtype=float).reshape(-1, 3)
+    return {
+        'coords': coords,
+        'atom_names': np.array(atom_names, dtype=str),
+        'bfactors': np.array(bfactors, dtype=float),
+        'resnames': np.array(resnames, dtype=str),
+        'chain_count': chain_count,
+        'atom_tree': KDTree(coords)
+    }
+
+# Hetero groups that never define a binding site: waters, common ions,
+# crystallization buffers and additives, and modified polymer residues
+EXCLUDED_HETERO = {
+    # Waters
+    'HOH', 'WAT', 'TIP', 'TIP3', 'SOL', 'DOD', 'H2O',
+    # Ions
+    'NA', 'K', 'LI', 'CS', 'MG', 'CA', 'SR', 'BA', 'MN', 'FE', 'FE2', 'CO', 'NI', 'CU', 'CU1',
+    'ZN', 'CD', 'HG', 'CL', 'BR', 'IOD', 'F', 'NH4', 'SO4', 'PO4', 'NO3', 'SCN', 'AZI',
+    # Buffers, cryoprotectants and additives
+    'GOL', 'EDO', 'PEG', 'PGE', 'PG4', '1PE', 'P6G', 'MPD', 'DMS', 'ACT', 'ACY', 'FMT', 'TRS',
+    'EPE', 'MES', 'BME', 'IMD', 'IPA', 'EOH', 'MOH', 'BU3', 'NHE', 'CXS', 'BTB', 'TAR', 'MLI',
+    # Modified residues and polymer caps
+    'MSE', 'SEP', 'TPO', 'PTR', 'CSO', 'CME', 'HYP', 'PCA', 'ACE', 'NH2'
+}
+
+def extract_binding_sites(structure_file, cutoff=4.0, ligand_names=None, cache_dir=None):
+    """
+    Ground truth binding site residues derived from the ligands of a holo structure
+    
+    Ligands are the hetero groups of the first model that are not in
+    EXCLUDED_HETERO. If ligand_names is given and any of those are present,
+    only they are used (they may include ions such as ZN). Binding residues
+    are the standard amino acids with any atom closer than cutoff to a
+    ligand atom, found with one KDTree query over all protein atoms.
+    
+    This deliberately differs from the notebook's extraction, which falls
+    back to every non-water hetero group: excluded groups (ions, buffers)
+    are never ligands here. On the bundled structures this only changes
+    1RNM, whose SO4 ions the notebook counts (15 residues instead of 9).
+    
+    With cache_dir, the result is cached per structure as JSON and reused
+    while the file, cutoff and ligand names are unchanged.
+    
+    Returns a list of (chain, residue number) tuples.
+    """
+    structure_file = Path(structure_file)
+    ligand_names = sorted(ligand_names) if ligand_names else None
+    stat = structure_file.stat()
+    cache_key = {'size': stat.st_size, 'mtime': stat.st_mtime, 'cutoff': cutoff, 'ligand_names': ligand_names}
+    
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = Path(cache_dir) / f"{structure_file.stem}_ground_truth.json"
+        if cache_file.exists():
+            with open(cache_file, 'r') as f:
+                cached = json.load(f)
+            if cached.get('key') == cache_key:
+                return [tuple(residue) for residue in cached['residues']]
+    
+    parser = PDBParser(QUIET=True)
+    model = parser.get_structure(structure_file.stem, structure_file)[0]
+    
+    # Flatten the model into protein atom and hetero group atom arrays
+    protein_coords, protein_residue, residue_ids = [], [], []
+    hetero_groups = {}
+    for chain in model:
+        for residue in chain:
+            res_name = residue.get_resname().strip()
+            if res_name in STANDARD_AA_NAMES:
+                protein_residue.extend([len(residue_ids)] * len(residue))
+                protein_coords.extend(atom.get_coord() for atom in residue)
+                residue_ids.append((chain.id, residue.get_id()[1]))
+            elif residue.get_id()[0].startswith('H_'):
+                hetero_groups.setdefault(res_name, []).extend(atom.get_coord() for atom in residue)
+    
+    # Named ligands take precedence, otherwise every group that is not excluded
+    ligand_coords = [coord for name in (ligand_names or []) for coord in hetero_groups.get(name, [])]
+    if not ligand_coords:
+        ligand_coords = [coord for name, coords in hetero_groups.items()
+                         if name not in EXCLUDED_HETERO for coord in coords]
+    
+    residues = []
+    if ligand_coords and protein_coords:
+        distances, _ = KDTree(np.array(ligand_coords, dtype=float)).query(
+            np.array(protein_coords, dtype=float), distance_upper_bound=cutoff
+        )
+        contact_residues = np.unique(np.array(protein_residue)[distances < cutoff])
+        residues = [residue_ids[i] for i in contact_residues]
+    else:
+        logger.warning(f"No ligands found in {structure_file.name}")
+    
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'w') as f:
+            json.dump({'key': cache_key, 'residues': residues}, f)
+    
+    return residues
+
+def _extract_task(task):
+    """Top-level wrapper of extract_binding_sites for worker processes"""
+    pdb_id, structure_file, cutoff, ligand_names, cache_dir = task
+    try:
+        return pdb_id, extract_binding_sites(structure_file, cutoff, ligand_names, cache_dir)
+    except Exception as e:
+        logger.error(f"Error extracting binding sites for {pdb_id}: {e}")
+        return pdb_id, []
+
+def build_known_binding_sites(structure_files=None, cutoff=4.0, ligand_names=None,
+                              cache_dir='results/analysis/ground_truth', n_workers=1):
+    """
+    Ligand-derived ground truth for many structures, usable as KNOWN_BINDING_SITES
+    
+    structure_files maps protein ids to structure files and defaults to all
+    proteins of PROTEIN_CLASSES under base_dir. Structures are processed
+    across a process pool when n_workers > 1 (or None for all cores).
+    
+    Returns a dict mapping protein id to its list of (chain, residue number).
+    """
+    if structure_files is None:
+        structure_files = {pdb_id: structure_path(protein_class, pdb_id)
+                           for protein_class, proteins in PROTEIN_CLASSES.items() for pdb_id in proteins}
+    
+    tasks = [(pdb_id, structure_file, cutoff, ligand_names, cache_dir)
+             for pdb_id, structure_file in structure_files.items() if Path(structure_file).exists()]
+    
+    if n_workers is None or n_workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        injected = {name: globals()[name] for name in INJECTED_GLOBALS if name in globals()}
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(injected,)) as executor:
+            extracted = list(tqdm(executor.map(_extract_task, tasks, chunksize=16), total=len(tasks),
+                                  desc="Extracting binding sites"))
+    else:
+        extracted = [_extract_task(task) for task in tqdm(tasks, desc="Extracting binding sites")]
+    
+    return {pdb_id: residues for pdb_id, residues in extracted if residues}
+
+def calculate_complexity(pdb_id, structure, structure_file, residue_map, known_residues, arrays=None):
+    """
+    Protein complexity score (0-10) from size, chain count, CA B-factor spread
+    and binding site burial
+    
+    arrays (from structure_arrays) are built from structure if not given.
+    """
     complexity_score = 0.0
     
     try:
+        if arrays is None:
+            arrays = structure_arrays(structure)
+        
         # 1. Size complexity - larger proteins are more complex
-        all_residues = Selection.unfold_entities(structure, 'R')
-        standard_aa_names = set(["ALA", "CYS", "ASP", "GLU", "PHE", "GLY", "HIS", "ILE", 
-                                "LYS", "LEU", "MET", "ASN", "PRO", "GLN", "ARG", 
-                                "SER", "THR", "VAL", "TRP", "TYR"])
-        residue_count = len([r for r in all_residues if r.get_resname() in standard_aa_names])
+        residue_count = int(np.isin(arrays['resnames'], list(STANDARD_AA_NAMES)).sum())
         size_factor = min(1.0, residue_count / 500)  # Normalize by 500 residues
         complexity_score += 0.25 * size_factor
         
         # 2. Domain complexity - multi-domain proteins are more complex
-        chains = list(structure.get_chains())
-        chain_count = len(chains)
+        chain_count = arrays['chain_count']
         chain_factor = min(1.0, chain_count / 4)  # Normalize by 4 chains
         complexity_score += 0.25 * chain_factor
         
         # 3. Structural complexity based on B-factors (indicates flexibility)
-        b_factors = []
-        for atom in structure.get_atoms():
-            if atom.get_name() == 'CA':  # Only alpha carbons
-                b_factors.append(atom.get_bfactor())
+        b_factors = arrays['bfactors'][arrays['atom_names'] == 'CA']  # Only alpha carbons
         
-        if b_factors:
+        if len(b_factors) > 0:
             # Higher B-factor variance indicates more complex/flexible structure
             b_factor_std = np.std(b_factors)
             b_factor_complexity = min(1.0, b_factor_std / 30)  # Normalize
@@ -88,32 +314,20 @@ def calculate_complexity(pdb_id, structure, structure_file, residue_map, known_r
         # 4. Binding site complexity
         # Calculate how buried or surface-exposed the binding site is
         if known_residues:
-            # Get all atoms in the structure for distance calculations
-            all_atoms = list(structure.get_atoms())
-            all_coords = np.array([atom.get_coord() for atom in all_atoms])
-            
             # Get binding site residue atoms
-            binding_site_atoms = []
-            for chain, res_id in known_residues:
-                if (chain, res_id) in residue_map:
-                    binding_site_atoms.extend(list(residue_map[(chain, res_id)].get_atoms()))
+            binding_site_coords = [atom.get_coord()
+                                   for chain, res_id in known_residues if (chain, res_id) in residue_map
+                                   for atom in residue_map[(chain, res_id)].get_atoms()]
             
-            if binding_site_atoms:
-                # Calculate how buried each binding site atom is
-                buried_scores = []
-                for bs_atom in binding_site_atoms:
-                    bs_coord = bs_atom.get_coord()
-                    
-                    # Count how many atoms are within 10Å
-                    distances = np.linalg.norm(all_coords - bs_coord, axis=1)
-                    nearby_atoms = sum(distances < 10.0)
-                    
-                    # Normalize by a typical fully buried value
-                    buried_score = min(1.0, nearby_atoms / 300)
-                    buried_scores.append(buried_score)
+            if binding_site_coords:
+                # Count the atoms strictly within 10A of every binding site atom in one batched query
+                nearby_atoms = arrays['atom_tree'].query_ball_point(
+                    np.array(binding_site_coords, dtype=float), np.nextafter(10.0, 0), return_length=True
+                )
                 
-                # Average burial score for binding site
-                avg_burial = np.mean(buried_scores) if buried_scores else 0.0
+                # Normalize by a typical fully buried value and average over the binding site
+                buried_scores = np.minimum(1.0, nearby_atoms / 300)
+                avg_burial = np.mean(buried_scores)
                 complexity_score += 0.25 * avg_burial
         
         # Normalize to 0-10 scale
@@ -125,9 +339,45 @@ def calculate_complexity(pdb_id, structure, structure_file, residue_map, known_r
     
     return complexity_score
     
-def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues, prediction_scores):
+def structure_path(protein_class, pdb_id):
+    """Path of the structure file of a protein (downloaded files may use a lowercase id)"""
+    structure_file = base_dir / protein_class / f"pdb{pdb_id}.ent"
+    if not structure_file.exists():
+        lowercase_file = base_dir / protein_class / f"pdb{pdb_id.lower()}.ent"
+        if lowercase_file.exists():
+            return lowercase_file
+    return structure_file
+
+def load_structure_data(pdb_id, structure_file):
+    """
+    Parse a structure once and build the lookups shared by all metric functions
+    
+    The relative ASA of the residues is computed here too (DSSP runs once per
+    structure); it is empty if DSSP is not available.
+    """
+    parser = PDBParser(QUIET=True)
+    structure = parser.get_structure(pdb_id, structure_file)
+    
+    # Map residue IDs to actual residue objects
+    residue_map = {}
+    for residue in Selection.unfold_entities(structure, 'R'):
+        if residue.get_resname() in standard_aa_names:  # Only consider standard amino acids
+            chain_id = residue.get_parent().id
+            res_id = residue.get_id()[1]
+            residue_map[(chain_id, res_id)] = residue
+    
+    rel_asa = ProteinStructure(str(structure_file), structure=structure).rel_asa or {}
+    
+    return {'structure': structure, 'structure_file': structure_file, 'residue_map': residue_map,
+            'arrays': structure_arrays(structure), 'rel_asa': rel_asa}
+
+def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues, prediction_scores, structure_data=None,
+                      structure_file=None):
     """
     Calculate performance metrics for a single protein
+    
+    structure_data (from load_structure_data) is parsed here if not given,
+    from structure_file or the protein's file under base_dir.
     """
     # Convert residues to sets for easier comparison
     known_set = set((chain, res_id) for chain, res_id in known_residues)
@@ -143,7 +393,7 @@ def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues,
     f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
     
     # Load structure to calculate spatial metrics
-    structure_file = base_dir / protein_class / f"pdb{pdb_id}.ent"
+    structure_file = Path(structure_file) if structure_file is not None else structure_path(protein_class, pdb_id)
     
     # Initialize values for metrics that require structure analysis
     spatial_overlap = None
@@ -153,24 +403,18 @@ def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues,
     pocket_polarity = None
     complexity_score = None
     
-    if structure_file.exists():
+    if structure_data is not None or structure_file.exists():
         # Calculate spatial metrics using the structure
         try:
-            parser = PDBParser(QUIET=True)
-            structure = parser.get_structure(pdb_id, structure_file)
+            if structure_data is None:
+                structure_data = load_structure_data(pdb_id, structure_file)
+            structure = structure_data['structure']
+            structure_file = structure_data['structure_file']
+            residue_map = structure_data['residue_map']
             
             # Get atoms for known and predicted binding sites
             known_atoms = []
             predicted_atoms = []
-            all_residues = Selection.unfold_entities(structure, 'R')
-            
-            # Map residue IDs to actual residue objects
-            residue_map = {}
-            for residue in all_residues:
-                if residue.get_resname() in standard_aa_names:  # Only consider standard amino acids
-                    chain_id = residue.get_parent().id
-                    res_id = residue.get_id()[1]
-                    residue_map[(chain_id, res_id)] = residue
             
             # Get atoms for known binding site residues
             for res_id in known_residues:
@@ -188,49 +432,21 @@ def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues,
             
             if len(known_atoms) > 0 and len(predicted_atoms) > 0:
                 # 1. Calculate spatial overlap (Jaccard index in 3D space)
-                # Create a grid representation of the binding sites
+                # Represent each binding site by the packed keys of its dilated voxels
                 grid_spacing = 1.0  # Angstroms
-                known_grid = set()
-                predicted_grid = set()
-                
-                # Define a grid around each atom
-                for atom in known_atoms:
-                    coord = atom.get_coord()
-                    grid_point = tuple(np.round(coord / grid_spacing).astype(int))
-                    known_grid.add(grid_point)
-                    
-                    # Add neighboring grid points within van der Waals radius
-                    radius = 1.5  # Approximate vdW radius in grid units
-                    for dx in range(-int(radius), int(radius)+1):
-                        for dy in range(-int(radius), int(radius)+1):
-                            for dz in range(-int(radius), int(radius)+1):
-                                if dx*dx + dy*dy + dz*dz <= radius*radius:
-                                    known_grid.add((grid_point[0]+dx, grid_point[1]+dy, grid_point[2]+dz))
-                
-                for atom in predicted_atoms:
-                    coord = atom.get_coord()
-                    grid_point = tuple(np.round(coord / grid_spacing).astype(int))
-                    predicted_grid.add(grid_point)
-                    
-                    # Add neighboring grid points within van der Waals radius
-                    radius = 1.5  # Approximate vdW radius in grid units
-                    for dx in range(-int(radius), int(radius)+1):
-                        for dy in range(-int(radius), int(radius)+1):
-                            for dz in range(-int(radius), int(radius)+1):
-                                if dx*dx + dy*dy + dz*dz <= radius*radius:
-                                    predicted_grid.add((grid_point[0]+dx, grid_point[1]+dy, grid_point[2]+dz))
+                known_coords = np.array([atom.get_coord() for atom in known_atoms])
+                predicted_coords = np.array([atom.get_coord() for atom in predicted_atoms])
+                known_grid, predicted_grid = voxel_keys([known_coords, predicted_coords], grid_spacing)
 
-                
-                complexity_score = calculate_complexity(pdb_id, structure, structure_file, residue_map, known_residues)
+                complexity_score = calculate_complexity(pdb_id, structure, structure_file, residue_map, known_residues,
+                                                        arrays=structure_data.get('arrays'))
 
                 # Calculate Jaccard index (intersection over union)
-                intersection = len(known_grid.intersection(predicted_grid))
-                union = len(known_grid.union(predicted_grid))
+                intersection = len(np.intersect1d(known_grid, predicted_grid, assume_unique=True))
+                union = len(known_grid) + len(predicted_grid) - intersection
                 spatial_overlap = intersection / union if union > 0 else 0.0
                 
                 # Calculate center distance
-                known_coords = np.array([atom.get_coord() for atom in known_atoms])
-                predicted_coords = np.array([atom.get_coord() for atom in predicted_atoms])
                 known_center = np.mean(known_coords, axis=0)
                 predicted_center = np.mean(predicted_coords, axis=0)
                 center_distance = np.linalg.norm(known_center - predicted_center)
@@ -240,14 +456,13 @@ def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues,
                 predicted_volume = len(predicted_grid) * (grid_spacing ** 3)
                 volume_similarity = min(known_volume, predicted_volume) / max(known_volume, predicted_volume)
                 
-                # Calculate pocket depth
-                structure_file = str(convert_ent_to_pdb(structure_file))
-                protein = ProteinStructure(str(structure_file))
+                # Calculate pocket depth (reusing the parsed structure and its surface areas)
+                protein = ProteinStructure(str(structure_file), structure=structure,
+                                           rel_asa=structure_data['rel_asa'])
                 surface_atoms = protein.get_surface_atoms()
                 surface_coords = np.array([atom.get_coord() for atom in surface_atoms])
                 if len(surface_coords) > 0:
-                    distances = np.linalg.norm(surface_coords[:, np.newaxis] - predicted_center, axis=2)
-                    pocket_depth = np.min(distances)
+                    pocket_depth = KDTree(surface_coords).query(predicted_center)[0]
                 
                 # Calculate pocket polarity
                 polar_atoms = ['N', 'O', 'S']
@@ -273,48 +488,126 @@ def calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues,
         'knowledge_based_score': prediction_scores['knowledge_based_score']
     }
 
-def evaluate_predictions():
+def index_prediction_files(results_dir):
+    """
+    Index all prediction files under results_dir in one directory walk
+    
+    Returns a dict mapping the lowercase structure id (e.g. 'pdb1dls') to its
+    _predictions.txt file.
+    """
+    index = {}
+    for prediction_file in sorted(Path(results_dir).rglob('*_predictions.txt')):
+        index.setdefault(prediction_file.name[:-len('_predictions.txt')].lower(), prediction_file)
+    return index
+
+# Globals injected into this module by the notebook, forwarded to worker processes
+INJECTED_GLOBALS = ['base_dir', 'standard_aa_names', 'ProteinStructure', 'convert_ent_to_pdb', 'logger']
 
-    results = []
+def _init_worker(injected):
+    """Process pool initializer: restore the injected module globals in the worker"""
+    globals().update(injected)
+
+def evaluate_protein(task):
+    """
+    Evaluate a single protein; top-level so it can run in a worker process
     
-    for protein_class, proteins in PROTEIN_CLASSES.items():
-        logger.info(f"Evaluating {len(proteins)} proteins for class: {protein_class}")
-        
-        for pdb_id in tqdm(proteins.keys(), desc=f"Evaluating {protein_class}"):
-            # Find prediction results
-            results_dir = Path('results/analysis')
-            if not results_dir.exists():
-                logger.warning(f"Results directory not found: {results_dir}")
+    task: (protein_class, pdb_id, description, structure_file, known_residues, predicted_residues,
+           prediction_scores)
+    """
+    protein_class, pdb_id, description, structure_file, known_residues, predicted_residues, prediction_scores = task
+    
+    # Parse the structure once and share it between all metric functions
+    structure_data = None
+    structure_file = Path(structure_file)
+    if structure_file.exists():
+        try:
+            structure_data = load_structure_data(pdb_id, structure_file)
+        except Exception as e:
+            logger.error(f"Error parsing structure for {pdb_id}: {e}")
+    
+    metrics = calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues,
+                                prediction_scores, structure_data=structure_data, structure_file=structure_file)
+    return {
+        'pdb_id': pdb_id,
+        'protein_class': protein_class,
+        'protein_description': description,
+        **metrics
+    }
+
+def evaluate_predictions(store_file=None, n_workers=1, known_sites=None, structure_files=None, ligand_names=None):
+    """
+    Evaluate the predictions of a set of structures against their known binding sites
+    
+    structure_files maps protein ids to structure files and defaults to all
+    proteins of PROTEIN_CLASSES under base_dir; predictions are looked up by
+    the file name. known_sites maps protein ids to known (chain, residue
+    number) pairs and defaults to the ground truth derived from the ligands
+    of the structures (build_known_binding_sites, restricted to ligand_names
+    if given). Proteins outside PROTEIN_CLASSES have no class or description.
+    
+    Returns a DataFrame with one row of metrics per evaluated protein.
+    """
+    # Class and description of the proteins the notebook defines
+    protein_info = {pdb_id: (protein_class, description)
+                    for protein_class, proteins in globals().get('PROTEIN_CLASSES', {}).items()
+                    for pdb_id, description in proteins.items()}
+    if structure_files is None:
+        structure_files = {pdb_id: structure_path(protein_class, pdb_id)
+                           for pdb_id, (protein_class, _) in protein_info.items()}
+    
+    if known_sites is None:
+        known_sites = build_known_binding_sites(structure_files, ligand_names=ligand_names, n_workers=n_workers)
+    
+    # A consolidated results store replaces the per-structure prediction files
+    store_predictions = load_store_predictions(store_file) if store_file is not None else None
+    
+    # Otherwise index the prediction files once instead of globbing per protein
+    prediction_index = None
+    if store_predictions is None:
+        results_dir = Path('results/analysis')
+        if not results_dir.exists():
+            logger.warning(f"Results directory not found: {results_dir}")
+            return pd.DataFrame([])
+        prediction_index = index_prediction_files(results_dir)
+    
+    logger.info(f"Collecting {len(structure_files)} proteins")
+    tasks = []
+    for pdb_id, structure_file in structure_files.items():
+        structure_id = Path(structure_file).stem.lower()
+        if store_predictions is not None:
+            sites = store_predictions.get(structure_id)
+            if not sites:
+                logger.warning(f"No predictions found in results store for {pdb_id}")
                 continue
-            
-            # Look for prediction files
-            prediction_files = list(results_dir.glob(f"**/pdb{pdb_id}_predictions.txt"))
-            if not prediction_files:
+            predicted_residues, prediction_scores = store_scores(sites)
+        else:
+            prediction_file = prediction_index.get(structure_id)
+            if prediction_file is None:
                 logger.warning(f"No prediction file found for {pdb_id}")
                 continue
             
-            prediction_file = prediction_files[0]
-            
             # Parse prediction file to get predicted binding sites and scores
             predicted_residues, prediction_scores = pred_scores(prediction_file)
-            
-            # Get known binding site residues
-            known_residues = KNOWN_BINDING_SITES.get(pdb_id, [])
-            
-            if not known_residues:
-                logger.warning(f"No known binding site residues for {pdb_id}")
-                continue
-            
-            # Calculate metrics
-            metrics = calculate_metrics(protein_class, pdb_id, known_residues, predicted_residues, prediction_scores)
-            
-            # Add to results
-            results.append({
-                'pdb_id': pdb_id,
-                'protein_class': protein_class,
-                'protein_description': proteins[pdb_id],
-                **metrics
-            })
+        
+        # Get known binding site residues
+        known_residues = known_sites.get(pdb_id, [])
+        
+        if not known_residues:
+            logger.warning(f"No known binding site residues for {pdb_id}")
+            continue
+        
+        protein_class, description = protein_info.get(pdb_id, (None, None))
+        tasks.append((protein_class, pdb_id, description, str(structure_file), known_residues,
+                      predicted_residues, prediction_scores))
+    
+    # Calculate metrics, across a process pool if requested
+    if n_workers is None or n_workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        injected = {name: globals()[name] for name in INJECTED_GLOBALS if name in globals()}
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(injected,)) as executor:
+            results = list(tqdm(executor.map(evaluate_protein, tasks), total=len(tasks), desc="Evaluating"))
+    else:
+        results = [evaluate_protein(task) for task in tqdm(tasks, desc="Evaluating")]
     
     # Create results dataframe
     results_df = pd.DataFrame(results)
@@ -323,5 +616,5 @@ def evaluate_predictions():
 
 class Analysis:
     @staticmethod
-    def evaluate_predictions():
-        return evaluate_predictions()
\ No newline at end of file
+    def evaluate_predictions(store_file=None, n_workers=1, known_sites=None, structure_files=None, ligand_names=None):
+        return evaluate_predictions(store_file, n_workers, known_sites, structure_files, ligand_names)
\ No newline at end of file
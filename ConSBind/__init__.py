@@ -7,4 +7,9 @@ of geometric and energy-based approaches.
 """
 
 __version__ = '1.0.0'
-__author__ = 'Noelia Gil, Xavier Vílchez, Clàudia Vicente' 
\ No newline at end of file
+__author__ = 'Noelia Gil, Xavier Vílchez, Clàudia Vicente' 
+
+from ConSBind.core.pocket import Pocket
+from ConSBind.api import predict, predict_iter, PocketResult, PredictionParams, OutputOptions
+
+__all__ = ['predict', 'predict_iter', 'PocketResult', 'PredictionParams', 'OutputOptions', 'Pocket']
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Library API Module
+==================
+This module exposes the prediction pipeline as plain functions that return
+typed results, without progress bars, terminal formatting or mandatory
+file writes, so ConSBind can be embedded in a long-running interpreter.
+
+Example:
+    >>> from ConSBind import predict, PredictionParams
+    >>> result = predict('protein.pdb', PredictionParams(protein_type='enzyme'))
+    >>> for site in result.sites:
+    ...     print(site['rank'], site['final_score'], site['residues'])
+"""
+
+import os
+import time
+import logging
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+class PredictionParams(NamedTuple):
+    """Parameters of a binding site prediction (defaults match the command line)"""
+    probe_radius: float = 1.4
+    grid_spacing: float = 1.0
+    min_size: int = 5
+    protein_type: str = 'unknown'
+    cavity_search: str = 'uniform'
+    chains: Optional[str] = None
+    around: Optional[str] = None
+    radius: float = 8.0
+    interface: Optional[str] = None
+    tile_size: Optional[float] = None
+    tile_overlap: float = 8.0
+
+    @classmethod
+    def from_args(cls, args):
+        """Build parameters from an argparse.Namespace with the command line options"""
+        return cls(**{field: getattr(args, field) for field in cls._fields if hasattr(args, field)})
+
+# Output files write_outputs can produce, in writing order
+OUTPUT_KINDS = ('table', 'pdb', 'pymol', 'chimera')
+
+class OutputOptions(NamedTuple):
+    """Which prediction files to write and how (defaults match the command line)"""
+    outputs: tuple = ('table', 'pdb')
+    sidecar: bool = False
+    compress: bool = False
+
+    @staticmethod
+    def parse_outputs(text):
+        """Parse a comma-separated output selection, e.g. 'table,pymol'"""
+        outputs = tuple(kind.strip() for kind in text.split(',') if kind.strip())
+        unknown = [kind for kind in outputs if kind not in OUTPUT_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown output(s): {', '.join(unknown)} (choose from {', '.join(OUTPUT_KINDS)})")
+        return outputs
+
+    @classmethod
+    def from_args(cls, args):
+        """Build options from an argparse.Namespace with the --outputs, --sidecar and --gzip options"""
+        outputs = getattr(args, 'outputs', None)
+        return cls(outputs=cls.parse_outputs(outputs) if isinstance(outputs, str) else (outputs or cls().outputs),
+                   sidecar=getattr(args, 'sidecar', False), compress=getattr(args, 'gzip', False))
+
+    def kinds(self, generate_pymol=False, generate_chimera=False):
+        """
+        Output kinds to write, in writing order
+
+        generate_pymol and generate_chimera add the visualization scripts; a
+        PyMOL script also needs the PDB output (full or sidecar) it loads.
+        """
+        selected = set(self.outputs)
+        if generate_pymol:
+            selected.add('pymol')
+        if generate_chimera:
+            selected.add('chimera')
+        if 'pymol' in selected:
+            selected.add('pdb')
+        return [kind for kind in OUTPUT_KINDS if kind in selected]
+
+class PocketResult:
+    """Typed result of a binding site prediction for one structure"""
+
+    def __init__(self, pdb_id, pockets, protein=None, output_files=None, timings=None):
+        """
+        Parameters:
+        -----------
+        pdb_id : str
+            Identifier of the structure (file basename without extension)
+        pockets : list
+            Scored and filtered pockets, best first
+        protein : ProteinStructure, optional
+            Structure the pockets were predicted on
+        output_files : dict, optional
+            Output kind ('predictions', 'pdb', 'pymol', 'chimera') -> written path
+        timings : dict, optional
+            Stage name -> duration in seconds
+        """
+        self.pdb_id = pdb_id
+        self.pockets = pockets
+        self.protein = protein
+        self.output_files = output_files or {}
+        self.timings = timings or {}
+        self._sites = None
+
+    def __len__(self):
+        return len(self.pockets)
+
+    def __iter__(self):
+        return iter(self.sites)
+
+    def __repr__(self):
+        return f"PocketResult(pdb_id={self.pdb_id!r}, sites={len(self.pockets)})"
+
+    @property
+    def sites(self):
+        """List of JSON-serialisable site dictionaries, ranked best first"""
+        if self._sites is None:
+            self._sites = []
+            pocket_residues = self.protein.get_pockets_residues(self.pockets) if self.protein is not None \
+                else [[] for _ in self.pockets]
+            for rank, (pocket, residues) in enumerate(zip(self.pockets, pocket_residues), 1):
+                self._sites.append({
+                    'rank': rank,
+                    'methods': list(pocket['methods']),
+                    'consensus_score': float(pocket['consensus_score']),
+                    'final_score': float(pocket['final_score']),
+                    'druggability': float(pocket['druggability']) if 'druggability' in pocket else None,
+                    'knowledge_score': float(pocket['knowledge_score']) if 'knowledge_score' in pocket else None,
+                    'size': int(pocket['size']),
+                    'center': [float(c) for c in pocket['center']],
+                    'residues': [[chain, int(resid), resname] for chain, resid, resname in residues]
+                })
+        return self._sites
+
+    @property
+    def descriptors(self):
+        """Descriptor matrix of the sites, one row per site in rank order (see ConSBind.core.descriptors)"""
+        from ConSBind.core.descriptors import PocketDescriptors
+        return PocketDescriptors.from_pockets(self.pockets)
+
+    def to_dict(self):
+        """Return the result as a JSON-serialisable dictionary"""
+        return {
+            'pdb_id': self.pdb_id,
+            'sites': self.sites,
+            'output_files': {kind: str(path) for kind, path in self.output_files.items()},
+            'timings': self.timings
+        }
+
+def complete_pockets(pockets):
+    """Make sure every scored pocket has a final score and a methods list"""
+    for pocket in pockets:
+        # Ensure every pocket has a final score for proper sorting
+        if 'final_score' not in pocket:
+            pocket['final_score'] = pocket['consensus_score'] * 3.0 + pocket.get('score', 0) * 1.0
+
+        # Ensure methods list exists
+        if 'methods' not in pocket:
+            pocket['methods'] = [pocket.get('method', 'unknown')]
+    return pockets
+
+def _notify(callback, stage, status, **info):
+    """Send a stage event to the progress callback, if any"""
+    if callback is not None:
+        callback({'stage': stage, 'status': status, **info})
+
+def _run_stage(timings, callback, stage, func, *args, **kwargs):
+    """Run one stage, record its duration and send its start and done events"""
+    _notify(callback, stage, 'start')
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage] = time.perf_counter() - start
+    count = len(result) if isinstance(result, (list, dict)) else None
+    _notify(callback, stage, 'done', duration=timings[stage], count=count)
+    return result
+
+def predict(structure_or_path, params=None, output_prefix=None, generate_pymol=False,
+            generate_chimera=False, callback=None, workers=1, output_options=None):
+    """
+    Predict binding sites in a single structure
+
+    Parameters:
+    -----------
+    structure_or_path : ProteinStructure, str or Path
+        Parsed structure or path to a PDB/ENT file
+    params : PredictionParams, optional
+        Prediction parameters (default: PredictionParams())
+    output_prefix : str or Path, optional
+        If given, write the prediction files with this prefix; nothing is
+        written to disk otherwise
+    generate_pymol : bool
+        Also write a PyMOL script (only with output_prefix)
+    generate_chimera : bool
+        Also write a UCSF Chimera script (only with output_prefix)
+    callback : callable, optional
+        Called with an event dictionary ('stage', 'status' and, once a stage
+        is done, 'duration' and 'count') at the start and end of every stage
+    workers : int
+        Number of worker processes for tiled searches (params.tile_size);
+        tiles are searched in this process by default
+    output_options : OutputOptions, optional
+        Which files to write and how (default: OutputOptions(), the table and
+        the predicted PDB)
+
+    Returns:
+    --------
+    PocketResult
+        The scored binding sites
+    """
+    # Pipeline modules are imported on first use to keep `import ConSBind` fast
+    from ConSBind.core.structure import ProteinStructure
+    from ConSBind.core.finder import ConsensusPocketFinder
+    from ConSBind.core.scoring import final_scoring
+    from ConSBind.core.region import Region
+    
+    params = params or PredictionParams()
+    timings = {}
+
+    def run_stage(stage, func, *args, **kwargs):
+        return _run_stage(timings, callback, stage, func, *args, **kwargs)
+
+    # Load protein structure
+    if isinstance(structure_or_path, ProteinStructure):
+        protein = structure_or_path
+    else:
+        protein = run_stage('load', ProteinStructure, str(structure_or_path))
+
+    pocket_finder = ConsensusPocketFinder()
+
+    region = Region.from_params(protein, params)
+    if region is not None:
+        logger.info(f"Restricting the search to {region} ({int(region.core.sum())} atoms)")
+
+    if params.tile_size:
+        from ConSBind.core.tiling import find_pockets_tiled
+        geometric_pockets, energy_pockets = run_stage('tiles', find_pockets_tiled, protein, params, region=region,
+                                                      n_workers=workers, tile_size=params.tile_size,
+                                                      overlap=params.tile_overlap)
+    else:
+        geometric_pockets = run_stage('geometric', pocket_finder.find_pockets_geometric, protein,
+                                      probe_radius=params.probe_radius, min_size=params.min_size,
+                                      cavity_search=params.cavity_search, region=region)
+        energy_pockets = run_stage('energy', pocket_finder.find_pockets_energy, protein,
+                                   grid_spacing=params.grid_spacing, region=region)
+    consensus_pockets = run_stage('combine', pocket_finder.combine_pockets, protein,
+                                  geometric_pockets, energy_pockets)
+    consensus_pockets = run_stage('scoring', final_scoring, consensus_pockets, params.protein_type)
+    complete_pockets(consensus_pockets)
+
+    result = PocketResult(protein.pdb_id, consensus_pockets, protein, timings=timings)
+
+    if output_prefix is not None:
+        write_outputs(result, output_prefix, generate_pymol=generate_pymol,
+                      generate_chimera=generate_chimera, callback=callback, options=output_options)
+
+    return result
+
+def write_outputs(result, output_prefix, generate_pymol=False, generate_chimera=False, callback=None, options=None,
+                  errors=None, site_points=None):
+    """
+    Write the prediction files of a result (nothing is written if it has no pockets)
+
+    Parameters:
+    -----------
+    result : PocketResult
+        Result returned by predict(); its output_files and timings are updated
+    output_prefix : str or Path
+        Prefix of the output files
+    generate_pymol, generate_chimera : bool
+        Also write visualization scripts
+    callback : callable, optional
+        Progress callback, see predict()
+    options : OutputOptions, optional
+        Which files to write and how (default: OutputOptions())
+    errors : list, optional
+        If given, a file that cannot be written does not stop the others: its
+        (output kind, exception) pair is appended here instead of raised
+    site_points : list, optional
+        Pseudo-atom points of the pdb output, see ConSBind.output.output.display_points
+
+    Returns:
+    --------
+    dict
+        Output kind -> written path
+    """
+    from ConSBind.output.output import save_table, save_pdb, save_pymol, save_chimera
+
+    pockets, protein = result.pockets, result.protein
+    if not pockets:
+        return result.output_files
+
+    def run_stage(kind, stage, func, *args, **kwargs):
+        try:
+            result.output_files[kind] = _run_stage(result.timings, callback, stage, func, *args, **kwargs)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append((kind, e))
+
+    output_prefix = str(output_prefix)
+    os.makedirs(os.path.dirname(output_prefix) or '.', exist_ok=True)
+
+    options = options or OutputOptions()
+    kinds = options.kinds(generate_pymol, generate_chimera)
+    sidecar = options.sidecar
+    if sidecar and 'pymol' in kinds and not os.path.isfile(str(protein.pdb_file)):
+        # The PyMOL script loads the sidecar next to the input structure, which is gone
+        # (e.g. a structure read from a corpus archive): write the full PDB instead
+        logger.warning(f"Input file of {result.pdb_id} not found, writing the full predicted PDB "
+                       f"instead of the sidecar")
+        sidecar = False
+
+    if 'table' in kinds:
+        run_stage('predictions', 'predictions', save_table, pockets, protein, output_prefix,
+                  compress=options.compress)
+    if 'pdb' in kinds:
+        run_stage('pdb', 'pdb', save_pdb, pockets, protein, output_prefix, sidecar=sidecar,
+                  compress=options.compress, site_points=site_points)
+    if 'pymol' in kinds:
+        if 'pdb' in result.output_files:
+            structure_file = str(protein.pdb_file) if sidecar else None
+            run_stage('pymol', 'pymol', save_pymol, pockets, protein, output_prefix, result.output_files['pdb'],
+                      structure_file=structure_file, compress=options.compress)
+        else:
+            error = RuntimeError("the PDB file it loads was not written")
+            if errors is None:
+                raise error
+            errors.append(('pymol', error))
+    if 'chimera' in kinds:
+        run_stage('chimera', 'chimera', save_chimera, pockets, protein, output_prefix,
+                  result.output_files.get('pdb'), compress=options.compress)
+
+    return result.output_files
+
+def predict_iter(structures, params=None, output_dir=None, generate_pymol=False,
+                 generate_chimera=False, skip_errors=False, callback=None, output_options=None):
+    """
+    Predict binding sites for an iterable of structures, yielding one result at a time
+
+    Parameters:
+    -----------
+    structures : iterable
+        ProteinStructure objects or paths to PDB/ENT files
+    params : PredictionParams, optional
+        Prediction parameters shared by all structures
+    output_dir : str or Path, optional
+        If given, write each structure's files to output_dir/<pdb_id>/
+    generate_pymol, generate_chimera : bool
+        Also write visualization scripts (only with output_dir)
+    skip_errors : bool
+        Log and skip structures that fail instead of raising (default: False)
+    callback : callable, optional
+        Progress callback, see predict(); events also carry the 'structure' key
+    output_options : OutputOptions, optional
+        Which files to write and how (only with output_dir)
+
+    Yields:
+    -------
+    PocketResult
+        One result per successfully processed structure
+    """
+    from ConSBind.core.structure import ProteinStructure
+    
+    for structure in structures:
+        if isinstance(structure, ProteinStructure):
+            pdb_id = structure.pdb_id
+        else:
+            pdb_id = Path(structure).stem
+
+        output_prefix = None
+        if output_dir is not None:
+            output_prefix = Path(output_dir) / pdb_id / pdb_id
+
+        structure_callback = None
+        if callback is not None:
+            structure_callback = lambda event, pdb_id=pdb_id: callback({'structure': pdb_id, **event})
+
+        try:
+            yield predict(structure, params, output_prefix=output_prefix, generate_pymol=generate_pymol,
+                          generate_chimera=generate_chimera, callback=structure_callback,
+                          output_options=output_options)
+        except Exception as e:
+            if not skip_errors:
+                raise
+            logger.error(f"Error processing {pdb_id}: {str(e)}")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structure Arrays Module
+=======================
+This module converts the first model of a Biopython structure to flat
+NumPy arrays and back, so structures can be stored in binary containers
+(memory-mapped archives, shared memory) and rebuilt without text parsing.
+
+A structure is described by three arrays:
+
+    coords    float32 (n_atoms, 3)
+    atoms     ATOM_DTYPE, one row per atom, 'residue' indexes the residue table
+    residues  RESIDUE_DTYPE, one row per residue, in chain order
+
+Only the selected conformation of disordered atoms and residues is kept,
+which is what every stage of the pipeline sees.
+"""
+
+import warnings
+import numpy as np
+
+ATOM_DTYPE = np.dtype([
+    ('name', 'S4'),
+    ('fullname', 'S4'),
+    ('altloc', 'S1'),
+    ('element', 'S2'),
+    ('serial', '<i4'),
+    ('occupancy', '<f8'),
+    ('bfactor', '<f8'),
+    ('residue', '<i4')
+])
+
+RESIDUE_DTYPE = np.dtype([
+    ('chain', 'S4'),
+    ('hetflag', 'S1'),
+    ('resseq', '<i4'),
+    ('icode', 'S1'),
+    ('resname', 'S4'),
+    ('segid', 'S4'),
+    ('rel_asa', '<f4')
+])
+
+
+def _decode(column):
+    """Byte-string column -> list of str"""
+    return np.char.decode(np.asarray(column), 'ascii').tolist()
+
+def structure_to_arrays(model, rel_asa=None):
+    """
+    Convert a Biopython model to structure arrays
+
+    Parameters:
+    -----------
+    model : Bio.PDB.Model.Model
+        Model to convert (usually structure[0])
+    rel_asa : dict, optional
+        (chain id, residue id) -> relative accessible surface area, stored in
+        the residue table (NaN where missing)
+
+    Returns:
+    --------
+    dict
+        'coords', 'atoms' and 'residues' arrays
+    """
+    rel_asa = rel_asa or {}
+    residues = []
+    atoms = []
+    coords = []
+
+    for chain in model:
+        for residue in chain:
+            hetfield, resseq, icode = residue.get_id()
+            residue_index = len(residues)
+            residues.append((
+                chain.id, hetfield[0], resseq, icode, residue.get_resname(),
+                residue.get_segid(), rel_asa.get((chain.id, residue.get_id()), np.nan)
+            ))
+            for atom in residue:
+                atoms.append((
+                    atom.get_name(), atom.get_fullname(), atom.get_altloc(), atom.element or '',
+                    atom.get_serial_number() or 0, atom.get_occupancy() or 0.0,
+                    atom.get_bfactor() or 0.0, residue_index
+                ))
+                coords.append(atom.get_coord())
+
+    return {
+        'coords': np.array(coords, dtype=np.float32).reshape(-1, 3),
+        'atoms': np.array(atoms, dtype=ATOM_DTYPE),
+        'residues': np.array(residues, dtype=RESIDUE_DTYPE)
+    }
+
+def arrays_to_structure(structure_id, coords, atoms, residues):
+    """
+    Build a Biopython structure with one model from structure arrays
+
+    Parameters:
+    -----------
+    structure_id : str
+        Identifier of the new structure
+    coords, atoms, residues : numpy.ndarray
+        Arrays as returned by structure_to_arrays (memory-mapped views are fine)
+
+    Returns:
+    --------
+    Bio.PDB.Structure.Structure
+        The rebuilt structure
+    """
+    from Bio.PDB.Structure import Structure
+    from Bio.PDB.Model import Model
+    from Bio.PDB.Chain import Chain
+    from Bio.PDB.Residue import Residue
+    from Bio.PDB.Atom import Atom
+
+    # Private copy, so atom coordinates never point into a read-only mapping
+    coords = np.array(coords, dtype=np.float32)
+    atoms = np.asarray(atoms)
+    residues = np.asarray(residues)
+
+    structure = Structure(structure_id)
+    model = Model(0)
+    structure.add(model)
+
+    # Residue boundaries in the atom table
+    starts = np.searchsorted(atoms['residue'], np.arange(len(residues) + 1))
+
+    # Decode the text columns once instead of per atom
+    names = _decode(atoms['name'])
+    fullnames = _decode(atoms['fullname'])
+    altlocs = _decode(atoms['altloc'])
+    elements = _decode(atoms['element'])
+    serials = atoms['serial'].tolist()
+    occupancies = atoms['occupancy'].tolist()
+    bfactors = atoms['bfactor'].tolist()
+
+    residue_columns = zip(_decode(residues['chain']), _decode(residues['hetflag']), residues['resseq'].tolist(),
+                          _decode(residues['icode']), _decode(residues['resname']), _decode(residues['segid']))
+
+    chain = None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for index, (chain_id, hetflag, resseq, icode, resname, segid) in enumerate(residue_columns):
+            if chain is None or chain.id != chain_id:
+                chain = model[chain_id] if chain_id in model else Chain(chain_id)
+                if chain_id not in model:
+                    model.add(chain)
+
+            hetflag = hetflag or ' '
+            hetfield = 'H_' + resname if hetflag == 'H' else hetflag
+            residue = Residue((hetfield, resseq, icode or ' '), resname, segid.ljust(4))
+            chain.add(residue)
+
+            for i in range(starts[index], starts[index + 1]):
+                residue.add(Atom(names[i], coords[i], bfactors[i], occupancies[i], altlocs[i] or ' ',
+                                 fullnames[i], serials[i], element=elements[i] or None))
+
+    return structure
+
+def residue_asa(residues):
+    """
+    Relative ASA map of a residue table, as used by ProteinStructure
+
+    Returns:
+    --------
+    dict or None
+        (chain id, residue id) -> relative ASA, or None if no value is stored
+    """
+    values = residues['rel_asa']
+    if not np.isfinite(values).any():
+        return None
+
+    rel_asa = {}
+    residue_columns = zip(_decode(residues['chain']), _decode(residues['hetflag']), residues['resseq'].tolist(),
+                          _decode(residues['icode']), _decode(residues['resname']), values.tolist())
+    for chain_id, hetflag, resseq, icode, resname, value in residue_columns:
+        if not np.isfinite(value):
+            continue
+        hetfield = 'H_' + resname if hetflag == 'H' else (hetflag or ' ')
+        rel_asa[(chain_id, (hetfield, resseq, icode or ' '))] = value
+    return rel_asa
+
+def subset_arrays(arrays, atom_mask):
+    """
+    Structure arrays restricted to some atoms
+
+    Parameters:
+    -----------
+    arrays : dict
+        'coords', 'atoms' and 'residues' arrays (e.g. from structure_to_arrays)
+    atom_mask : numpy.ndarray
+        Boolean mask over the atoms to keep
+
+    Returns:
+    --------
+    dict
+        New arrays with the kept atoms and their residues; atom 'residue'
+        indexes are renumbered accordingly
+    """
+    atom_index = np.flatnonzero(atom_mask)
+    atoms = np.array(arrays['atoms'][atom_index])
+    used, atoms['residue'] = np.unique(atoms['residue'], return_inverse=True)
+    return {
+        'coords': np.array(arrays['coords'][atom_index]),
+        'atoms': atoms,
+        'residues': np.array(arrays['residues'][used])
+    }
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pocket Descriptors Module
+=========================
+This module describes every candidate pocket once, as one row of a NumPy
+matrix built from the residues around its center, and evaluates the
+residue-based scoring rules (druggability, knowledge base) on whole
+columns of that matrix instead of on residue-name lists, one pocket at
+a time.
+
+Descriptor columns:
+
+    n_ALA ... n_VAL        residues of each standard amino acid type
+    n_residues             residues around the center
+    hydrophobic_fraction   share of hydrophobic residues (ALA VAL LEU ILE MET PHE TRP PRO)
+    polar_fraction         share of polar residues (SER THR CYS TYR ASN GLN HIS)
+    charged_fraction       share of charged residues (LYS ARG ASP GLU)
+    aromatic_fraction      share of aromatic residues (PHE TYR TRP HIS)
+    volume                 approximate volume in Å³ (8 Å³ per pocket point)
+    hydrophobicity         mean Kyte & Doolittle hydrophobicity of the residues
+    catalytic_patterns     bitmask of the CATALYTIC_PATTERNS present
+
+The rows are kept on the pockets, so the final pockets of a prediction can
+be exported as a matrix (PocketResult.descriptors, --store_descriptors).
+"""
+
+import numpy as np
+
+# Standard amino acids, in column order
+RESIDUE_TYPES = ('ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE',
+                 'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL')
+
+HYDROPHOBIC = ('ALA', 'VAL', 'LEU', 'ILE', 'MET', 'PHE', 'TRP', 'PRO')
+POLAR = ('SER', 'THR', 'CYS', 'TYR', 'ASN', 'GLN', 'HIS')
+CHARGED = ('LYS', 'ARG', 'ASP', 'GLU')
+AROMATIC = ('PHE', 'TYR', 'TRP', 'HIS')
+METAL_BINDING = ('HIS', 'CYS', 'ASP', 'GLU')
+
+# Kyte & Doolittle hydrophobicity scale
+HYDROPHOBICITY = {
+    'ILE': 4.5, 'VAL': 4.2, 'LEU': 3.8, 'PHE': 2.8, 'CYS': 2.5, 'MET': 1.9, 'ALA': 1.8,
+    'GLY': -0.4, 'THR': -0.7, 'SER': -0.8, 'TRP': -0.9, 'TYR': -1.3, 'PRO': -1.6,
+    'HIS': -3.2, 'GLU': -3.5, 'GLN': -3.5, 'ASP': -3.5, 'ASN': -3.5, 'LYS': -3.9, 'ARG': -4.5
+}
+
+# Residue combinations recorded in the catalytic_patterns bitmask (bit i = pattern i)
+CATALYTIC_PATTERNS = (
+    ('HIS', 'ASP'), ('SER', 'HIS'), ('CYS', 'HIS'),     # Catalytic pairs
+    ('LYS', 'ASP'), ('ARG', 'ASP'), ('ARG', 'GLU'),
+    ('HIS', 'MET'),                                     # Heme binding (with CYS+HIS)
+    ('SER', 'HIS', 'ASP'), ('CYS', 'HIS', 'ASP')        # Catalytic triads
+)
+CATALYTIC_PAIRS = CATALYTIC_PATTERNS[:6]
+HEME_PATTERNS = (('CYS', 'HIS'), ('HIS', 'MET'))
+CATALYTIC_TRIADS = CATALYTIC_PATTERNS[7:]
+
+DESCRIPTOR_COLUMNS = tuple(f"n_{name}" for name in RESIDUE_TYPES) + (
+    'n_residues', 'hydrophobic_fraction', 'polar_fraction', 'charged_fraction',
+    'aromatic_fraction', 'volume', 'hydrophobicity', 'catalytic_patterns'
+)
+
+
+def _type_mask(names):
+    """Boolean mask over RESIDUE_TYPES selecting some residue names"""
+    return np.isin(RESIDUE_TYPES, names)
+
+def _pattern_mask(patterns):
+    """Bitmask with the bits of some CATALYTIC_PATTERNS set"""
+    return sum(1 << CATALYTIC_PATTERNS.index(pattern) for pattern in patterns)
+
+class PocketDescriptors:
+    """Matrix of pockets × descriptors (see DESCRIPTOR_COLUMNS)"""
+
+    def __init__(self, matrix, columns=DESCRIPTOR_COLUMNS):
+        """
+        Parameters:
+        -----------
+        matrix : array-like
+            (n pockets, n columns) float64 descriptor values
+        columns : tuple
+            Column names (default: DESCRIPTOR_COLUMNS)
+        """
+        self.columns = tuple(columns)
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, len(self.columns))
+        self._positions = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __repr__(self):
+        return f"PocketDescriptors(pockets={len(self)}, columns={len(self.columns)})"
+
+    def __getitem__(self, name):
+        """One column, as a view"""
+        return self.matrix[:, self._positions[name]]
+
+    @property
+    def counts(self):
+        """(n pockets, 20) residue-type counts, in RESIDUE_TYPES order"""
+        return self.matrix[:, :len(RESIDUE_TYPES)]
+
+    def count(self, names):
+        """Residues of any of the given types around each pocket"""
+        return self.counts @ _type_mask(names)
+
+    def has_patterns(self, patterns, require_all=False):
+        """Whether each pocket has any (or all) of the given CATALYTIC_PATTERNS"""
+        mask = _pattern_mask(patterns)
+        found = self['catalytic_patterns'].astype(np.int64) & mask
+        return found == mask if require_all else found != 0
+
+    @classmethod
+    def from_residues(cls, residue_lists, sizes):
+        """
+        Build the descriptors of pockets from their residues
+
+        Parameters:
+        -----------
+        residue_lists : list
+            For each pocket, its (chain id, residue number, residue name) tuples
+        sizes : array-like
+            Pocket sizes (number of points)
+
+        Returns:
+        --------
+        PocketDescriptors
+        """
+        positions = {name: i for i, name in enumerate(RESIDUE_TYPES)}
+        n_pockets = len(residue_lists)
+
+        # One-hot residue types, accumulated per pocket
+        pocket_index = np.repeat(np.arange(n_pockets), [len(residues) for residues in residue_lists])
+        type_index = np.array([positions.get(res[2], -1) for residues in residue_lists for res in residues],
+                              dtype=np.int64)
+        standard = type_index >= 0
+        counts = np.zeros((n_pockets, len(RESIDUE_TYPES)))
+        np.add.at(counts, (pocket_index[standard], type_index[standard]), 1)
+
+        n_residues = np.array([len(residues) for residues in residue_lists], dtype=np.float64)
+        denominator = np.maximum(1, n_residues)
+        scale = np.array([HYDROPHOBICITY[name] for name in RESIDUE_TYPES])
+
+        present = counts > 0
+        patterns = np.zeros(n_pockets, dtype=np.int64)
+        for bit, pattern in enumerate(CATALYTIC_PATTERNS):
+            patterns |= present[:, _type_mask(pattern)].all(axis=1).astype(np.int64) << bit
+
+        matrix = np.column_stack([
+            counts,
+            n_residues,
+            counts @ _type_mask(HYDROPHOBIC) / denominator,
+            counts @ _type_mask(POLAR) / denominator,
+            counts @ _type_mask(CHARGED) / denominator,
+            counts @ _type_mask(AROMATIC) / denominator,
+            np.asarray(sizes, dtype=np.float64) * 8.0,
+            counts @ scale / np.maximum(1, counts.sum(axis=1)),
+            patterns
+        ]) if n_pockets else np.empty((0, len(DESCRIPTOR_COLUMNS)))
+        return cls(matrix)
+
+    @classmethod
+    def from_pockets(cls, pockets):
+        """Stack the descriptor rows kept on pockets (see compute_descriptors)"""
+        return cls([pocket['descriptors'] for pocket in pockets])
+
+    def to_dict(self):
+        """Column name -> array"""
+        return {name: self[name] for name in self.columns}
+
+    def save(self, path):
+        """
+        Write the matrix as CSV (with a header row) or, for a '.npz' path, as NumPy arrays
+
+        Returns:
+        --------
+        str
+            The path written
+        """
+        path = str(path)
+        if path.endswith('.npz'):
+            np.savez_compressed(path, matrix=self.matrix, columns=np.array(self.columns))
+        else:
+            np.savetxt(path, self.matrix, delimiter=',', header=','.join(self.columns), comments='', fmt='%.6g')
+        return path
+
+def compute_descriptors(protein, pockets, radius=8.0):
+    """
+    Describe pockets in one pass and keep each pocket's row on it
+
+    Parameters:
+    -----------
+    protein : ProteinStructure
+        Structure the pockets were found in
+    pockets : list
+        Pockets to describe; their residues are looked up in one batch
+    radius : float
+        Residue search radius around the pocket centers in Å (default: 8.0)
+
+    Returns:
+    --------
+    PocketDescriptors
+        One row per pocket, in pocket order
+    """
+    residue_lists = protein.get_pockets_residues(pockets, radius)
+    descriptors = PocketDescriptors.from_residues(residue_lists, [pocket['size'] for pocket in pockets])
+    for pocket, row in zip(pockets, descriptors.matrix):
+        pocket['descriptors'] = row
+    return descriptors
+
+def druggability_scores(descriptors):
+    """
+    Druggability of every pocket (empirically derived): favorable pockets have
+    a volume of 200-800 Å³ and a hydrophobic fraction around 0.6
+
+    Returns:
+    --------
+    numpy.ndarray
+        Scores between 0 and 1
+    """
+    volume_score = np.maximum(0, 1 - np.abs(descriptors['volume'] - 500) / 300)
+    hydrophobic_score = np.maximum(0, 1 - np.abs(descriptors['hydrophobic_fraction'] - 0.6) / 0.4)
+    return (volume_score + hydrophobic_score) / 2.0
+
+def knowledge_scores(descriptors):
+    """
+    Score every pocket against binding site knowledge
+
+    Returns:
+    --------
+    numpy.ndarray
+        Sum of the rule bonuses of each pocket
+    """
+    counts = descriptors.counts
+    gly, lys, arg = (counts[:, RESIDUE_TYPES.index(name)] for name in ('GLY', 'LYS', 'ARG'))
+    score = np.zeros(len(descriptors))
+
+    # 1. Binding sites typically have a mix of hydrophobic and polar or charged residues
+    score += 1.0 * ((descriptors.count(HYDROPHOBIC) > 0) &
+                    ((descriptors.count(POLAR) > 0) | (descriptors.count(CHARGED) > 0)))
+
+    # 2. Key catalytic residue pairs (common in enzyme active sites), 0.5 each
+    pairs = descriptors['catalytic_patterns'].astype(np.int64) & _pattern_mask(CATALYTIC_PAIRS)
+    score += 0.5 * np.array([bin(mask).count('1') for mask in pairs.tolist()], dtype=np.float64)
+
+    # 3. Aromatic residues (common in binding sites)
+    score += 0.5 * (descriptors.count(AROMATIC) >= 2)
+
+    # 4. Specific binding site characteristics: heme (HIS with MET or CYS),
+    # nucleotide (glycine-rich loop and charged residues), metal coordination
+    # and catalytic triads
+    score += 1.0 * descriptors.has_patterns(HEME_PATTERNS)
+    score += 1.0 * ((gly >= 3) & ((lys > 0) | (arg > 0)))
+    score += 1.0 * (descriptors.count(METAL_BINDING) >= 3)
+    score += 1.5 * descriptors.has_patterns(CATALYTIC_TRIADS)
+    return score
@@ -10,10 +10,10 @@ combines their results for consensus-based binding site prediction.
 
 import numpy as np
 import logging
-from scipy.spatial.distance import pdist
-from scipy.cluster.hierarchy import linkage, fcluster
-from scipy.spatial import KDTree
-from Bio.PDB import Selection
+
+from ConSBind.core.pocket import Pocket
+from ConSBind.core.descriptors import PocketDescriptors, compute_descriptors, druggability_scores, knowledge_scores
+from ConSBind.core.region import sample_size as region_sample_size
 
 # Get logger but prevent duplicate messages
 logger = logging.getLogger('ConSBind')
@@ -25,27 +25,29 @@ class ConsensusPocketFinder:
         """Initialize the pocket finder with default parameters"""
         pass
     
-    def find_pockets_geometric(self, protein, probe_radius=1.4, min_size=5):
-        """Find pockets using geometric approach"""
+    def find_pockets_geometric(self, protein, probe_radius=1.4, min_size=5, cavity_search='uniform', region=None):
+        """Find pockets using geometric approach (cavity_search: 'uniform', 'adaptive' or 'edt'), optionally in a Region"""
         # Cavity detection 
-        cavities = protein.get_cavities(probe_radius=probe_radius, min_cavity_size=min_size)
+        cavities = protein.get_cavities(probe_radius=probe_radius, min_cavity_size=min_size, search=cavity_search,
+                                        region=region)
 
         # If no cavities found, try more aggressive parameters 
         if not cavities:
             logger.info("No cavities found with default parameters, trying alternatives...")
 
             # Try larger prove radius for larger cavities 
-            cavities = protein.get_cavities(probe_radius=1.8, min_cavity_size=3)
+            cavities = protein.get_cavities(probe_radius=1.8, min_cavity_size=3, search=cavity_search,
+                                            region=region)
 
             # If still no cavities, try surface-based approach:
             if not cavities:
-                cavities = self._find_surface_pockets(protein)
+                cavities = self._find_surface_pockets(protein, region=region)
         
         return cavities
     
-    def _find_surface_pockets(self, protein):
+    def _find_surface_pockets(self, protein, region=None):
         """ Alternative method to find potential binding sites in surface contours"""
-        surface_atoms = protein.get_surface_atoms(rel_asa_threshold=0.15)
+        surface_atoms = protein.get_surface_atoms(rel_asa_threshold=0.15, region=region)
 
         # Use clustering to identify potential pocket regions 
         if len(surface_atoms) > 5:
@@ -66,13 +68,12 @@ class ConsensusPocketFinder:
                 cluster_points = coords[labels == label]
                 center = np.mean(cluster_points, axis=0)
 
+                if region is not None and not region.contains(center):
+                    continue
+
                 # Check if this is a pocket-like feature (concave region on a protein surface)
                 if self._is_concave(protein, center):
-                    cavities.append({
-                        'center': center, 
-                        'size': len(cluster_points),
-                        'points': cluster_points
-                    })
+                    cavities.append(Pocket(center, len(cluster_points), cluster_points))
             
             return cavities
         
@@ -85,9 +86,7 @@ class ConsensusPocketFinder:
         directions = directions / np.linalg.norm(directions, axis=1)[:, np.newaxis]
 
         # Cast rays and check for protein hits 
-        atoms = Selection.unfold_entities(protein.model, 'A')
-        coords = np.array([atom.get_coord() for atom in atoms])
-        kdtree = KDTree(coords)
+        kdtree = protein.kdtree
 
         hit_count = 0
         for direction in directions:
@@ -104,13 +103,14 @@ class ConsensusPocketFinder:
         # If most rays hit protein, it's likely concave 
         return hit_count >= num_directions * 0.7 
     
-    def find_pockets_energy(self, protein, grid_spacing=1.0):
+    def find_pockets_energy(self, protein, grid_spacing=1.0, region=None):
         """
         Find pockets using energy-based approach
         This is a simplified version focusing on hydrophobicity and charge
+        With a Region, the grid is restricted to its box
         """
         # Get protein surface
-        surface_atoms = protein.get_surface_atoms()
+        surface_atoms = protein.get_surface_atoms(region=region)
         if not surface_atoms:
             logger.warning("No surface atoms found")
             return []
@@ -125,12 +125,18 @@ class ConsensusPocketFinder:
         y = np.arange(min_coords[1], max_coords[1], grid_spacing * 2)
         z = np.arange(min_coords[2], max_coords[2], grid_spacing * 2)
         
+        # A region gets the share of a full scan's sample that its part of the grid covers
+        n_full = None
+        if region is not None:
+            x, y, z = region.clip_axes((x, y, z))
+            n_full = region.full_grid_size(grid_spacing * 2, 5.0)
+        
         # Calculate energy score for each grid point
         energy_points = []
         
         # Sample grid points
         logger.info("Calculating energy scores for grid points...")
-        sample_size = min(5000, len(x) * len(y) * len(z))
+        sample_size = region_sample_size(5000, len(x) * len(y) * len(z), n_full)
         indices = np.random.choice(len(x) * len(y) * len(z), size=sample_size, replace=False)
         
         for idx in indices:
@@ -175,6 +181,8 @@ class ConsensusPocketFinder:
         
         # Cluster energy points
         if len(energy_points) > 1:
+            from scipy.spatial.distance import pdist
+            from scipy.cluster.hierarchy import linkage, fcluster
             points = np.array([p['center'] for p in energy_points])
             distances = pdist(points)
             linkage_matrix = linkage(distances, method='average')
@@ -197,12 +205,7 @@ class ConsensusPocketFinder:
                 # Calculate average score
                 score = np.mean([energy_points[i]['score'] for i in cluster_indices])
                 
-                energy_clusters.append({
-                    'center': center,
-                    'points': cluster_points,
-                    'size': len(cluster_points),
-                    'score': score
-                })
+                energy_clusters.append(Pocket(center, len(cluster_points), cluster_points, score=score))
             
             logger.info(f"Found {len(energy_clusters)} energy-based pockets after clustering")
             return energy_clusters
@@ -217,11 +220,20 @@ class ConsensusPocketFinder:
         # Start with all pockets
         all_pockets = []
         
+        # Describe every candidate once (residues in one lookup, as before). Energy pockets
+        # are described for the output and the results store (PocketResult.descriptors,
+        # --store_descriptors): any of them can become a final site. Only the geometric
+        # rows are scored.
+        descriptors = compute_descriptors(protein, list(geometric_pockets) + list(energy_pockets))
+        geometric_descriptors = PocketDescriptors(descriptors.matrix[:len(geometric_pockets)])
+        druggability_values = druggability_scores(geometric_descriptors)
+        knowledge_values = knowledge_scores(geometric_descriptors)
+        
         # Add geometric pockets
-        for pocket in geometric_pockets:
+        for i, pocket in enumerate(geometric_pockets):
             # Calculate additional scores 
-            druggability = self.calculate_druggability_score(protein, pocket)
-            knowledge_score = self.evaluate_with_knowledge_base(protein, pocket)
+            druggability = float(druggability_values[i])
+            knowledge_score = float(knowledge_values[i])
 
             # Combined score (weighted)
             total_score = (
@@ -230,29 +242,29 @@ class ConsensusPocketFinder:
                 knowledge_score * 1.2   # Knowledge-based score 
             )
 
-            all_pockets.append({
-                'center': pocket['center'],
-                'size': pocket['size'],
-                'method': 'geometric',
-                'methods': ['geometric'],  # Track all methods that detected this pocket
-                'druggability': druggability, 
-                'knowledge_score': knowledge_score, 
-                'score': total_score,  
-                'consensus_score': 1,  # Start with base score
-                'points': pocket.get('points', [])
-            })
+            all_pockets.append(Pocket(
+                pocket['center'], pocket['size'], pocket.get('points'),
+                method='geometric',
+                methods=['geometric'],  # Track all methods that detected this pocket
+                druggability=druggability,
+                knowledge_score=knowledge_score,
+                score=total_score,
+                consensus_score=1,  # Start with base score
+                residues=pocket['residues'],
+                descriptors=pocket['descriptors']
+            ))
         
         # Add energy pockets
         for pocket in energy_pockets:
-            all_pockets.append({
-                'center': pocket['center'],
-                'size': pocket['size'],
-                'method': 'energy',
-                'methods': ['energy'],  # Track all methods that detected this pocket
-                'score': pocket['score'],
-                'consensus_score': 1,  # Start with base score
-                'points': pocket.get('points', [])
-            })
+            all_pockets.append(Pocket(
+                pocket['center'], pocket['size'], pocket.get('points'),
+                method='energy',
+                methods=['energy'],  # Track all methods that detected this pocket
+                score=pocket['score'],
+                consensus_score=1,  # Start with base score
+                residues=pocket['residues'],
+                descriptors=pocket['descriptors']
+            ))
         
         # Increase consensus score for pockets that are close to each other
         for i in range(len(all_pockets)):
@@ -301,86 +313,10 @@ class ConsensusPocketFinder:
     
     # Knowledge-based filtering 
     def evaluate_with_knowledge_base(self, protein, pocket):
-        """Score pocket based on binding site knowledge base"""
-        # Get residues in the pocket 
-        pocket_residues = protein.get_pocket_residues(pocket)
-        residue_types = [res[2] for res in pocket_residues]     # Extract residue names
-
-        # Features that caracterize binding sites 
-        score = 0.0
-
-        # 1. Binding sites typically have a mix of hydrophobic and polar residues 
-        hydrophobic = ['ALA', 'VAL', 'LEU', 'ILE', 'MET', 'PHE', 'TRP', 'PRO']
-        polar = ['SER', 'THR', 'CYS', 'TYR', 'ASN', 'GLN', 'HIS']
-        charged = ['LYS', 'ARG', 'ASP', 'GLU']
-
-        hydrophobic_count = sum(1 for res in residue_types if res in hydrophobic)
-        polar_count = sum(1 for res in residue_types if res in polar)
-        charged_count = sum(1 for res in residue_types if res in charged)
-
-        # Binding sites typically have a good mix of residue types 
-        if hydrophobic_count > 0 and (polar_count > 0 or charged_count > 0):
-            score += 1.0
-
-        # 2. Presence of key catalytic residues (common in enzyme active sites)
-        catalytic_pairs = [
-            {'HIS', 'ASP'}, {'SER', 'HIS'}, {'CYS', 'HIS'}, 
-            {'LYS', 'ASP'}, {'ARG', 'ASP'}, {'ARG', 'GLU'}
-        ]
-
-        residue_set = set(residue_types)
-        for pair in catalytic_pairs:
-            if pair.issubset(residue_set):
-                score += 0.5
-        
-        # 3. Presence of aromatic residues (common in binding sites)
-        aromatic_count = sum(1 for res in residue_types if res in ['PHE', 'TYR', 'TRP', 'HIS'])
-        if aromatic_count >= 2:
-            score += 0.5
-
-        # 4. Specific binding site characteristics
-    
-        # Heme binding sites often have HIS, MET, CYS
-        if 'HIS' in residue_set and ('MET' in residue_set or 'CYS' in residue_set):
-            score += 1.0
-        
-        # Nucleotide binding sites often have a glycine-rich loop and charged residues
-        if residue_types.count('GLY') >= 3 and ('LYS' in residue_set or 'ARG' in residue_set):
-            score += 1.0
-        
-        # Metal binding sites often have specific coordinating residues
-        metal_binding = ['HIS', 'CYS', 'ASP', 'GLU']
-        if sum(1 for res in residue_types if res in metal_binding) >= 3:
-            score += 1.0
-        
-        # Substrate binding in enzymes - look for catalytic triad-like patterns
-        if {'SER', 'HIS', 'ASP'}.issubset(residue_set) or {'CYS', 'HIS', 'ASP'}.issubset(residue_set):
-            score += 1.5
-
-        return score 
+        """Score pocket based on binding site knowledge base (see ConSBind.core.descriptors.knowledge_scores)"""
+        return float(knowledge_scores(compute_descriptors(protein, [pocket]))[0])
 
     # Druggability score 
     def calculate_druggability_score(self, protein, pocket):
-        """Calculate a druggability score for the pocket"""
-        # Get residues in the pocket 
-        residues = protein.get_pocket_residues(pocket)
-
-        # Calculate volume and hydrophobicity
-        volume = pocket['size'] * 8.0   # Approximate
-        hydrophobicity = protein.calculate_hydrophobicity(pocket['center'])
-
-        # Mixture of hydrophobic and hydrophilic residues 
-        residue_types = [res[2] for res in residues]
-        hydrophobic = ['ALA', 'VAL', 'LEU', 'ILE', 'MET', 'PHE', 'TRP', 'PRO']
-        polar = ['SER', 'THR', 'CYS', 'TYR', 'ASN', 'GLN', 'HIS', 'LYS', 'ARG', 'ASP', 'GLU']
-
-        hydrophobic_frac = sum(1 for res in residue_types if res in hydrophobic) / max(1, len(residue_types))
-
-        # Druggability score - empirically derived. Favorable pockets have volume 200-800A, moderate hydrophobicity (0.4-0.8)
-        volume_score = max(0, 1 - abs(volume - 500) / 300)
-        hydrophobic_score = max(0, 1 - abs(hydrophobic_frac - 0.6) / 0.4)
-
-        druggability = (volume_score + hydrophobic_score) / 2.0
-
-        return druggability
-    
\ No newline at end of file
+        """Calculate a druggability score for the pocket (see ConSBind.core.descriptors.druggability_scores)"""
+        return float(druggability_scores(compute_descriptors(protein, [pocket]))[0])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pocket Module
+=============
+This module defines the compact container used for binding site candidates
+as they flow through detection, combination, scoring and output.
+"""
+
+import numpy as np
+
+class Pocket:
+    """
+    Binding site candidate with a fixed set of attributes
+
+    Pocket points are stored as a float32 (n, 3) array. For a transition
+    period pockets also support the dictionary protocol used by older code
+    (pocket['center'], 'druggability' in pocket, pocket.get('score', 0), ...),
+    where a key is present once the matching attribute has been set.
+
+    residues memoizes the residues around the center, per search radius
+    (see ProteinStructure.get_pocket_residues), so scoring and every output
+    writer share one lookup. descriptors is the pocket's row of the
+    descriptor matrix (see ConSBind.core.descriptors).
+    """
+
+    __slots__ = ('center', 'size', 'points', 'method', 'methods', 'score', 'consensus_score',
+                 'final_score', 'druggability', 'knowledge_score', 'residues',
+                 'descriptors')
+
+    def __init__(self, center, size=None, points=None, **attributes):
+        """
+        Parameters:
+        -----------
+        center : array-like
+            Pocket center coordinates
+        size : int, optional
+            Pocket size (default: number of points)
+        points : array-like, optional
+            (n, 3) coordinates of the points that make up the pocket
+        **attributes
+            Any other pocket attribute (method, methods, score, ...)
+        """
+        self.center = np.asarray(center, dtype=np.float64)
+        if points is None:
+            self.points = np.empty((0, 3), dtype=np.float32)
+        else:
+            self.points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        self.size = int(size) if size is not None else len(self.points)
+        for key, value in attributes.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        delattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def get(self, key, default=None):
+        """Return the attribute value if it is set, else default"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """Names of the attributes that are set"""
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def items(self):
+        """(name, value) pairs of the attributes that are set"""
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def copy(self):
+        """Return a copy whose scores and methods can change independently (points are shared)"""
+        pocket = Pocket.__new__(Pocket)
+        for key, value in self.items():
+            setattr(pocket, key, list(value) if key == 'methods' else value)
+        return pocket
+
+    def to_dict(self):
+        """Return the pocket as a plain dictionary"""
+        return dict(self.items())
+
+    def __repr__(self):
+        center = ', '.join(f"{c:.2f}" for c in self.center)
+        return f"Pocket(center=({center}), size={self.size}, methods={self.get('methods', [])})"
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Region Module
+=============
+This module restricts pocket searches to part of a structure: some chains,
+the neighbourhood of a residue or a chain-chain interface.
+
+A region is a set of core atoms and the box around them, padded by a margin.
+The search grids (cavities, energy) are built and sampled inside the box
+only, while distances, enclosure and energies are still computed against
+all atoms of the model, so the result inside the region is the same as in
+a full scan. Sample sizes are scaled by the share of the full grid the box
+covers, so the density of sampled points (which the clustering depends on)
+does not change either.
+
+Usage:
+    python main.py complex.pdb --chains A
+    python main.py complex.pdb --around A:902 --radius 8
+    python main.py complex.pdb --interface H+L,A
+"""
+
+import re
+import numpy as np
+
+# Chain and residue number with optional insertion code, e.g. 'A:25' or 'A:25B'
+RESIDUE_PATTERN = re.compile(r'^\s*(\w+):(-?\d+)([A-Za-z]?)\s*$')
+
+
+def sample_size(limit, n_points, n_full=None):
+    """
+    Number of grid points to sample
+
+    Parameters:
+    -----------
+    limit : int
+        Sample size of a full scan
+    n_points : int
+        Points of the grid being sampled
+    n_full : int, optional
+        Points of the full-scan grid, if the grid is restricted to a region
+
+    Returns:
+    --------
+    int
+        min(limit, n_points) for a full grid; otherwise the same share of the
+        region's points that a full scan would sample
+    """
+    if n_full is None or n_full <= n_points:
+        return min(limit, n_points)
+    return min(n_points, int(round(min(limit, n_full) * n_points / n_full)))
+
+class Region:
+    """Core atoms of a structure and the box the pocket searches are restricted to"""
+
+    def __init__(self, protein, core, description, margin=10.0, bounds=None, extent=None):
+        """
+        Parameters:
+        -----------
+        protein : ProteinStructure
+            Structure the region belongs to
+        core : numpy.ndarray
+            Boolean mask over protein.atoms selecting the core atoms
+        description : str
+            Human-readable description (also identifies the region in caches)
+        margin : float
+            Padding of the box around the core atoms in Å (default: 10.0,
+            the padding of a full cavity grid)
+        bounds : tuple, optional
+            Explicit (lower, upper) corners of the box, instead of the padded core
+        extent : tuple, optional
+            (lower, upper) corners of the atoms of the whole structure, when
+            protein holds only part of it (e.g. the atoms around a tile); sample
+            sizes are scaled by the share of that structure's full grid
+        """
+        core = np.asarray(core, dtype=bool)
+        if not core.any():
+            raise ValueError(f"Region selection is empty: {description}")
+
+        self.protein = protein
+        self.core = core
+        self.description = description
+        self.margin = margin
+        if extent is None:
+            extent = (np.min(protein.coords, axis=0), np.max(protein.coords, axis=0))
+        self.extent = tuple(np.asarray(corner) for corner in extent)
+
+        if bounds is not None:
+            self.lower, self.upper = (np.asarray(corner, dtype=float) for corner in bounds)
+        else:
+            coords = protein.coords[core]
+            self.lower = np.min(coords, axis=0) - margin
+            self.upper = np.max(coords, axis=0) + margin
+
+    def __repr__(self):
+        return f"Region({self.description!r}, atoms={int(self.core.sum())})"
+
+    def __str__(self):
+        return self.description
+
+    def __and__(self, other):
+        """Intersection of two regions of the same structure"""
+        return Region(self.protein, self.core & other.core,
+                      f"{self.description} and {other.description}", min(self.margin, other.margin))
+
+    @property
+    def key(self):
+        """Hashable identifier, used to cache results per region"""
+        return (self.description, self.margin, tuple(self.lower), tuple(self.upper))
+
+    def full_grid_size(self, spacing, padding):
+        """Points of a full-scan grid with this spacing, padded around the atoms of the whole structure"""
+        lower, upper = self.extent
+        return int(np.prod([len(np.arange(lower[axis] - padding, upper[axis] + padding, spacing))
+                            for axis in range(3)]))
+
+    def contains(self, points, extra=0.0):
+        """
+        Which points lie inside the box (grown by extra Å on every side)
+
+        Returns:
+        --------
+        numpy.ndarray or bool
+            Boolean mask for an (n, 3) array, or a bool for a single point
+        """
+        points = np.asarray(points)
+        inside = (points >= self.lower - extra) & (points <= self.upper + extra)
+        return inside.all(axis=-1)
+
+    def clip_axes(self, axes, extra=0.0):
+        """Grid axes restricted to the box (grown by extra Å), keeping the lattice alignment"""
+        return tuple(axis[(axis >= self.lower[i] - extra) & (axis <= self.upper[i] + extra)]
+                     for i, axis in enumerate(axes))
+
+    @classmethod
+    def from_chains(cls, protein, chain_ids, margin=10.0):
+        """Region made of whole chains"""
+        chain_ids = [chain_id.strip() for chain_id in chain_ids if chain_id.strip()]
+        missing = [chain_id for chain_id in chain_ids if chain_id not in protein.model]
+        if missing:
+            raise ValueError(f"Chain(s) not found in {protein.pdb_id}: {', '.join(missing)}")
+
+        chains = np.array([atom.get_parent().get_parent().id for atom in protein.atoms])
+        return cls(protein, np.isin(chains, chain_ids), f"chains {','.join(chain_ids)}", margin)
+
+    @classmethod
+    def around_residue(cls, protein, residue_spec, radius=8.0, margin=10.0):
+        """
+        Atoms within radius Å of any atom of one residue
+
+        Parameters:
+        -----------
+        residue_spec : str
+            'CHAIN:NUMBER' with an optional insertion code, e.g. 'A:25' or 'A:25B';
+            ligands and other hetero residues are found by their number too
+        """
+        match = RESIDUE_PATTERN.match(residue_spec)
+        if not match:
+            raise ValueError(f"Invalid residue '{residue_spec}', expected CHAIN:NUMBER (e.g. A:25)")
+        chain_id, number, icode = match.group(1), int(match.group(2)), match.group(3) or ' '
+        if chain_id not in protein.model:
+            raise ValueError(f"Chain not found in {protein.pdb_id}: {chain_id}")
+
+        residues = [residue for residue in protein.model[chain_id]
+                    if residue.get_id()[1] == number and residue.get_id()[2] == icode]
+        if not residues:
+            raise ValueError(f"Residue not found in {protein.pdb_id}: {residue_spec}")
+
+        residue_coords = np.array([atom.get_coord() for residue in residues for atom in residue])
+        near = set()
+        for indices in protein.kdtree.query_ball_point(residue_coords, radius):
+            near.update(indices)
+        core = np.zeros(len(protein.atoms), dtype=bool)
+        core[list(near)] = True
+        return cls(protein, core, f"{radius:g} Å around {residue_spec.strip()}", margin)
+
+    @classmethod
+    def interface(cls, protein, chains_a, chains_b, cutoff=8.0, margin=10.0):
+        """Atoms of chains_a within cutoff Å of chains_b, and the other way round"""
+        from scipy.spatial import KDTree
+
+        side_a = cls.from_chains(protein, chains_a, margin).core
+        side_b = cls.from_chains(protein, chains_b, margin).core
+        coords = protein.coords
+
+        core = np.zeros(len(coords), dtype=bool)
+        for side, other in ((side_a, side_b), (side_b, side_a)):
+            distances, _ = KDTree(coords[other]).query(coords[side], distance_upper_bound=cutoff)
+            core[np.flatnonzero(side)[distances <= cutoff]] = True
+
+        description = f"interface {'+'.join(chains_a)}/{'+'.join(chains_b)} ({cutoff:g} Å)"
+        return cls(protein, core, description, margin)
+
+    @classmethod
+    def from_params(cls, protein, params):
+        """
+        Region selected by the chains, around, radius and interface prediction parameters
+
+        Returns:
+        --------
+        Region or None
+            Intersection of the selected regions, or None for a full scan
+        """
+        regions = []
+        if params.chains:
+            regions.append(cls.from_chains(protein, params.chains.split(',')))
+        if params.around:
+            regions.append(cls.around_residue(protein, params.around, params.radius))
+        if params.interface:
+            sides = params.interface.split(',')
+            if len(sides) != 2:
+                raise ValueError(f"Invalid interface '{params.interface}', expected two chain groups (e.g. A,B or H+L,A)")
+            regions.append(cls.interface(protein, sides[0].split('+'), sides[1].split('+'), params.radius))
+
+        if not regions:
+            return None
+        region = regions[0]
+        for other in regions[1:]:
+            region = region & other
+        return region
@@ -9,13 +9,71 @@ This module contains functions for scoring and filtering binding site prediction
 
 import numpy as np
 import logging
-from scipy.stats import zscore
-from scipy.cluster.hierarchy import linkage, fcluster
-from scipy.spatial.distance import pdist
 
 # Use the same logger as main to prevent duplicate messages
 logger = logging.getLogger('ConSBind')
 
+def natural_breaks(values, n_classes, weights=None):
+    """
+    Optimal partition of sorted values into classes (Fisher-Jenks natural breaks)
+    
+    Classes are contiguous runs of the sorted values that minimize the total
+    weighted within-class sum of squares, found exactly by dynamic
+    programming in O(n_classes * n**2) for n values.
+    
+    Parameters:
+    -----------
+    values : array-like
+        Values sorted in ascending order (e.g. the distinct scores)
+    n_classes : int
+        Number of classes, at most len(values)
+    weights : array-like, optional
+        Weight of each value (e.g. how often it occurs; default: 1)
+        
+    Returns:
+    --------
+    list
+        Index of the first value of each class, in ascending order (starts with 0)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if not 1 <= n_classes <= len(values):
+        raise ValueError(f"Cannot split {len(values)} values into {n_classes} classes")
+    
+    # Prefix sums give the sum of squares of any run values[i:j + 1] in constant time
+    sum_w = np.concatenate([[0.0], np.cumsum(weights)])
+    sum_x = np.concatenate([[0.0], np.cumsum(weights * values)])
+    sum_xx = np.concatenate([[0.0], np.cumsum(weights * values ** 2)])
+    
+    def run_cost(i, j):
+        w = sum_w[j + 1] - sum_w[i]
+        x = sum_x[j + 1] - sum_x[i]
+        return (sum_xx[j + 1] - sum_xx[i]) - x * x / w
+    
+    # cost[j]: best cost of values[:j + 1] in the current number of classes
+    n = len(values)
+    cost = run_cost(np.zeros(n, dtype=np.int64), np.arange(n))
+    backtrack = []
+    for n_class in range(1, n_classes):
+        new_cost = np.full(n, np.inf)
+        start = np.zeros(n, dtype=np.int64)
+        for j in range(n_class, n):
+            # i: first value of the last class
+            i = np.arange(n_class, j + 1)
+            candidates = cost[i - 1] + run_cost(i, j)
+            best = np.argmin(candidates)
+            new_cost[j] = candidates[best]
+            start[j] = i[best]
+        cost = new_cost
+        backtrack.append(start)
+    
+    starts = []
+    j = n - 1
+    for start in reversed(backtrack):
+        starts.append(int(start[j]))
+        j = starts[-1] - 1
+    return [0] + starts[::-1]
+
 def final_scoring(consensus_pockets, protein_type):
     """
     Adjust pocket scores based on known protein function and automatically filter
@@ -37,33 +95,39 @@ def final_scoring(consensus_pockets, protein_type):
         logger.warning("No binding sites found")
         return []
         
-    # Apply protein-type specific adjustments
+    # Apply protein-type specific adjustments, over all pockets at once
+    sizes = np.array([pocket['size'] for pocket in consensus_pockets])
+    knowledge = np.array([pocket.get('knowledge_score', np.nan) for pocket in consensus_pockets], dtype=np.float64)
+    druggability = np.array([pocket.get('druggability', np.nan) for pocket in consensus_pockets], dtype=np.float64)
+    
+    boost = np.ones(len(consensus_pockets))
+    # For enzymes, prioritize pockets with catalytic residue patterns 
+    if protein_type == 'enzyme':
+        boost[knowledge > 1.5] = 1.3        # Boost enzymatic sites 
+    # For transporters, prioritize channel-like cavities 
+    elif protein_type == 'transporter':
+        boost[sizes > 300] = 1.2            # Larger pockets for transporters 
+    # For receptors, prioritize larger, moderately hydrophobic pockets 
+    elif protein_type == 'receptor':
+        boost[druggability > 0.6] = 1.15
+    
+    for i in np.flatnonzero(boost != 1.0):
+        consensus_pockets[i]['consensus_score'] *= float(boost[i])
+    
+    # Ensure all pockets have the methods list if it doesn't exist
     for pocket in consensus_pockets:
-        # For enzymes, prioritize pockets with catalytic residue patterns 
-        if protein_type == 'enzyme':
-            if 'knowledge_score' in pocket and pocket['knowledge_score'] > 1.5:
-                pocket['consensus_score'] *= 1.3    # Boost enzymatic sites 
-        
-        # For transporters, prioritize channel-like cavities 
-        elif protein_type == 'transporter':
-            if pocket['size'] > 300:    # Larger pockets for transporters 
-                pocket['consensus_score'] *= 1.2
-        
-        # For receptors, prioritize larger, moderately hydrophobic pockets 
-        elif protein_type == 'receptor':
-            if 'druggability' in pocket and pocket['druggability'] > 0.6:
-                pocket['consensus_score'] *= 1.15
-        
-        # Ensure all pockets have the methods list if it doesn't exist
         if 'methods' not in pocket:
             pocket['methods'] = [pocket['method']] if 'method' in pocket else []
     
     # Ensure all pockets have final score attribute
-    for pocket in consensus_pockets:
-        pocket['final_score'] = (
-            pocket['consensus_score'] * 3.0 +   # Primary criterion: consensus
-            pocket.get('score', 0) * 0.5        # Secondary criterion: knowledge/druggability score
-        )
+    consensus = np.array([pocket['consensus_score'] for pocket in consensus_pockets], dtype=np.float64)
+    secondary = np.array([pocket.get('score', 0) for pocket in consensus_pockets], dtype=np.float64)
+    final_scores = (
+        consensus * 3.0 +   # Primary criterion: consensus
+        secondary * 0.5     # Secondary criterion: knowledge/druggability score
+    )
+    for pocket, final_score in zip(consensus_pockets, final_scores.tolist()):
+        pocket['final_score'] = final_score
     
     # Sort by consensus score and then by final score
     consensus_pockets = sorted(consensus_pockets, key=lambda x: (x['consensus_score'], x['final_score']), reverse=True)
@@ -73,64 +137,30 @@ def final_scoring(consensus_pockets, protein_type):
         # Extract consensus scores
         scores = np.array([p['consensus_score'] for p in consensus_pockets])
         
-        # Method 1: Use natural breaks in the data (Jenks Natural Breaks optimization)
-        # Simplified version using hierarchical clustering
+        # Method 1: Use natural breaks in the data (Jenks Natural Breaks optimization),
+        # on the distinct scores weighted by how many pockets share them
         if len(scores) >= 3:
-            try:
-                # Reshape for clustering
-                score_matrix = scores.reshape(-1, 1)
-                # Calculate distance matrix
-                distances = pdist(score_matrix)
-                # Perform hierarchical clustering
-                Z = linkage(distances, method='ward')
-                # Find optimal number of clusters (2-4 clusters)
-                max_clusters = min(4, len(scores))
-                best_clusters = 2
-                best_score = -np.inf
-                
-                for n_clusters in range(2, max_clusters + 1):
-                    clusters = fcluster(Z, n_clusters, criterion='maxclust')
-                    # Calculate cluster separation metric
-                    cluster_means = []
-                    for i in range(1, n_clusters + 1):
-                        cluster_scores = scores[clusters == i]
-                        if len(cluster_scores) > 0:  # Check if cluster has elements
-                            cluster_means.append(np.mean(cluster_scores))
-                        else:
-                            cluster_means.append(0)  # Assign 0 to empty clusters
-                            
-                    if len(cluster_means) > 1:
-                        sorted_means = sorted(cluster_means, reverse=True)
-                        separation = sorted_means[0] - sorted_means[1]  # Explicit calculation instead of np.diff
-                        if separation > best_score:
-                            best_score = separation
-                            best_clusters = n_clusters
-                
-                # Get the clusters
-                clusters = fcluster(Z, best_clusters, criterion='maxclust')
-                # Find the cluster with the highest mean score
-                cluster_means = []
-                for i in range(1, best_clusters + 1):
-                    cluster_scores = scores[clusters == i]
-                    if len(cluster_scores) > 0:  # Check if cluster has elements
-                        cluster_means.append((i, np.mean(cluster_scores)))
-                    else:
-                        cluster_means.append((i, 0))  # Assign 0 to empty clusters
-                
-                if cluster_means:  # Make sure we have clusters
-                    top_cluster = max(cluster_means, key=lambda x: x[1])[0]
-                    # Keep only pockets in the top cluster
-                    filtered_pockets = [p for i, p in enumerate(consensus_pockets) if clusters[i] == top_cluster]
-                    
-                    if filtered_pockets:  # Make sure we have pockets after filtering
-                        logger.info(f"Automatic filtering identified {len(filtered_pockets)} significant pockets out of {len(consensus_pockets)} total")
-                        consensus_pockets = filtered_pockets
-                    else:
-                        logger.warning("Clustering resulted in empty top cluster, keeping all pockets")
-                else:
-                    logger.warning("No valid clusters found, keeping all pockets")
-            except Exception as e:
-                logger.warning(f"Clustering-based filtering failed: {str(e)}. Using all pockets.")
+            values, score_class, weights = np.unique(scores, return_inverse=True, return_counts=True)
+            # Find optimal number of classes (2-4 classes)
+            max_classes = min(4, len(values))
+            best_starts = None
+            best_score = -np.inf
+            
+            for n_classes in range(2, max_classes + 1):
+                starts = natural_breaks(values, n_classes, weights)
+                # Calculate class separation metric: gap between the means of the two highest classes
+                top_mean = np.average(values[starts[-1]:], weights=weights[starts[-1]:])
+                second_mean = np.average(values[starts[-2]:starts[-1]], weights=weights[starts[-2]:starts[-1]])
+                separation = top_mean - second_mean
+                if separation > best_score:
+                    best_score = separation
+                    best_starts = starts
+            
+            if best_starts is not None:
+                # Keep only pockets in the top class
+                filtered_pockets = [p for p, c in zip(consensus_pockets, score_class) if c >= best_starts[-1]]
+                logger.info(f"Automatic filtering identified {len(filtered_pockets)} significant pockets out of {len(consensus_pockets)} total")
+                consensus_pockets = filtered_pockets
         
         # Method 2: Fallback - Use statistical outlier detection if clustering fails or for small datasets
         if len(consensus_pockets) <= 2 or len(consensus_pockets) == len(scores):
@@ -153,7 +183,7 @@ def final_scoring(consensus_pockets, protein_type):
                             with warnings.catch_warnings():
                                 warnings.filterwarnings('ignore', category=RuntimeWarning)
                                 # Calculate Z-scores of the consensus scores
-                                z_scores = zscore(scores)
+                                z_scores = (scores - np.mean(scores)) / np.std(scores)
                             
                             # Keep pockets with z-score > 0 (above average) or top pocket if all are below average
                             significant_indices = np.where(z_scores > 0)[0]
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Memory Module
+====================
+This module hands structure arrays to worker processes through
+multiprocessing.shared_memory instead of pickling Biopython objects or
+parsing the file again in every worker.
+
+The parent places the arrays in one shared block and passes a small
+picklable handle; workers attach to the block and get NumPy views on it
+without copying. Only the process that created a block unlinks it, when it
+is closed, garbage collected or at interpreter exit; workers only close
+their mapping.
+
+Only the arrays are shared. map_structure also rebuilds the Biopython
+objects of the structure in every worker (about 1 KB per atom, compared
+with about 50 bytes per atom in the block), so it saves the parsing and
+DSSP but not the memory of a per-worker structure. Tasks that only need
+the arrays, or a small part of the structure, should use map_arrays.
+
+Example:
+    >>> with share_structure(protein) as block:
+    ...     results = map_structure(count_atoms_near, protein, centers, n_workers=4, shared=block)
+"""
+
+import weakref
+import threading
+import numpy as np
+from typing import NamedTuple
+from multiprocessing import shared_memory
+
+from ConSBind.core.arrays import structure_to_arrays, arrays_to_structure, residue_asa
+
+ALIGNMENT = 64
+
+# Serializes the temporary resource tracker patch in _attach_block
+_attach_lock = threading.Lock()
+
+
+class SharedHandle(NamedTuple):
+    """Picklable description of a shared block: its name, array layout and metadata"""
+    name: str
+    layout: dict
+    metadata: dict
+
+def _attach_block(name):
+    """Attach to an existing block without registering it for cleanup in this process"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older versions register every attachment with the resource tracker,
+        # which would unlink the block when a worker with its own tracker exits
+        from multiprocessing import resource_tracker
+        with _attach_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                return shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+def _release(block, unlink):
+    """Close a block and, in the creating process, remove it"""
+    try:
+        block.close()
+    except BufferError:
+        pass  # Views are still alive; the mapping is freed when they are
+    if unlink:
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+class SharedArrays:
+    """A set of named NumPy arrays stored in one shared memory block"""
+
+    def __init__(self, block, layout, metadata, owner):
+        """Use SharedArrays.create() or SharedArrays.attach()"""
+        self._block = block
+        self.handle = SharedHandle(block.name, layout, metadata)
+        self.owner = owner
+        self.arrays = {}
+        for name, (descr, shape, offset) in layout.items():
+            array = np.ndarray(tuple(shape), dtype=np.lib.format.descr_to_dtype(descr),
+                               buffer=block.buf, offset=offset)
+            if not owner:
+                array.flags.writeable = False
+            self.arrays[name] = array
+        self._finalizer = weakref.finalize(self, _release, block, owner)
+
+    @classmethod
+    def create(cls, arrays, metadata=None):
+        """
+        Copy arrays into a new shared block
+
+        Parameters:
+        -----------
+        arrays : dict
+            Name -> NumPy array
+        metadata : dict, optional
+            Small picklable values passed along with the handle
+
+        Returns:
+        --------
+        SharedArrays
+            Owner of the block; pass its .handle to other processes
+        """
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            layout[name] = (np.lib.format.dtype_to_descr(array.dtype), list(array.shape), offset)
+            offset += array.nbytes
+
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        shared = cls(block, layout, metadata or {}, owner=True)
+        for name, array in arrays.items():
+            shared.arrays[name][...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, handle):
+        """Attach to a block created by another process; arrays are read-only views"""
+        return cls(_attach_block(handle.name), handle.layout, handle.metadata, owner=False)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def nbytes(self):
+        """Size of the shared block in bytes"""
+        return self._block.size
+
+    def close(self):
+        """Drop the array views and release the block (and remove it, if this process created it)"""
+        self.arrays = {}
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def share_structure(protein, extra=None):
+    """
+    Place the arrays of a structure in shared memory
+
+    Parameters:
+    -----------
+    protein : ProteinStructure
+        Structure to share
+    extra : dict, optional
+        Additional arrays to share with it (e.g. a precomputed grid)
+
+    Returns:
+    --------
+    SharedArrays
+        Owner of the block, with 'coords', 'atoms', 'residues' and the extra arrays
+    """
+    arrays = structure_to_arrays(protein.model, protein.rel_asa)
+    arrays.update(extra or {})
+    return SharedArrays.create(arrays, {'pdb_id': protein.pdb_id, 'pdb_file': str(protein.pdb_file)})
+
+def attach_structure(handle):
+    """
+    Rebuild a ProteinStructure from a shared block, without parsing or DSSP
+
+    The coordinates stay in the block, but the Biopython objects (about 1 KB
+    per atom) are built in the calling process.
+
+    Returns:
+    --------
+    tuple
+        (protein, shared) where shared must stay open while protein.coords is used
+    """
+    from ConSBind.core.structure import ProteinStructure
+
+    shared = SharedArrays.attach(handle)
+    structure = arrays_to_structure(handle.metadata['pdb_id'], shared['coords'], shared['atoms'], shared['residues'])
+    protein = ProteinStructure(handle.metadata['pdb_file'], structure=structure,
+                               rel_asa=residue_asa(shared['residues']) or {})
+    protein.pdb_id = handle.metadata['pdb_id']
+
+    # The coordinate array used by the numeric code is the shared block itself
+    protein._coords = shared['coords']
+    return protein, shared
+
+# Structure attached by this worker process
+_worker = {}
+
+def _init_worker(handle):
+    """Attach once per worker process and keep the structure for all its tasks"""
+    from multiprocessing import util
+    _worker['protein'], _worker['shared'] = attach_structure(handle)
+    util.Finalize(None, _worker['shared'].close, exitpriority=10)
+
+def _run_task(func, task):
+    return func(_worker['protein'], task)
+
+def map_structure(func, protein, tasks, n_workers=None, shared=None):
+    """
+    Run func(protein, task) for every task in worker processes that share the structure arrays
+
+    Every worker builds its own ProteinStructure from the arrays (see attach_structure).
+
+    Parameters:
+    -----------
+    func : callable
+        Top-level (picklable) function taking the worker's ProteinStructure and a task
+    protein : ProteinStructure
+        Structure the tasks operate on
+    tasks : iterable
+        Picklable task arguments
+    n_workers : int, optional
+        Number of worker processes (default: number of CPUs)
+    shared : SharedArrays, optional
+        Block created with share_structure(protein); created and removed here if not given
+
+    Returns:
+    --------
+    list
+        Results in task order
+    """
+    from functools import partial
+    from concurrent.futures import ProcessPoolExecutor
+
+    block = shared if shared is not None else share_structure(protein)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(block.handle,)) as executor:
+            return list(executor.map(partial(_run_task, func), tasks))
+    finally:
+        if shared is None:
+            block.close()
+
+def _init_array_worker(handle):
+    """Attach once per worker process to a block of arrays, without building a structure"""
+    from multiprocessing import util
+    _worker['arrays'] = SharedArrays.attach(handle)
+    util.Finalize(None, _worker['arrays'].close, exitpriority=10)
+
+def _run_array_task(func, task):
+    return func(_worker['arrays'], task)
+
+def map_arrays(func, shared, tasks, n_workers=None):
+    """
+    Run func(arrays, task) for every task in worker processes attached to one shared block
+
+    Unlike map_structure, workers only get the arrays (read-only views), so
+    tasks that need a small part of a large structure do not rebuild all of it.
+
+    Parameters:
+    -----------
+    func : callable
+        Top-level (picklable) function taking a SharedArrays and a task
+    shared : SharedArrays
+        Block created with SharedArrays.create() or share_structure()
+    tasks : iterable
+        Picklable task arguments
+    n_workers : int, optional
+        Number of worker processes (default: number of CPUs)
+
+    Returns:
+    --------
+    list
+        Results in task order
+    """
+    from functools import partial
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_array_worker,
+                             initargs=(shared.handle,)) as executor:
+        return list(executor.map(partial(_run_array_task, func), tasks))
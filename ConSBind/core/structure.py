@@ -10,11 +10,8 @@ This module handles the loading and analysis of protein structures.
 import os
 import numpy as np
 import logging
-from scipy.spatial import KDTree
-from scipy.spatial.distance import pdist
-from scipy.cluster.hierarchy import linkage, fcluster
-from Bio.PDB import PDBParser, Selection, PDBIO, NeighborSearch
-from Bio.PDB.DSSP import DSSP
+
+from ConSBind.core.pocket import Pocket
 
 # Use the same logger as main to prevent duplicate messages
 logger = logging.getLogger('ConSBind')
@@ -22,39 +19,132 @@ logger = logging.getLogger('ConSBind')
 class ProteinStructure:
     """Class to handle protein structure analysis"""
     
-    def __init__(self, pdb_file):
-        """Initialize with a PDB file"""
+    def __init__(self, pdb_file, structure=None, rel_asa=None):
+        """
+        Initialize with a PDB file, or with a structure already parsed from it
+        
+        Parameters:
+        -----------
+        pdb_file : str
+            Path of the PDB/ENT file (its basename gives the structure id)
+        structure : Bio.PDB.Structure.Structure, optional
+            Already parsed structure; the file is not read if given
+        rel_asa : dict, optional
+            Precomputed relative ASA per (chain id, residue id); DSSP is not
+            run if given
+        """
         self.pdb_file = pdb_file
         self.pdb_id = os.path.splitext(os.path.basename(pdb_file))[0]
         
         # Parse PDB file
-        parser = PDBParser(QUIET=True)
-        try:
-            self.structure = parser.get_structure(self.pdb_id, pdb_file)
-            self.model = self.structure[0]  # Use the first model
-        except Exception as e:
-            logger.error(f"Failed to parse PDB file: {e}")
-            raise
+        if structure is None:
+            from Bio.PDB import PDBParser
+            parser = PDBParser(QUIET=True)
+            try:
+                structure = parser.get_structure(self.pdb_id, pdb_file)
+            except Exception as e:
+                logger.error(f"Failed to parse PDB file: {e}")
+                raise
+        self.structure = structure
+        self.model = self.structure[0]  # Use the first model
+        
+        # Lazily built indexes, shared by every method and every pocket search
+        self._atoms = None
+        self._coords = None
+        self._kdtree = None
+        self._neighbor_search = None
+        self._residue_table = None
+        self._surface_atoms = {}
             
         # Calculate structure properties
-        self.calculate_surface_properties()
+        if rel_asa is None:
+            self.calculate_surface_properties()
+        else:
+            self.dssp_data = None
+            self.rel_asa = rel_asa
+    
+    @classmethod
+    def from_archive(cls, archive, pdb_id):
+        """
+        Open a structure from a packed corpus archive, without parsing any text
+        
+        Parameters:
+        -----------
+        archive : CorpusArchive or str
+            Open archive or path to an archive written by pack_corpus
+        pdb_id : str
+            Identifier of the structure in the archive
+        """
+        from ConSBind.input.archive import CorpusArchive
+        if not isinstance(archive, CorpusArchive):
+            archive = CorpusArchive(archive)
+        return archive.load(pdb_id)
+    
+    @property
+    def atoms(self):
+        """All atoms of the model"""
+        if self._atoms is None:
+            from Bio.PDB import Selection
+            self._atoms = Selection.unfold_entities(self.model, 'A')
+        return self._atoms
+    
+    @property
+    def coords(self):
+        """Coordinates of all atoms of the model as an (n, 3) array"""
+        if self._coords is None:
+            self._coords = np.array([atom.get_coord() for atom in self.atoms])
+        return self._coords
+    
+    @property
+    def kdtree(self):
+        """KDTree over all atom coordinates of the model"""
+        if self._kdtree is None:
+            from scipy.spatial import KDTree
+            self._kdtree = KDTree(self.coords)
+        return self._kdtree
+    
+    @property
+    def neighbor_search(self):
+        """Biopython NeighborSearch over all atoms of the model"""
+        if self._neighbor_search is None:
+            from Bio.PDB import NeighborSearch
+            self._neighbor_search = NeighborSearch(self.atoms)
+        return self._neighbor_search
         
     def calculate_surface_properties(self):
         """Calculate surface properties using DSSP"""
         try:
-            # Run DSSP to get accessible surface area
-            dssp = DSSP(self.model, self.pdb_file, dssp='mkdssp')
+            from Bio.PDB.DSSP import DSSP
+            
+            # Run DSSP to get accessible surface area (.ent files are PDB format)
+            file_type = 'PDB' if os.path.splitext(str(self.pdb_file))[1].lower() == '.ent' else ''
+            dssp = DSSP(self.model, self.pdb_file, dssp='mkdssp', file_type=file_type)
             self.dssp_data = dssp
+            
+            # Relative accessible surface area per (chain id, residue id)
+            self.rel_asa = {key: dssp[key][3] for key in dssp.keys()}
         except Exception as e:
             logger.warning(f"DSSP calculation failed: {e}")
             self.dssp_data = None
+            self.rel_asa = None
     
-    def get_surface_atoms(self, rel_asa_threshold=0.2):
-        """Get atoms on the protein surface based on relative accessible surface area"""
+    def get_surface_atoms(self, rel_asa_threshold=0.2, region=None, extra=5.0):
+        """
+        Get atoms on the protein surface based on relative accessible surface area
+        
+        With a region, only atoms inside its box grown by extra Å are
+        classified (against all atoms of the structure).
+        """
+        memo_key = (rel_asa_threshold, region.key if region is not None else None)
+        if memo_key in self._surface_atoms:
+            return self._surface_atoms[memo_key]
+        
         surface_atoms = []
         
-        if self.dssp_data is None:
+        if not self.rel_asa:
             # If DSSP failed, use distance-based approach
+            from Bio.PDB import Selection
+            from scipy.spatial import KDTree
             all_atoms = Selection.unfold_entities(self.structure, 'A')
             
             # Create KDTree for efficient neighbor search
@@ -62,7 +152,10 @@ class ProteinStructure:
             kdtree = KDTree(coords)
             
             # Identify surface atoms as those with fewer neighbors
-            for i, atom in enumerate(all_atoms):
+            candidates = all_atoms
+            if region is not None:
+                candidates = [atom for atom, inside in zip(all_atoms, region.contains(coords, extra)) if inside]
+            for atom in candidates:
                 # Count neighbors within 8Å
                 neighbors = kdtree.query_ball_point(atom.get_coord(), 8.0)
                 if len(neighbors) < 15:  # Threshold for surface atoms
@@ -70,9 +163,7 @@ class ProteinStructure:
         else:
             # Use DSSP data to identify surface residues
             surface_residues = []
-            for key in self.dssp_data.keys():
-                data = self.dssp_data[key]
-                rel_asa = data[3]  # Relative accessible surface area
+            for key, rel_asa in self.rel_asa.items():
                 if rel_asa > rel_asa_threshold:
                     chain_id, residue_id = key[0], key[1]
                     residue = self.model[chain_id][residue_id]
@@ -83,45 +174,57 @@ class ProteinStructure:
                 for atom in residue:
                     if atom.get_name() not in ['H', 'HA']:  # Skip hydrogen atoms
                         surface_atoms.append(atom)
+            
+            if region is not None and surface_atoms:
+                inside = region.contains(np.array([atom.get_coord() for atom in surface_atoms]), extra)
+                surface_atoms = [atom for atom, keep in zip(surface_atoms, inside) if keep]
         
         logger.info(f"Identified {len(surface_atoms)} surface atoms")
+        self._surface_atoms[memo_key] = surface_atoms
         return surface_atoms
     
-    def get_cavities(self, probe_radius=1.4, grid_spacing=1.0, min_cavity_size=5, detect_filled = True):
+    def get_cavities(self, probe_radius=1.4, grid_spacing=1.0, min_cavity_size=5, detect_filled = True,
+                     search='uniform', region=None):
         """
         Find cavities using a grid-based approach, with option to detect filled cavities
+        
+        search selects how the grid is explored: 'uniform' tests a random sample
+        of the whole grid, 'adaptive' draws the same sample but only tests the
+        points a coarse-to-fine search could not rule out (see _adaptive_cavity_points),
+        'edt' evaluates the whole grid at once from a distance transform (see _edt_cavity_points)
+        
+        With a region (see ConSBind.core.region), only the part of the grid in
+        the region's box is built and sampled; all atoms are still used.
         """
+        if search == 'adaptive':
+            cavity_points = self._adaptive_cavity_points(probe_radius, grid_spacing, detect_filled, region=region)
+            return self._cluster_cavities(cavity_points, min_cavity_size)
+        elif search == 'edt':
+            cavity_points = self._edt_cavity_points(probe_radius, grid_spacing, detect_filled, region=region)
+            return self._cluster_cavities(cavity_points, min_cavity_size)
+        elif search != 'uniform':
+            raise ValueError(f"Unknown cavity search: {search}")
+        
         # Get protein atoms
-        atoms = Selection.unfold_entities(self.model, 'A')
-        coords = np.array([atom.get_coord() for atom in atoms])
+        atoms = self.atoms
+        coords = self.coords
 
         # Identify possible hetero atoms and exclude them for cavity detection 
-        hetero_coords = None 
-        if detect_filled:
-            hetero_atoms = [atom for atom in atoms if atom.get_id()[0].strip() not in [' ', 'H']]
-            if hetero_atoms:
-                hetero_coords = np.array([atom.get_coord() for atom in hetero_atoms])
+        hetero_coords = self._filled_site_coords() if detect_filled else None
         
         # Define grid around the protein
-        padding = 10.0  # Å
-        min_coords = np.min(coords, axis=0) - padding
-        max_coords = np.max(coords, axis=0) + padding
-        
-        # Generate grid points
-        x = np.arange(min_coords[0], max_coords[0], grid_spacing)
-        y = np.arange(min_coords[1], max_coords[1], grid_spacing)
-        z = np.arange(min_coords[2], max_coords[2], grid_spacing)
+        x, y, z = self._cavity_grid(grid_spacing, region=region)
         
         logger.info(f"Created grid with dimensions: {len(x)}x{len(y)}x{len(z)}")
         
-        # Create KDTree for efficient distance calculations
-        kdtree = KDTree(coords)
+        # KDTree for efficient distance calculations
+        kdtree = self.kdtree
         
         # Identify cavity points
         cavity_points = []
         
         # Sample grid points
-        sample_size = min(10000, len(x) * len(y) * len(z))
+        sample_size = self._cavity_sample_size(10000, len(x) * len(y) * len(z), grid_spacing, region)
         indices = np.random.choice(len(x) * len(y) * len(z), size=sample_size, replace=False)
         
         for idx in indices:
@@ -216,6 +319,8 @@ class ProteinStructure:
         
         # Cluster cavity points
         if len(cavity_points) > 1:
+            from scipy.spatial.distance import pdist
+            from scipy.cluster.hierarchy import linkage, fcluster
             cavity_points = np.array(cavity_points)
             distances = pdist(cavity_points)
             linkage_matrix = linkage(distances, method='single')
@@ -231,17 +336,313 @@ class ProteinStructure:
                 cluster_mask = clusters == cluster_id
                 cluster_points = cavity_points[cluster_mask]
                 center = np.mean(cluster_points, axis=0)
-                cavity_centers.append({
-                    'center': center,
-                    'size': len(cluster_points),
-                    'points': cluster_points
-                })
+                cavity_centers.append(Pocket(center, len(cluster_points), cluster_points))
             
             logger.info(f"Found {len(cavity_centers)} cavities after clustering")
             return cavity_centers
         else:
             return []
 
+    def _filled_site_coords(self):
+        """Coordinates of the atoms used to detect filled cavities, or None"""
+        hetero_atoms = [atom for atom in self.atoms if atom.get_id()[0].strip() not in [' ', 'H']]
+        if hetero_atoms:
+            return np.array([atom.get_coord() for atom in hetero_atoms])
+        return None
+    
+    def _cavity_grid(self, grid_spacing, padding=10.0, region=None, extra=0.0):
+        """Axes of the cavity search grid, padded around the protein (Å), optionally restricted to a region's box"""
+        min_coords = np.min(self.coords, axis=0) - padding
+        max_coords = np.max(self.coords, axis=0) + padding
+        axes = tuple(np.arange(min_coords[axis], max_coords[axis], grid_spacing) for axis in range(3))
+        if region is not None:
+            axes = region.clip_axes(axes, extra)
+        return axes
+    
+    def _cavity_sample_size(self, limit, n_points, grid_spacing, region=None):
+        """Grid points sampled by the cavity search; a region gets its share of a full scan's sample"""
+        from ConSBind.core.region import sample_size
+        if region is None:
+            return sample_size(limit, n_points)
+        return sample_size(limit, n_points, region.full_grid_size(grid_spacing, 10.0))
+    
+    @staticmethod
+    def _enclosed(kdtree, points, hit_radius):
+        """
+        Ray-casting enclosure test used by the cavity search, for many points at once
+        
+        A point is enclosed if each of the six axis-aligned rays, sampled every
+        1 Å up to 9 Å, passes closer than hit_radius (scalar or one value per
+        point) to an atom.
+        """
+        directions = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]])
+        steps = np.arange(1.0, 10.0, 1.0)
+        hit_radius = np.broadcast_to(np.asarray(hit_radius, dtype=float), (len(points),))
+        
+        enclosed = np.ones(len(points), dtype=bool)
+        for direction in directions:
+            candidates = np.flatnonzero(enclosed)
+            if len(candidates) == 0:
+                break
+            rays = points[candidates, None, :] + steps[None, :, None] * direction
+            distances, _ = kdtree.query(rays.reshape(-1, 3), distance_upper_bound=float(hit_radius.max()))
+            hit = (distances.reshape(len(candidates), len(steps)) < hit_radius[candidates, None]).any(axis=1)
+            enclosed[candidates[~hit]] = False
+        return enclosed
+    
+    def _adaptive_cavity_points(self, probe_radius=1.4, grid_spacing=1.0, detect_filled=True,
+                                coarse_spacing=4.0, sample_limit=10000, region=None):
+        """
+        Cavity points of the uniform search, found with a coarse-to-fine (octree) search
+        
+        The grid is split into cubic blocks about coarse_spacing wide. A block is
+        refined into 8 children only if one of its points could be a cavity
+        point: its center must lie within 4 Å + h of an atom and pass the ray
+        test with the hit radius widened by h, where h is the distance from the
+        center to the block's farthest point. Both bounds hold for every point
+        of the block, so no cavity point is ever discarded.
+        
+        The uniform search tests a random sample of sample_limit grid points.
+        The same sample is drawn here by taking a hypergeometric share of it
+        from the candidate region and none from the rest of the grid, where the
+        test is known to fail. Only that share is tested, so the cavity points
+        follow exactly the distribution of the uniform search.
+        
+        Returns:
+        --------
+        numpy.ndarray
+            (n, 3) cavity points; as in the uniform search, points that pass the
+            distance test and the filled-cavity test are listed twice
+        """
+        from scipy.spatial import KDTree
+        
+        x, y, z = self._cavity_grid(grid_spacing, region=region)
+        shape = np.array([len(x), len(y), len(z)])
+        origin = np.array([x[0], y[0], z[0]])
+        n_total = int(np.prod(shape))
+        logger.info(f"Created grid with dimensions: {shape[0]}x{shape[1]}x{shape[2]}")
+        
+        kdtree = self.kdtree
+        hetero_coords = self._filled_site_coords() if detect_filled else None
+        hetero_tree = KDTree(hetero_coords) if hetero_coords is not None else None
+        
+        # Octree over grid indices: block corners and a common edge length per level
+        size = 1 << max(0, int(np.ceil(np.log2(max(coarse_spacing / grid_spacing, 1.0)))))
+        corners = np.stack(np.meshgrid(*[np.arange(0, n, size) for n in shape], indexing='ij'), axis=-1).reshape(-1, 3)
+        blocks_tested = 0
+        
+        while True:
+            extent = np.minimum(corners + size, shape) - corners  # Points per axis, clipped at the grid edge
+            centers = origin + (corners + (extent - 1) / 2.0) * grid_spacing
+            half_diagonal = np.linalg.norm((extent - 1) * grid_spacing, axis=1) / 2.0
+            blocks_tested += len(corners)
+            
+            distances, _ = kdtree.query(centers, distance_upper_bound=4.0 + half_diagonal.max())
+            keep = distances < 4.0 + half_diagonal
+            keep[keep] = self._enclosed(kdtree, centers[keep], probe_radius + half_diagonal[keep])
+            corners = corners[keep]
+            
+            if size <= 2 or len(corners) == 0:
+                break
+            
+            # Split the remaining blocks into 8 children and drop those outside the grid
+            size //= 2
+            offsets = np.array([[i, j, k] for i in (0, size) for j in (0, size) for k in (0, size)])
+            corners = (corners[:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+            corners = corners[(corners < shape).all(axis=1)]
+        
+        # Grid points of the remaining blocks (linear indices, as in the uniform search)
+        if len(corners):
+            local = np.stack(np.meshgrid(*[np.arange(size)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+            indices = (corners[:, None, :] + local[None, :, :]).reshape(-1, 3)
+            indices = indices[(indices < shape).all(axis=1)]
+            candidates = np.unique(np.ravel_multi_index(indices.T, shape))
+        else:
+            candidates = np.empty(0, dtype=np.int64)
+        
+        # Share of the uniform sample that falls in the candidate region
+        sample_size = self._cavity_sample_size(sample_limit, n_total, grid_spacing, region)
+        n_sampled = 0
+        if len(candidates):
+            n_sampled = np.random.hypergeometric(len(candidates), n_total - len(candidates), sample_size) \
+                if n_total > len(candidates) else sample_size
+        sample = np.random.choice(candidates, size=n_sampled, replace=False) if n_sampled else candidates[:0]
+        points = origin + np.stack(np.unravel_index(sample, shape), axis=-1) * grid_spacing
+        
+        # Exact test of the sampled points
+        distances, _ = kdtree.query(points, distance_upper_bound=4.0) if len(points) else (np.empty(0), None)
+        pocket = (probe_radius < distances) & (distances < 4.0)
+        condition = pocket.copy()
+        if hetero_tree is not None and len(points):
+            hetero_distances, _ = hetero_tree.query(points, distance_upper_bound=4.0)
+            condition |= hetero_distances < 4.0
+        enclosed = np.zeros(len(points), dtype=bool)
+        enclosed[condition] = self._enclosed(kdtree, points[condition], probe_radius)
+        
+        cavity_points = np.concatenate([points[condition & enclosed], points[pocket & enclosed]])
+        logger.info(f"Adaptive search tested {blocks_tested} blocks and {len(points)} of {n_total} grid points "
+                    f"({len(candidates)} candidates)")
+        logger.info(f"Found {len(cavity_points)} potential cavity points")
+        return cavity_points
+    
+    @staticmethod
+    def _distance_field(coords, axes):
+        """
+        Distance from every grid point to the nearest of the given atoms
+        
+        The atoms are rasterized onto the grid and scipy.ndimage.distance_transform_edt
+        finds, for every grid point, the nearest voxel holding an atom. The
+        returned value is the exact distance to the closest of the atoms found
+        for the point and its 26 neighbours, which is never below the true
+        nearest-atom distance and equals it for all but a few points (where
+        atoms share a voxel).
+        
+        Parameters:
+        -----------
+        coords : numpy.ndarray
+            (n, 3) atom coordinates; atoms outside the grid are ignored
+        axes : tuple
+            Grid coordinates along x, y and z
+            
+        Returns:
+        --------
+        numpy.ndarray
+            Distances with the shape of the grid
+        """
+        from scipy import ndimage
+        
+        shape = tuple(len(axis) for axis in axes)
+        origin = np.array([axis[0] for axis in axes])
+        grid_spacing = axes[0][1] - axes[0][0]
+        
+        voxels = np.rint((coords - origin) / grid_spacing).astype(np.intp)
+        inside = np.flatnonzero(((voxels >= 0) & (voxels < np.array(shape))).all(axis=1))
+        if len(inside) == 0:
+            return np.full(shape, np.inf)
+        owner = np.full(shape, -1, dtype=np.int32)
+        owner[tuple(voxels[inside].T)] = inside.astype(np.int32)
+        
+        nearest = ndimage.distance_transform_edt(owner < 0, return_distances=False, return_indices=True)
+        features = owner[tuple(nearest)]
+        del nearest
+        
+        squared = np.full(shape, np.inf)
+        for offset in [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)]:
+            # Wrapping at the grid edge only adds candidate atoms, it cannot lower a distance
+            candidates = coords[np.roll(features, offset, axis=(0, 1, 2))]
+            candidate_squared = np.zeros(shape)
+            for axis, values in enumerate(axes):
+                view = [None, None, None]
+                view[axis] = slice(None)
+                candidate_squared += (values[tuple(view)] - candidates[..., axis]) ** 2
+            np.minimum(squared, candidate_squared, out=squared)
+        return np.sqrt(squared)
+    
+    def _edt_cavity_points(self, probe_radius=1.4, grid_spacing=1.0, detect_filled=True, sample_limit=10000,
+                           region=None):
+        """
+        Cavity points of the uniform search, evaluated on the whole grid from a distance transform
+        
+        The distance field replaces the per-point KDTree queries: the cavity
+        and filled-cavity tests become array comparisons, and each ray of the
+        enclosure test becomes the distance field shifted along an axis, so
+        the cost is linear in the grid size. The random sample of the uniform
+        search is then read from the resulting masks, so the cavity points
+        follow the same distribution, up to the few points where the distance
+        field overestimates (see _distance_field).
+        
+        With a region, the masks are computed on the region's box grown by the
+        ray length and probe radius, so atoms outside the box still count, and
+        sampled inside the box.
+        
+        Returns:
+        --------
+        numpy.ndarray
+            (n, 3) cavity points; as in the uniform search, points that pass the
+            distance test and the filled-cavity test are listed twice
+        """
+        axes = self._cavity_grid(grid_spacing, region=region, extra=10.0 + probe_radius)
+        shape = tuple(len(axis) for axis in axes)
+        
+        # Part of the grid that is sampled (all of it without a region)
+        inner = tuple(slice(None) for _ in axes)
+        if region is not None:
+            inner = tuple(slice(np.searchsorted(axis, clipped[0]), np.searchsorted(axis, clipped[0]) + len(clipped))
+                          for axis, clipped in zip(axes, self._cavity_grid(grid_spacing, region=region)))
+        inner_axes = tuple(axis[bounds] for axis, bounds in zip(axes, inner))
+        inner_shape = tuple(len(axis) for axis in inner_axes)
+        n_total = int(np.prod(inner_shape))
+        logger.info(f"Created grid with dimensions: {inner_shape[0]}x{inner_shape[1]}x{inner_shape[2]}")
+        
+        distances = self._distance_field(self.coords, axes)
+        pocket = (probe_radius < distances) & (distances < 4.0)
+        condition = pocket.copy()
+        hetero_coords = self._filled_site_coords() if detect_filled else None
+        if hetero_coords is not None:
+            condition |= self._distance_field(hetero_coords, axes) < 4.0
+        
+        # Enclosure: along each axis direction, a ray step of t Å is a shift of t / grid_spacing points
+        hit = distances < probe_radius
+        del distances
+        shifts = np.unique(np.rint(np.arange(1.0, 10.0, 1.0) / grid_spacing).astype(int))
+        enclosed = condition.copy()
+        for axis in range(3):
+            for sign in (1, -1):
+                reached = np.zeros(shape, dtype=bool)
+                for shift in shifts[(shifts > 0) & (shifts < shape[axis])]:
+                    target = [slice(None)] * 3
+                    source = [slice(None)] * 3
+                    if sign > 0:
+                        target[axis], source[axis] = slice(None, -shift), slice(shift, None)
+                    else:
+                        target[axis], source[axis] = slice(shift, None), slice(None, -shift)
+                    reached[tuple(target)] |= hit[tuple(source)]
+                enclosed &= reached
+        
+        # Same random sample as the uniform search
+        sample_size = self._cavity_sample_size(sample_limit, n_total, grid_spacing, region)
+        sample = np.random.choice(n_total, size=sample_size, replace=False)
+        indices = np.unravel_index(sample, inner_shape)
+        points = np.stack([inner_axes[axis][indices[axis]] for axis in range(3)], axis=-1)
+        enclosed, pocket = enclosed[inner], pocket[inner]
+        enclosed = enclosed[indices]
+        
+        cavity_points = np.concatenate([points[enclosed], points[enclosed & pocket[indices]]])
+        logger.info(f"Found {len(cavity_points)} potential cavity points")
+        return cavity_points
+    
+    def _cluster_cavities(self, cavity_points, min_cavity_size):
+        """
+        Cluster cavity points into pockets by single linkage at 3 Å
+        
+        Single linkage with a distance cut is the connected components of the
+        graph linking points at most 3 Å apart, which a KDTree finds without
+        the quadratic distance matrix.
+        """
+        from scipy.spatial import KDTree
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        
+        if len(cavity_points) <= 1:
+            return []
+        
+        pairs = KDTree(cavity_points).query_pairs(r=3.0, output_type='ndarray')
+        graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                           shape=(len(cavity_points), len(cavity_points)))
+        _, clusters = connected_components(graph, directed=False)
+        
+        # Filter clusters by size
+        unique_clusters, counts = np.unique(clusters, return_counts=True)
+        valid_clusters = unique_clusters[counts >= min_cavity_size]
+        
+        cavity_centers = []
+        for cluster_id in valid_clusters:
+            cluster_points = cavity_points[clusters == cluster_id]
+            cavity_centers.append(Pocket(np.mean(cluster_points, axis=0), len(cluster_points), cluster_points))
+        
+        logger.info(f"Found {len(cavity_centers)} cavities after clustering")
+        return cavity_centers
+    
     def calculate_hydrophobicity(self, center, radius=8.0):
         """Calculate average hydrophobicity around a center point"""
         # Kyte & Doolittle hydrophobicity scale
@@ -252,8 +653,7 @@ class ProteinStructure:
         }
         
         # Find residues within radius of center
-        atoms = Selection.unfold_entities(self.model, 'A')
-        ns = NeighborSearch(atoms)
+        ns = self.neighbor_search
         nearby_atoms = ns.search(center, radius, 'R')  # Search for residues
         
         if not nearby_atoms:
@@ -279,8 +679,7 @@ class ProteinStructure:
         }
         
         # Find residues within radius of center
-        atoms = Selection.unfold_entities(self.model, 'A')
-        ns = NeighborSearch(atoms)
+        ns = self.neighbor_search
         nearby_atoms = ns.search(center, radius, 'R')  # Search for residues
         
         # Sum charges with distance weighting
@@ -300,22 +699,88 @@ class ProteinStructure:
         
         return total_charge
     
-    def get_pocket_residues(self, pocket, radius=8.0):
-        """Get residues within a certain radius of a pocket center"""
-        atoms = Selection.unfold_entities(self.model, 'A')
-        ns = NeighborSearch(atoms)
-        nearby_atoms = ns.search(pocket['center'], radius, 'R')  # Search for residues
+    @property
+    def residue_table(self):
+        """
+        Residue of every atom, for batched residue lookups
         
-        # Create a list of unique residues
-        residues = set()
-        for residue in nearby_atoms:
-            # Only consider standard amino acids
-            if residue.get_resname() in ['ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 
-                                    'ILE', 'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 
-                                    'TYR', 'VAL']:
-                chain_id = residue.get_parent().id
-                res_id = residue.id[1]
-                res_name = residue.get_resname()
-                residues.add((chain_id, res_id, res_name))
-        
-        return sorted(residues)
+        Returns:
+        --------
+        tuple
+            (atom_residue, residues) where atom_residue[i] indexes the
+            (chain id, residue number, residue name) list residues for atom i
+            of self.atoms, or is -1 if the residue is not a standard amino acid
+        """
+        if self._residue_table is None:
+            standard = {'ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 
+                        'ILE', 'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 
+                        'TYR', 'VAL'}
+            positions = {}
+            residues = []
+            atom_residue = np.full(len(self.atoms), -1, dtype=np.int64)
+            for i, atom in enumerate(self.atoms):
+                residue = atom.get_parent()
+                if residue.get_resname() not in standard:
+                    continue
+                # Residues with the same chain, number and name count once, as in a set
+                key = (residue.get_parent().id, residue.id[1], residue.get_resname())
+                if key not in positions:
+                    positions[key] = len(residues)
+                    residues.append(key)
+                atom_residue[i] = positions[key]
+            self._residue_table = (atom_residue, residues)
+        return self._residue_table
+    
+    def get_residues_near(self, centers, radius=8.0):
+        """
+        Standard residues with an atom within radius of each of several centers, in one spatial query
+        
+        Parameters:
+        -----------
+        centers : array-like
+            (n, 3) center coordinates
+        radius : float or array-like
+            Search radius in Å, shared or one per center (default: 8.0)
+            
+        Returns:
+        --------
+        list
+            For each center, the sorted (chain id, residue number, residue name) tuples
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        if len(centers) == 0:
+            return []
+        
+        atom_residue, residues = self.residue_table
+        neighbors = self.kdtree.query_ball_point(centers, np.broadcast_to(radius, (len(centers),)))
+        
+        found = []
+        for atom_indices in neighbors:
+            residue_indices = np.unique(atom_residue[np.asarray(atom_indices, dtype=np.int64)])
+            found.append(sorted(residues[i] for i in residue_indices if i >= 0))
+        return found
+    
+    def get_pockets_residues(self, pockets, radius=8.0):
+        """
+        Residues around the centers of several pockets, memoized on each pocket
+        
+        Pockets that were not looked up at this radius yet are resolved with
+        one batched query (see get_residues_near).
+        
+        Returns:
+        --------
+        list
+            Residue lists, in pocket order
+        """
+        missing = [pocket for pocket in pockets if radius not in (pocket.get('residues') or {})]
+        if missing:
+            found = self.get_residues_near([pocket['center'] for pocket in missing], radius)
+            for pocket, residues in zip(missing, found):
+                if pocket.get('residues') is None:
+                    pocket['residues'] = {}
+                pocket['residues'][radius] = residues
+        return [pocket['residues'][radius] for pocket in pockets]
+    
+    def get_pocket_residues(self, pocket, radius=8.0):
+        """Get residues within a certain radius of a pocket center (memoized on the pocket)"""
+        return self.get_pockets_residues([pocket], radius)[0]
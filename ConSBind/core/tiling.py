@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Spatial Tiling Module
+=====================
+This module runs the geometric and energy pocket searches on very large
+assemblies (ribosomes, capsids, cryo-EM maps) as independent spatial tiles,
+so the size of the search grids and of the clustering is bounded by the
+tile size instead of the assembly size.
+
+The padded box of the structure is cut into cubic tiles. Every point of
+space is owned by exactly one tile. Each tile is searched in its own box,
+grown by an overlap so pockets crossing its border are seen whole, using
+a local structure made of the atoms around that box (with its own atom
+index). Its grids get their share of the sample of a full scan of the
+whole structure, as for a Region, so the density of sampled points does
+not change. Tiles run in parallel worker processes that share the
+structure arrays.
+
+The pockets of all tiles are then merged deterministically: each pocket
+keeps only the points its tile owns, and pieces from different tiles that
+come within the clustering distance of each other are joined, in tile
+order. The merged pockets go to combine_pockets as usual.
+
+Usage:
+    python main.py assembly.pdb --tile_size 40 --workers 8
+"""
+
+import logging
+import numpy as np
+from typing import NamedTuple
+
+from ConSBind.core.pocket import Pocket
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+# Atoms kept around a tile's box: rays (9 Å) plus probe radius for enclosure,
+# 5 + 8 Å for the surface atoms and energies of the energy search
+ENVIRONMENT_MARGIN = 15.0
+
+# Distance linking pocket pieces of neighbouring tiles (the clustering distances)
+GEOMETRIC_LINK_DISTANCE = 3.0
+ENERGY_LINK_DISTANCE = 3.5
+
+
+class Tile(NamedTuple):
+    """One tile: its position in the tiling and the box it is searched in"""
+    index: int
+    position: tuple
+    lower: tuple
+    upper: tuple
+
+class Tiling:
+    """Partition of a box into cubic tiles"""
+
+    def __init__(self, lower, upper, tile_size=40.0, overlap=8.0):
+        """
+        Parameters:
+        -----------
+        lower, upper : array-like
+            Corners of the box to tile (e.g. the padded bounding box of the atoms)
+        tile_size : float
+            Edge of a tile in Å (default: 40.0)
+        overlap : float
+            Distance in Å by which each tile's search box extends into its
+            neighbours (default: 8.0); pockets up to this size that cross a
+            border are seen whole by both tiles
+        """
+        if tile_size <= 0:
+            raise ValueError(f"Tile size must be positive: {tile_size}")
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.tile_size = float(tile_size)
+        self.overlap = float(overlap)
+        self.counts = np.maximum(np.ceil((self.upper - self.lower) / self.tile_size).astype(int), 1)
+
+    def __len__(self):
+        return int(np.prod(self.counts))
+
+    def tiles(self):
+        """All tiles, in a fixed order"""
+        for index, position in enumerate(np.ndindex(*self.counts)):
+            position = np.array(position)
+            lower = np.maximum(self.lower + position * self.tile_size - self.overlap, self.lower)
+            upper = np.minimum(self.lower + (position + 1) * self.tile_size + self.overlap, self.upper)
+            # Outer tiles own everything beyond the box on their side
+            lower[position == 0] = self.lower[position == 0]
+            upper[position == self.counts - 1] = self.upper[position == self.counts - 1]
+            yield Tile(index, tuple(int(p) for p in position), tuple(lower.tolist()), tuple(upper.tolist()))
+
+    def owner(self, points):
+        """Index of the tile owning each of an (n, 3) array of points"""
+        position = np.floor((np.asarray(points, dtype=float) - self.lower) / self.tile_size).astype(int)
+        position = np.clip(position, 0, self.counts - 1)
+        return np.ravel_multi_index(position.T, self.counts)
+
+def _tile_task(shared, task):
+    """Search one tile on a local structure built from the shared arrays (runs in worker processes)"""
+    from ConSBind.core.arrays import subset_arrays, arrays_to_structure, residue_asa
+    from ConSBind.core.structure import ProteinStructure
+    from ConSBind.core.finder import ConsensusPocketFinder
+    from ConSBind.core.region import Region
+
+    tile, pdb_id, pdb_file, params, seed, extent = task
+    # The searches draw from the global generator: seed it for this tile and
+    # hand the caller's state back afterwards (tiles may run in its process)
+    state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        coords = shared['coords']
+        lower, upper = np.array(tile.lower), np.array(tile.upper)
+        environment = ((coords >= lower - ENVIRONMENT_MARGIN) & (coords <= upper + ENVIRONMENT_MARGIN)).all(axis=1)
+        arrays = subset_arrays(shared.arrays, environment)
+
+        structure = arrays_to_structure(pdb_id, arrays['coords'], arrays['atoms'], arrays['residues'])
+        local = ProteinStructure(pdb_file, structure=structure, rel_asa=residue_asa(arrays['residues']) or {})
+        local.pdb_id = pdb_id
+
+        # The tile's box is sampled with its share of the whole structure's grid
+        core = ((local.coords >= lower) & (local.coords <= upper)).all(axis=1)
+        region = Region(local, core, f"tile {tile.index}", bounds=(lower, upper), extent=extent)
+
+        finder = ConsensusPocketFinder()
+        geometric = finder.find_pockets_geometric(local, probe_radius=params.probe_radius,
+                                                  min_size=params.min_size,
+                                                  cavity_search=params.cavity_search, region=region)
+        # Tiles in the bulk of an assembly have no surface atoms, which is expected
+        if local.get_surface_atoms(region=region):
+            energy = finder.find_pockets_energy(local, grid_spacing=params.grid_spacing, region=region)
+        else:
+            logger.debug(f"No surface atoms in tile {tile.index}")
+            energy = []
+        return geometric, energy
+    finally:
+        np.random.set_state(state)
+
+def merge_tile_pockets(tiling, tile_pockets, link_distance):
+    """
+    Merge the pockets found in each tile
+
+    Parameters:
+    -----------
+    tiling : Tiling
+        Tiling the pockets were found with
+    tile_pockets : list
+        (tile index, list of Pocket) pairs, in tile order
+    link_distance : float
+        Pieces of different tiles closer than this are joined
+
+    Returns:
+    --------
+    list
+        Merged pockets; 'score' (if present) is the size-weighted mean of the pieces
+    """
+    from scipy.spatial import KDTree
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    # Keep the points each tile owns
+    pieces = []
+    for tile_index, pockets in tile_pockets:
+        for pocket in pockets:
+            owned = tiling.owner(pocket.points) == tile_index
+            if owned.any():
+                pieces.append((tile_index, pocket, pocket.points[owned]))
+    if not pieces:
+        return []
+
+    # Link pieces of different tiles that touch
+    points = np.concatenate([piece_points for _, _, piece_points in pieces])
+    piece_of = np.repeat(np.arange(len(pieces)), [len(piece_points) for _, _, piece_points in pieces])
+    tile_of = np.array([tile_index for tile_index, _, _ in pieces])
+    pairs = KDTree(points).query_pairs(r=link_distance, output_type='ndarray')
+    links = piece_of[pairs]
+    links = links[tile_of[links[:, 0]] != tile_of[links[:, 1]]]
+    graph = coo_matrix((np.ones(len(links)), (links[:, 0], links[:, 1])), shape=(len(pieces), len(pieces)))
+    _, groups = connected_components(graph, directed=False)
+
+    merged = []
+    for group in range(groups.max() + 1):
+        members = [pieces[i] for i in np.flatnonzero(groups == group)]
+        group_points = np.concatenate([piece_points for _, _, piece_points in members])
+        pocket = Pocket(np.mean(group_points, axis=0), len(group_points), group_points)
+        scores = [(piece.score, len(piece_points)) for _, piece, piece_points in members if 'score' in piece]
+        if scores:
+            pocket.score = sum(score * size for score, size in scores) / sum(size for _, size in scores)
+        merged.append(pocket)
+    return merged
+
+def find_pockets_tiled(protein, params, region=None, n_workers=1, tile_size=40.0, overlap=8.0):
+    """
+    Geometric and energy pockets of a large structure, searched tile by tile
+
+    Parameters:
+    -----------
+    protein : ProteinStructure
+        Structure to search
+    params : PredictionParams
+        Prediction parameters (probe_radius, min_size, cavity_search, grid_spacing)
+    region : Region, optional
+        Restrict the tiling to a region's box
+    n_workers : int
+        Number of worker processes (default: 1, tiles are searched in this process)
+    tile_size, overlap : float
+        See Tiling
+
+    Returns:
+    --------
+    tuple
+        (geometric pockets, energy pockets), ready for combine_pockets
+    """
+    from ConSBind.core.arrays import structure_to_arrays
+    from ConSBind.core.shared import SharedArrays, map_arrays
+
+    coords = protein.coords
+    if region is not None:
+        lower, upper = region.lower, region.upper
+    else:
+        lower, upper = np.min(coords, axis=0) - 10.0, np.max(coords, axis=0) + 10.0
+    tiling = Tiling(lower, upper, tile_size=tile_size, overlap=overlap)
+
+    # Tiles without atoms in their box cannot hold a pocket
+    tiles = [tile for tile in tiling.tiles()
+             if ((coords >= np.array(tile.lower)) & (coords <= np.array(tile.upper))).all(axis=1).any()]
+    logger.info(f"Searching {len(tiles)} of {len(tiling)} tiles of {tile_size:g} Å "
+                f"({overlap:g} Å overlap) with {n_workers} workers")
+
+    # One seed per tile, so the result does not depend on the number of workers
+    seeds = np.random.randint(0, 2**31 - 1, size=len(tiles))
+    extent = (np.min(coords, axis=0), np.max(coords, axis=0))
+    tasks = [(tile, protein.pdb_id, str(protein.pdb_file), params, int(seed), extent)
+             for tile, seed in zip(tiles, seeds)]
+
+    with SharedArrays.create(structure_to_arrays(protein.model, protein.rel_asa)) as shared:
+        if n_workers and n_workers > 1:
+            results = map_arrays(_tile_task, shared, tasks, n_workers=n_workers)
+        else:
+            results = [_tile_task(shared, task) for task in tasks]
+
+    geometric = merge_tile_pockets(tiling, [(tile.index, found[0]) for tile, found in zip(tiles, results)],
+                                   GEOMETRIC_LINK_DISTANCE)
+    energy = merge_tile_pockets(tiling, [(tile.index, found[1]) for tile, found in zip(tiles, results)],
+                                ENERGY_LINK_DISTANCE)
+    logger.info(f"Merged tiles into {len(geometric)} geometric and {len(energy)} energy-based pockets")
+    return geometric, energy
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Corpus Archive Module
+=====================
+This module packs a directory of PDB/ENT files into a single binary archive
+that is opened with memory mapping, so repeated screens over the same corpus
+skip text parsing and DSSP, and parallel workers share the archive pages
+through the operating system cache instead of each holding its own copy.
+
+Archive layout (one file, '.cbarc'):
+
+    magic      b'CSBARC1\\n'
+    length     uint64, size of the JSON header
+    header     JSON with the structure ids and sources, and the dtype, shape
+               and byte offset of every array
+    arrays     raw little-endian arrays, each aligned to 64 bytes:
+                   coords    float32 (total atoms, 3)
+                   atoms     ATOM_DTYPE (see ConSBind.core.arrays)
+                   residues  RESIDUE_DTYPE, including the DSSP relative ASA
+                   index     one row per structure: id (the first 64 bytes of
+                             its UTF-8 encoding) and atom/residue offsets
+
+Structure ids are the file names without extension; they must be unique.
+
+Usage:
+    python main.py path/to/directory/ --pack_archive corpus.cbarc
+    python main.py corpus.cbarc --workers 8
+"""
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+import numpy as np
+from pathlib import Path
+
+from ConSBind.core.arrays import ATOM_DTYPE, RESIDUE_DTYPE, structure_to_arrays, arrays_to_structure, residue_asa
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+ARCHIVE_MAGIC = b'CSBARC1\n'
+ARCHIVE_SUFFIX = '.cbarc'
+ALIGNMENT = 64
+
+INDEX_DTYPE = np.dtype([
+    ('pdb_id', 'S64'),
+    ('atom_start', '<i8'),
+    ('atom_count', '<i8'),
+    ('residue_start', '<i8'),
+    ('residue_count', '<i8')
+])
+
+
+def _structure_arrays(pdb_file):
+    """Parse one structure file and convert it to arrays (runs in worker processes)"""
+    from ConSBind.core.structure import ProteinStructure
+
+    try:
+        protein = ProteinStructure(str(pdb_file))
+        return str(pdb_file), protein.pdb_id, structure_to_arrays(protein.model, protein.rel_asa), None
+    except Exception as e:
+        return str(pdb_file), None, None, str(e)
+
+def pack_corpus(pdb_files, archive_path, n_workers=1):
+    """
+    Pack structure files into a memory-mappable corpus archive
+
+    Structures are parsed (and DSSP is run) once, in parallel, and streamed
+    to temporary files, so memory use does not grow with the corpus size.
+    Files are identified by their name without extension, so two files
+    with the same name are rejected before anything is parsed.
+
+    Parameters:
+    -----------
+    pdb_files : list
+        PDB/ENT files to pack
+    archive_path : str or Path
+        Output archive file (the '.cbarc' suffix is added if missing)
+    n_workers : int
+        Number of parsing processes (default: 1)
+
+    Returns:
+    --------
+    Path
+        Path of the written archive
+    """
+    pdb_files = list(pdb_files)
+    seen = {}
+    for pdb_file in pdb_files:
+        seen.setdefault(Path(pdb_file).stem, []).append(str(pdb_file))
+    duplicates = {pdb_id: files for pdb_id, files in seen.items() if len(files) > 1}
+    if duplicates:
+        raise ValueError("Duplicate structure ids: " + "; ".join(
+            f"{pdb_id} ({', '.join(files)})" for pdb_id, files in sorted(duplicates.items())))
+
+    archive_path = Path(archive_path)
+    if archive_path.suffix != ARCHIVE_SUFFIX:
+        archive_path = archive_path.with_name(archive_path.name + ARCHIVE_SUFFIX)
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+
+    index, ids, sources = [], [], []
+    atom_total = residue_total = 0
+    failed = 0
+
+    with tempfile.TemporaryDirectory(prefix='consbind_pack_', dir=archive_path.parent) as tmp_dir:
+        parts = {name: open(Path(tmp_dir) / name, 'wb') for name in ('coords', 'atoms', 'residues')}
+        try:
+            if n_workers and n_workers > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(max_workers=n_workers)
+                converted = executor.map(_structure_arrays, pdb_files, chunksize=8)
+            else:
+                executor = None
+                converted = map(_structure_arrays, pdb_files)
+
+            for pdb_file, pdb_id, arrays, error in converted:
+                if error is not None:
+                    logger.error(f"Error packing {Path(pdb_file).name}: {error}")
+                    failed += 1
+                    continue
+
+                for name, part in parts.items():
+                    part.write(np.ascontiguousarray(arrays[name]).tobytes())
+                n_atoms, n_residues = len(arrays['atoms']), len(arrays['residues'])
+                index.append((pdb_id.encode('utf-8')[:64], atom_total, n_atoms, residue_total, n_residues))
+                ids.append(pdb_id)
+                sources.append(str(Path(pdb_file).resolve()))
+                atom_total += n_atoms
+                residue_total += n_residues
+
+            if executor is not None:
+                executor.shutdown()
+        finally:
+            for part in parts.values():
+                part.close()
+
+        shapes = {
+            'coords': ((atom_total, 3), np.dtype('<f4')),
+            'atoms': ((atom_total,), ATOM_DTYPE),
+            'residues': ((residue_total,), RESIDUE_DTYPE),
+            'index': ((len(index),), INDEX_DTYPE)
+        }
+        index_array = np.array(index, dtype=INDEX_DTYPE)
+
+        # Lay out the arrays after the header, each aligned for memory mapping
+        header = {'version': 2, 'ids': ids, 'sources': sources, 'arrays': {}}
+        header_size = 0
+        while True:
+            offset = len(ARCHIVE_MAGIC) + 8 + header_size
+            for name, (shape, dtype) in shapes.items():
+                offset = -(-offset // ALIGNMENT) * ALIGNMENT
+                header['arrays'][name] = {'dtype': np.lib.format.dtype_to_descr(dtype),
+                                          'shape': list(shape), 'offset': offset}
+                offset += int(np.prod(shape)) * dtype.itemsize
+            header_bytes = json.dumps(header).encode('utf-8')
+            if len(header_bytes) <= header_size:
+                break
+            header_size = len(header_bytes) + 256
+        header_bytes = header_bytes.ljust(header_size)
+
+        tmp_archive = Path(tmp_dir) / archive_path.name
+        with open(tmp_archive, 'wb') as f:
+            f.write(ARCHIVE_MAGIC)
+            f.write(np.uint64(header_size).tobytes())
+            f.write(header_bytes)
+            for name in shapes:
+                f.write(b'\0' * (header['arrays'][name]['offset'] - f.tell()))
+                if name == 'index':
+                    f.write(index_array.tobytes())
+                else:
+                    with open(Path(tmp_dir) / name, 'rb') as part:
+                        shutil.copyfileobj(part, f, 16 * 1024 * 1024)
+        os.replace(tmp_archive, archive_path)
+
+    logger.info(f"Packed {len(index)} structures ({atom_total} atoms) into {archive_path}"
+                + (f", {failed} failed" if failed else ""))
+    return archive_path
+
+class CorpusArchive:
+    """Read-only, memory-mapped view of a corpus archive"""
+
+    def __init__(self, archive_path):
+        """
+        Parameters:
+        -----------
+        archive_path : str or Path
+            Archive written by pack_corpus
+        """
+        self.path = Path(archive_path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                raise ValueError(f"Not a ConSBind corpus archive: {self.path}")
+            header_size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_size))
+
+        self.sources = header['sources']
+        self.arrays = {}
+        for name, info in header['arrays'].items():
+            dtype = np.lib.format.descr_to_dtype(info['dtype'])
+            shape = tuple(info['shape'])
+            if int(np.prod(shape)) == 0:
+                self.arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                self.arrays[name] = np.memmap(self.path, dtype=dtype, mode='r', offset=info['offset'], shape=shape)
+
+        self.index = self.arrays['index']
+        # Version 1 archives only have the (ASCII) ids of the index
+        ids = header.get('ids') or [pdb_id.decode('ascii') for pdb_id in self.index['pdb_id'].tolist()]
+        self._positions = {pdb_id: i for i, pdb_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, pdb_id):
+        return pdb_id in self._positions
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    @property
+    def ids(self):
+        """Structure identifiers, in packing order"""
+        return list(self._positions)
+
+    def source(self, pdb_id):
+        """Path of the file a structure was packed from"""
+        return self.sources[self._positions[pdb_id]]
+
+    def structure_arrays(self, pdb_id):
+        """
+        Arrays of one structure as memory-mapped views (no data is copied)
+
+        Returns:
+        --------
+        dict
+            'coords', 'atoms' and 'residues' arrays; atom 'residue' indexes
+            are relative to this structure's residue table
+        """
+        if pdb_id not in self._positions:
+            raise KeyError(f"Structure not in archive: {pdb_id}")
+        entry = self.index[self._positions[pdb_id]]
+        atoms = slice(int(entry['atom_start']), int(entry['atom_start'] + entry['atom_count']))
+        residues = slice(int(entry['residue_start']), int(entry['residue_start'] + entry['residue_count']))
+        return {
+            'coords': self.arrays['coords'][atoms],
+            'atoms': self.arrays['atoms'][atoms],
+            'residues': self.arrays['residues'][residues]
+        }
+
+    def load(self, pdb_id):
+        """
+        Open one structure as a ProteinStructure, without text parsing or DSSP
+
+        The structure keeps the path it was packed from as pdb_file.
+        """
+        from ConSBind.core.structure import ProteinStructure
+
+        arrays = self.structure_arrays(pdb_id)
+        structure = arrays_to_structure(pdb_id, arrays['coords'], arrays['atoms'], arrays['residues'])
+        protein = ProteinStructure(self.source(pdb_id), structure=structure,
+                                   rel_asa=residue_asa(arrays['residues']) or {})
+        protein.pdb_id = pdb_id
+        return protein
+
+# Archives opened by this process, shared by all tasks a worker runs
+_open_archives = {}
+
+def _archive_task(task):
+    """Predict one archived structure (runs in worker processes)"""
+    from ConSBind.api import predict
+
+    archive_path, pdb_id, output_base_path, params, generate_pymol, generate_chimera, output_options = task
+    try:
+        if archive_path not in _open_archives:
+            _open_archives[archive_path] = CorpusArchive(archive_path)
+        protein = _open_archives[archive_path].load(pdb_id)
+        output_prefix = Path(output_base_path) / pdb_id / pdb_id if output_base_path is not None else None
+        result = predict(protein, params, output_prefix=output_prefix,
+                         generate_pymol=generate_pymol, generate_chimera=generate_chimera,
+                         output_options=output_options)
+
+        # Resolve the site residues here, so the structure does not travel back to the parent
+        result.sites
+        result.protein = None
+        return pdb_id, result, None
+    except Exception as e:
+        return pdb_id, None, str(e)
+
+def predict_archive(archive_path, output_base_path=None, params=None, ids=None, n_workers=1,
+                    generate_pymol=False, generate_chimera=False, store=None, on_done=None, output_options=None):
+    """
+    Predict binding sites for the structures of a corpus archive
+
+    Every worker process maps the same archive file, so its pages are shared
+    through the operating system cache.
+
+    Parameters:
+    -----------
+    archive_path : str or Path
+        Archive written by pack_corpus
+    output_base_path : str or Path, optional
+        If given, each structure's files are written to output_base_path/<pdb_id>/
+    params : PredictionParams, optional
+        Prediction parameters shared by all structures
+    ids : list, optional
+        Structure ids to process (default: all)
+    n_workers : int
+        Number of worker processes (default: 1)
+    generate_pymol, generate_chimera : bool
+        Also write visualization scripts
+    store : ResultsStore, optional
+        Consolidated results store the predicted sites are added to
+    on_done : callable, optional
+        Called as on_done(pdb_id, result, error) after each structure
+    output_options : OutputOptions, optional
+        Which files to write and how
+
+    Returns:
+    --------
+    int
+        Number of structures processed successfully
+    """
+    archive_path = str(Path(archive_path).resolve())
+    if ids is None:
+        ids = CorpusArchive(archive_path).ids
+    tasks = [(archive_path, pdb_id, output_base_path, params, generate_pymol, generate_chimera, output_options)
+             for pdb_id in ids]
+
+    if n_workers and n_workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+        outcomes = executor.map(_archive_task, tasks)
+    else:
+        executor = None
+        outcomes = map(_archive_task, tasks)
+
+    success_count = 0
+    try:
+        for pdb_id, result, error in outcomes:
+            if error is None:
+                success_count += 1
+                if store is not None:
+                    store.add(result)
+            else:
+                logger.error(f"Error processing {pdb_id}: {error}")
+            if on_done is not None:
+                on_done(pdb_id, result, error)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return success_count
@@ -62,7 +62,7 @@ def detect_input_type(input_path):
     --------
     tuple
         (input_type, path)
-        input_type: 'file' or 'directory'
+        input_type: 'file', 'directory' or 'archive' (corpus archive, see archive.py)
         path: Path object of the input
     """
     path = Path(input_path)
@@ -71,6 +71,10 @@ def detect_input_type(input_path):
         raise FileNotFoundError(f"Input path does not exist: {input_path}")
     
     if path.is_file():
+        # Packed corpus archive
+        if path.suffix.lower() == '.cbarc':
+            return 'archive', path
+        
         # Check if it's a PDB file
         if path.suffix.lower() in ['.pdb', '.ent']:
             # Convert .ent to .pdb if needed
@@ -86,7 +90,7 @@ def detect_input_type(input_path):
     else:
         raise ValueError(f"Input path is neither a file nor a directory: {input_path}")
 
-def find_pdb_files(directory):
+def find_pdb_files(directory, convert=True):
     """
     Find all PDB files in a directory and convert .ent files to .pdb format
     
@@ -94,6 +98,9 @@ def find_pdb_files(directory):
     -----------
     directory : str or Path
         Directory to search for PDB files
+    convert : bool
+        Convert .ent files now; False returns them unconverted so the
+        copy can be done later, e.g. by a prefetch stage (default: True)
     
     Returns:
     --------
@@ -116,6 +123,9 @@ def find_pdb_files(directory):
     else:
         logger.info(f"Found {len(pdb_files)} PDB files in {directory}")
     
+    if not convert:
+        return pdb_files
+    
     # Convert any .ent files to .pdb format
     converted_files = []
     for file in pdb_files:
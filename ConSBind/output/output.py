@@ -11,7 +11,6 @@ import os
 import time
 import numpy as np
 import logging
-from Bio.PDB import PDBIO
 
 # Use the same logger as main to prevent duplicate messages
 logger = logging.getLogger('ConSBind')
@@ -28,8 +27,23 @@ COLORS = {
 }
 
 
-def save_predictions(pockets, protein, output_prefix):
-    """Save predictions to text file and modified PDB with binding site indicators.
+def open_output(path, compress=False):
+    """Open a text output file for writing, gzip-compressed (with a '.gz' suffix) if requested.
+
+    Returns
+    -------
+    tuple
+        (file object, path actually written)
+    """
+    if compress:
+        import gzip
+        path = f"{path}.gz"
+        return gzip.open(path, 'wt'), path
+    return open(path, 'w'), path
+
+
+def save_table(pockets, protein, output_prefix, compress=False):
+    """Save the predicted binding sites to a text table.
 
     Parameters
     ----------
@@ -39,23 +53,24 @@ def save_predictions(pockets, protein, output_prefix):
         Protein object containing structure information
     output_prefix : str
         Prefix for output files
+    compress : bool
+        Write the table gzip-compressed
 
     Returns
     -------
-    tuple
-        Paths to the output text file and PDB file
+    str
+        Path to the output text file
     """
-    output_file = f"{output_prefix}_predictions.txt"
-    output_pdb = f"{output_prefix}_predicted.pdb"
+    # Residues of all pockets in one lookup (memoized, so other writers reuse them)
+    pocket_residues = protein.get_pockets_residues(pockets)
 
     # Write text summary
-    with open(output_file, 'w') as f:
+    f, output_file = open_output(f"{output_prefix}_predictions.txt", compress)
+    with f:
         f.write("Predicted Binding Sites\n")
         f.write("======================\n\n")
 
-        for i, pocket in enumerate(pockets, 1):
-            # Get residues for this pocket
-            residues = protein.get_pocket_residues(pocket)
+        for i, (pocket, residues) in enumerate(zip(pockets, pocket_residues), 1):
 
             f.write(f"Site {i}:\n")
 
@@ -77,27 +92,84 @@ def save_predictions(pockets, protein, output_prefix):
             f.write(f"Center: {pocket['center'][0]:.3f}, {pocket['center'][1]:.3f}, {pocket['center'][2]:.3f}\n")
 
             f.write("\nBinding Site Residues:\n")
-            for chain, resid, resname in protein.get_pocket_residues(pocket):
+            for chain, resid, resname in residues:
                 f.write(f"  {chain}:{resname}{resid}\n")
             f.write("\n")
 
-    # Get the structure data from the original PDB file
-    pdb_io = PDBIO()
-    pdb_io.set_structure(protein.structure)
+    logger.info(f"Predictions saved to {output_file}")
+    return output_file
+
+
+def display_points(pockets, max_points=20):
+    """Select the pocket points shown as pseudo-atoms (a random subset of at most max_points per pocket).
 
-    # Read the original PDB file
-    with open(protein.pdb_file, 'r') as f:
-        pdb_lines = f.readlines()
+    Parameters
+    ----------
+    pockets : list
+        List of pocket dictionaries containing binding site information
+    max_points : int
+        Maximum number of points per pocket
+
+    Returns
+    -------
+    list
+        One (n, 3) array (or an empty list) per pocket
+    """
+    site_points = []
+    for pocket in pockets:
+        points = pocket.get('points', [])
+        if isinstance(points, np.ndarray) and len(points) > max_points:
+            points = points[np.random.choice(len(points), max_points, replace=False)]
+        site_points.append(points)
+    return site_points
+
+
+def save_pdb(pockets, protein, output_prefix, sidecar=False, compress=False, site_points=None):
+    """Save the binding sites as pseudo-atoms (chain X, residue SIT) in PDB format.
+
+    Parameters
+    ----------
+    pockets : list
+        List of pocket dictionaries containing binding site information
+    protein : Protein object
+        Protein object containing structure information
+    output_prefix : str
+        Prefix for output files
+    sidecar : bool
+        Write only the REMARK and pseudo-atom records to {output_prefix}_sites.pdb,
+        to be loaded next to the input structure, instead of a copy of the
+        structure with the sites appended ({output_prefix}_predicted.pdb)
+    compress : bool
+        Write the file gzip-compressed
+    site_points : list, optional
+        Points to write for each pocket, as selected by display_points (selected here by default)
 
-    # Create a modified PDB file with binding site indicators
-    with open(output_pdb, 'w') as f:
-        # Write all lines up to the END record (if it exists)
-        end_found = False
-        for line in pdb_lines:
-            if line.startswith('END'):
-                end_found = True
-                break
-            f.write(line)
+    Returns
+    -------
+    str
+        Path to the PDB file
+    """
+    if site_points is None:
+        site_points = display_points(pockets)
+
+    suffix = "_sites.pdb" if sidecar else "_predicted.pdb"
+    f, output_pdb = open_output(f"{output_prefix}{suffix}", compress)
+    with f:
+        if not sidecar:
+            # Stream the original PDB file up to the END record (if it exists), or write
+            # the structure itself if the file is not available (e.g. structures opened
+            # from a corpus archive)
+            if os.path.isfile(protein.pdb_file):
+                with open(protein.pdb_file, 'r') as source:
+                    for line in source:
+                        if line.startswith('END'):
+                            break
+                        f.write(line)
+            else:
+                from Bio.PDB import PDBIO
+                pdb_io = PDBIO()
+                pdb_io.set_structure(protein.structure)
+                pdb_io.save(f, write_end=False)
 
         # Add REMARK records for binding sites
         f.write("\nREMARK   Predicted Binding Sites\n")
@@ -108,7 +180,7 @@ def save_predictions(pockets, protein, output_prefix):
 
         # Add dummy atoms for each prediction
         atom_num = 10000  # Start from a high number to avoid conflicts
-        for i, pocket in enumerate(pockets, 1):
+        for i, (pocket, points) in enumerate(zip(pockets, site_points), 1):
             f.write(f"REMARK   Site {i} - Method: {pocket['method']}, Consensus: {pocket['consensus_score']:.2f}, Binding Potential: {pocket['final_score']:.2f}\n")
 
             # Add the center point as a larger sphere - use ATOM instead of HETATM
@@ -119,13 +191,7 @@ def save_predictions(pockets, protein, output_prefix):
             atom_num += 1
 
             # Add smaller spheres for sample points in the cluster if available
-            points = pocket.get('points', [])
             if isinstance(points, np.ndarray) and len(points) > 0:
-                # Select a subset of points for visualization (max 20)
-                if len(points) > 20:
-                    indices = np.random.choice(len(points), 20, replace=False)
-                    points = points[indices]
-
                 for j, point in enumerate(points):
                     x, y, z = point
                     f.write(f"ATOM  {atom_num:5d}  H   SIT {binding_site_chain}{i:3d}    "
@@ -137,13 +203,35 @@ def save_predictions(pockets, protein, output_prefix):
         f.write("TER\n")
         f.write("END\n")
 
-    logger.info(f"Predictions saved to {output_file}")
-    logger.info(f"Modified PDB saved to {output_pdb}")
+    logger.info(f"{'Binding site sidecar' if sidecar else 'Modified PDB'} saved to {output_pdb}")
+    return output_pdb
+
+
+def save_predictions(pockets, protein, output_prefix, sidecar=False, compress=False):
+    """Save predictions to text file and modified PDB with binding site indicators.
 
+    Parameters
+    ----------
+    pockets : list
+        List of pocket dictionaries containing binding site information
+    protein : Protein object
+        Protein object containing structure information
+    output_prefix : str
+        Prefix for output files
+    sidecar, compress : bool
+        See save_pdb
+
+    Returns
+    -------
+    tuple
+        Paths to the output text file and PDB file
+    """
+    output_file = save_table(pockets, protein, output_prefix, compress=compress)
+    output_pdb = save_pdb(pockets, protein, output_prefix, sidecar=sidecar, compress=compress)
     return output_file, output_pdb
 
 
-def save_pymol(pockets, protein, output_prefix, output_pdb=None):
+def save_pymol(pockets, protein, output_prefix, output_pdb=None, structure_file=None, compress=False):
     """Generate a PyMOL script for visualizing binding sites.
 
     Parameters
@@ -156,6 +244,12 @@ def save_pymol(pockets, protein, output_prefix, output_pdb=None):
         Prefix for output files
     output_pdb : str, optional
         Path to the predicted PDB file. If None, will be generated from output_prefix
+    structure_file : str, optional
+        Input structure to load along with output_pdb, when output_pdb is a
+        sidecar holding only the binding sites (see save_pdb); it must exist,
+        and is loaded by its path relative to the script
+    compress : bool
+        Write the script gzip-compressed
 
     Returns
     -------
@@ -167,15 +261,30 @@ def save_pymol(pockets, protein, output_prefix, output_pdb=None):
         output_pdb = f"{output_prefix}_predicted.pdb"
 
     # Generate PyMOL script for visualization
-    pymol_script = f"{output_prefix}_pymol.pml"
-    with open(pymol_script, 'w') as f:
+    f, pymol_script = open_output(f"{output_prefix}_pymol.pml", compress)
+    with f:
         # Get the base name of the PDB file to use as the object name
         pdb_name = os.path.splitext(os.path.basename(output_pdb))[0]
+        if pdb_name.endswith('.pdb'):
+            pdb_name = pdb_name[:-4]  # Compressed output ('.pdb.gz')
 
         f.write(f"# PyMOL script for visualizing predicted binding sites\n")
         # Use just the filename instead of the full path for better portability
         pdb_filename = os.path.basename(output_pdb)
-        f.write(f"load {pdb_filename}, main_obj\n")  # Explicitly name the object
+        if structure_file is None:
+            f.write(f"load {pdb_filename}, main_obj\n")  # Explicitly name the object
+        else:
+            # Merge the input structure and the binding site sidecar into one object; like
+            # the sidecar, the structure is loaded relative to the script's directory
+            try:
+                structure_path = os.path.relpath(structure_file, os.path.dirname(os.path.abspath(pymol_script)))
+            except ValueError:
+                structure_path = os.path.abspath(structure_file)  # On another drive (Windows)
+            f.write(f"load {structure_path}, structure_obj\n")
+            f.write(f"load {pdb_filename}, sites_obj\n")
+            f.write(f"create main_obj, structure_obj or sites_obj\n")
+            f.write(f"delete structure_obj\n")
+            f.write(f"delete sites_obj\n")
         f.write(f"hide everything\n")
 
         # Set background color to white and adjust display settings
@@ -206,7 +315,7 @@ def save_pymol(pockets, protein, output_prefix, output_pdb=None):
         f.write("color magenta, ligands\n\n")
 
         # Add representation for each binding site
-        for i, pocket in enumerate(pockets, 1):
+        for i, (pocket, residues) in enumerate(zip(pockets, protein.get_pockets_residues(pockets)), 1):
             # Get score and determine color - normalize the consensus_score for color selection
             normalized_score = min(1.0, max(0.0, pocket['consensus_score'] / 5.0))
             site_color = "red"  # default color
@@ -230,7 +339,6 @@ def save_pymol(pockets, protein, output_prefix, output_pdb=None):
             f.write(f"set sphere_scale, 0.6, site_{i}_points\n")  # Make cluster points smaller
 
             # Select and display residues
-            residues = protein.get_pocket_residues(pocket)
             if residues:
                 residue_sel = " or ".join([f"(main_obj and chain {chain} and resi {resid})" for chain, resid, _ in residues])
                 f.write(f"select site_{i}_res, ({residue_sel})\n")
@@ -299,7 +407,7 @@ def save_pymol(pockets, protein, output_prefix, output_pdb=None):
     return pymol_script
 
 
-def save_chimera(pockets, protein, output_prefix, output_pdb=None):
+def save_chimera(pockets, protein, output_prefix, output_pdb=None, compress=False):
     """Generate a UCSF Chimera script for visualizing binding sites.
 
     Parameters
@@ -312,6 +420,8 @@ def save_chimera(pockets, protein, output_prefix, output_pdb=None):
         Prefix for output files
     output_pdb : str, optional
         Path to the predicted PDB file. If None, will be generated from output_prefix
+    compress : bool
+        Write the script and BILD file gzip-compressed
 
     Returns
     -------
@@ -323,8 +433,8 @@ def save_chimera(pockets, protein, output_prefix, output_pdb=None):
         output_pdb = f"{output_prefix}_predicted.pdb"
 
     # Create a BILD file for the spheres
-    bild_file = f"{output_prefix}_spheres.bild"
-    with open(bild_file, 'w') as bf:
+    bf, bild_file = open_output(f"{output_prefix}_spheres.bild", compress)
+    with bf:
         bf.write(".transparency 0.0\n")  # Make spheres solid
 
         # Add a sphere for each binding site
@@ -357,8 +467,8 @@ def save_chimera(pockets, protein, output_prefix, output_pdb=None):
             bf.write(f".sphere {x:.2f} {y:.2f} {z:.2f} 2.0\n\n")
 
     # Create a simple Chimera script file to open the BILD file
-    chimera_script = f"{output_prefix}_chimera.cmd"
-    with open(chimera_script, 'w') as f:
+    f, chimera_script = open_output(f"{output_prefix}_chimera.cmd", compress)
+    with f:
         # Write header and instructions
         f.write("# Chimera script for visualizing binding sites\n")
         f.write("# To use this script:\n")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Progress Events Module
+======================
+This module writes the stage events of a run as JSON Lines, one compact
+object per event, for headless batch runs monitored by other programs
+(--progress json). Nothing is rendered: no progress bars, no colours.
+
+Events:
+
+    {"time":1700000000.123,"file":"1abc.pdb","stage":"geometric","status":"start"}
+    {"time":1700000001.456,"file":"1abc.pdb","stage":"geometric","status":"done","duration":1.333,"count":4}
+    {"time":1700000002.789,"file":"1abc.pdb","stage":"file","status":"done","sites":2,"timings":{...}}
+    {"time":1700000002.790,"file":"2xyz.pdb","stage":"file","status":"error","error":"..."}
+
+Stage events are the ones sent to the progress callback of
+ConSBind.api.predict; the 'file' stage marks the end of a structure.
+"""
+
+import sys
+import json
+import time
+import threading
+
+
+class JsonProgress:
+    """Progress callback that writes every event as one JSON line"""
+
+    def __init__(self, stream=None):
+        """
+        Parameters:
+        -----------
+        stream : file-like, optional
+            Where the events are written (default: sys.stdout at write time)
+        """
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """Write one event (a progress callback event, see ConSBind.api.predict)"""
+        record = {'time': round(time.time(), 3)}
+        if 'structure' in event:
+            record['file'] = event['structure']
+        for key, value in event.items():
+            if key == 'structure' or value is None:
+                continue
+            record[key] = round(value, 4) if isinstance(value, float) else value
+
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        stream = self.stream or sys.stdout
+        # Events may come from several threads (e.g. the prefetching pipeline)
+        with self._lock:
+            stream.write(line)
+            stream.flush()
+
+    def bind(self, file):
+        """Progress callback for one structure: its events carry the file name"""
+        return lambda event: self({'structure': str(file), **event})
+
+    def file_done(self, file, result=None, error=None):
+        """
+        Write the end of one structure
+
+        Parameters:
+        -----------
+        file : str or Path
+            Structure file (or archive id)
+        result : PocketResult, optional
+            Result of a successful prediction; its site count and stage timings are reported
+        error : Exception or str, optional
+            Error of a failed prediction
+        """
+        if error is not None:
+            self({'structure': str(file), 'stage': 'file', 'status': 'error', 'error': str(error)})
+            return
+        event = {'structure': str(file), 'stage': 'file', 'status': 'done'}
+        if result is not None:
+            event['sites'] = len(result)
+            event['timings'] = {stage: round(duration, 4) for stage, duration in result.timings.items()}
+        self(event)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Results Store Module
+====================
+This module collects the predicted sites of a batch run into a single
+columnar file (NumPy .npz, Parquet or JSON Lines) with one row per site,
+so a whole screen can be loaded back in one read.
+"""
+
+import json
+import logging
+import numpy as np
+from pathlib import Path
+
+from ConSBind.core.descriptors import DESCRIPTOR_COLUMNS
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+STORE_FORMATS = ['npz', 'parquet', 'jsonl']
+
+# Site table columns and their NumPy dtypes (string columns are inferred)
+SITE_COLUMNS = {
+    'pdb_id': None,
+    'site': np.int32,
+    'methods': None,
+    'consensus_score': np.float64,
+    'final_score': np.float64,
+    'druggability': np.float64,
+    'knowledge_score': np.float64,
+    'size': np.int32,
+    'center_x': np.float32,
+    'center_y': np.float32,
+    'center_z': np.float32,
+    'residues': None
+}
+
+
+def format_residues(residues):
+    """Encode a residue list [(chain, resid, resname), ...] as 'A:ALA25;A:VAL32'"""
+    return ';'.join(f"{chain}:{resname}{resid}" for chain, resid, resname in residues)
+
+def parse_residues(value):
+    """Decode a residue string written by format_residues into [(chain, resid, resname), ...]"""
+    residues = []
+    for item in filter(None, str(value).split(';')):
+        chain, residue = item.split(':', 1)
+        residues.append((chain, int(residue[3:]), residue[:3]))
+    return residues
+
+class ResultsStore:
+    """Accumulates the sites of many predictions and writes them as one table"""
+
+    def __init__(self, include_points=False, include_descriptors=False):
+        """
+        Parameters:
+        -----------
+        include_points : bool
+            Also keep a table with the points of every site (default: False)
+        include_descriptors : bool
+            Also add the descriptor columns of every site (see
+            ConSBind.core.descriptors) to the site table (default: False)
+        """
+        self.include_points = include_points
+        self.include_descriptors = include_descriptors
+        self.rows = []
+        self.point_rows = []
+        self.point_blocks = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, result):
+        """
+        Add the sites of one prediction
+
+        Parameters:
+        -----------
+        result : PocketResult
+            Result returned by ConSBind.api.predict
+        """
+        for site, pocket in zip(result.sites, result.pockets):
+            row_index = len(self.rows)
+            self.rows.append({
+                'pdb_id': result.pdb_id,
+                'site': site['rank'],
+                'methods': ','.join(site['methods']),
+                'consensus_score': site['consensus_score'],
+                'final_score': site['final_score'],
+                'druggability': np.nan if site['druggability'] is None else site['druggability'],
+                'knowledge_score': np.nan if site['knowledge_score'] is None else site['knowledge_score'],
+                'size': site['size'],
+                'center_x': site['center'][0],
+                'center_y': site['center'][1],
+                'center_z': site['center'][2],
+                'residues': format_residues(site['residues'])
+            })
+
+            if self.include_descriptors:
+                self.rows[-1].update(zip(DESCRIPTOR_COLUMNS, np.asarray(pocket['descriptors']).tolist()))
+
+            if self.include_points:
+                points = np.asarray(pocket.get('points', []), dtype=np.float32).reshape(-1, 3)
+                self.point_rows.append(np.full(len(points), row_index, dtype=np.int32))
+                self.point_blocks.append(points)
+
+    def columns(self):
+        """
+        Return the site table and the optional point table as NumPy columns
+
+        Returns:
+        --------
+        tuple
+            (sites, points)
+            sites: dict of column name -> array, one entry per site
+            points: dict with 'row' (index into the site table) and 'x', 'y', 'z',
+                    or None if points are not stored
+        """
+        sites = {}
+        columns = dict(SITE_COLUMNS)
+        if self.include_descriptors:
+            columns.update((name, np.float64) for name in DESCRIPTOR_COLUMNS)
+        for name, dtype in columns.items():
+            values = [row[name] for row in self.rows]
+            sites[name] = np.array(values, dtype=dtype) if dtype is not None else np.array(values, dtype=str)
+
+        points = None
+        if self.include_points:
+            if self.point_blocks:
+                coords = np.concatenate(self.point_blocks)
+                rows = np.concatenate(self.point_rows)
+            else:
+                coords = np.empty((0, 3), dtype=np.float32)
+                rows = np.empty(0, dtype=np.int32)
+            points = {'row': rows, 'x': coords[:, 0], 'y': coords[:, 1], 'z': coords[:, 2]}
+
+        return sites, points
+
+    def save(self, path, store_format='npz'):
+        """
+        Write the store to disk
+
+        Parameters:
+        -----------
+        path : str or Path
+            Output file; a store suffix (.npz, .parquet, .jsonl) is replaced to
+            match the format, otherwise the suffix is appended
+        store_format : str
+            'npz', 'parquet' (requires pyarrow, falls back to 'jsonl') or 'jsonl'
+
+        Returns:
+        --------
+        Path
+            Path of the site table that was written
+        """
+        if store_format not in STORE_FORMATS:
+            raise ValueError(f"Unknown results store format: {store_format}")
+
+        if store_format == 'parquet':
+            try:
+                import pyarrow # type: ignore
+                import pyarrow.parquet # type: ignore
+            except ImportError:
+                logger.warning("pyarrow is not installed, writing the results store as JSON Lines")
+                store_format = 'jsonl'
+
+        path = Path(path)
+        if path.suffix[1:] in STORE_FORMATS:
+            path = path.with_suffix(f".{store_format}")
+        else:
+            # Dots in the name (e.g. of a directory called 'screen.v2') do not start a suffix
+            path = path.with_name(f"{path.name}.{store_format}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sites, points = self.columns()
+
+        if store_format == 'npz':
+            arrays = {f"sites/{name}": values for name, values in sites.items()}
+            if points is not None:
+                arrays.update({f"points/{name}": values for name, values in points.items()})
+            with open(path, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+
+        elif store_format == 'parquet':
+            pyarrow.parquet.write_table(pyarrow.table(sites), path)
+            if points is not None:
+                pyarrow.parquet.write_table(pyarrow.table(points), path.with_name(f"{path.stem}_points.parquet"))
+
+        else:
+            with open(path, 'w') as f:
+                for row in self.rows:
+                    f.write(json.dumps({name: _json_value(value) for name, value in row.items()}) + '\n')
+            if points is not None:
+                with open(path.with_name(f"{path.stem}_points.jsonl"), 'w') as f:
+                    for row, x, y, z in zip(points['row'], points['x'], points['y'], points['z']):
+                        f.write(json.dumps({'row': int(row), 'x': float(x), 'y': float(y), 'z': float(z)}) + '\n')
+
+        logger.info(f"Results store with {len(self.rows)} sites saved to {path}")
+        return path
+
+def _json_value(value):
+    """Convert NaN to None so JSON Lines stay standard JSON"""
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+def load_results(path):
+    """
+    Load a results store written by ResultsStore.save
+
+    Parameters:
+    -----------
+    path : str or Path
+        Path to the .npz, .parquet or .jsonl site table
+
+    Returns:
+    --------
+    tuple
+        (sites, points) in the same layout as ResultsStore.columns(); points is
+        None when the store has no point table
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == '.npz':
+        with np.load(path, allow_pickle=False) as data:
+            sites = {key.split('/', 1)[1]: data[key] for key in data.files if key.startswith('sites/')}
+            points = {key.split('/', 1)[1]: data[key] for key in data.files if key.startswith('points/')}
+        return sites, points or None
+
+    points_file = path.with_name(f"{path.stem}_points{path.suffix}")
+
+    if suffix == '.parquet':
+        import pyarrow.parquet # type: ignore
+        table = pyarrow.parquet.read_table(path)
+        sites = {name: table[name].to_numpy() for name in table.column_names}
+        points = None
+        if points_file.exists():
+            table = pyarrow.parquet.read_table(points_file)
+            points = {name: table[name].to_numpy() for name in table.column_names}
+        return sites, points
+
+    if suffix == '.jsonl':
+        with open(path, 'r') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        sites = {}
+        columns = dict(SITE_COLUMNS)
+        if rows and DESCRIPTOR_COLUMNS[0] in rows[0]:
+            columns.update((name, np.float64) for name in DESCRIPTOR_COLUMNS)
+        for name, dtype in columns.items():
+            values = [np.nan if row[name] is None else row[name] for row in rows]
+            sites[name] = np.array(values, dtype=dtype) if dtype is not None else np.array(values, dtype=str)
+        points = None
+        if points_file.exists():
+            with open(points_file, 'r') as f:
+                point_rows = [json.loads(line) for line in f if line.strip()]
+            points = {
+                'row': np.array([p['row'] for p in point_rows], dtype=np.int32),
+                'x': np.array([p['x'] for p in point_rows], dtype=np.float32),
+                'y': np.array([p['y'] for p in point_rows], dtype=np.float32),
+                'z': np.array([p['z'] for p in point_rows], dtype=np.float32)
+            }
+        return sites, points
+
+    raise ValueError(f"Unknown results store format: {path}")
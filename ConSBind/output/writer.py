@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background Writer Module
+========================
+This module writes prediction files in a small pool of background threads,
+so the next structure's pocket detection starts while the previous one's
+files are still being written (e.g. to a slow network filesystem).
+
+The number of results waiting to be written is bounded: submit() blocks
+when the queue is full, so memory does not grow when the disk is slower
+than the computation. Every output file is written independently; a file
+that fails is reported (logged and listed in .failures) without stopping
+the other files or structures. The writer waits for all pending writes
+when it is closed.
+
+The pseudo-atom points of the PDB output are chosen at random; they are
+drawn when a result is submitted, in the submitting thread, so the output
+is the same as with synchronous writes.
+
+Example:
+    >>> with BackgroundWriter(n_workers=2) as writer:
+    ...     for pdb_file in pdb_files:
+    ...         result = predict(pdb_file, params)
+    ...         writer.submit(result, output_dir / result.pdb_id / result.pdb_id)
+    >>> writer.failures
+    []
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+
+class BackgroundWriter:
+    """Bounded pool of threads writing the prediction files of results"""
+
+    def __init__(self, n_workers=1, max_pending=None):
+        """
+        Parameters:
+        -----------
+        n_workers : int
+            Number of writer threads (default: 1)
+        max_pending : int, optional
+            Maximum number of results submitted but not yet written
+            (default: twice the number of threads)
+        """
+        self.n_workers = max(1, int(n_workers))
+        self.max_pending = max_pending or 2 * self.n_workers
+        self.failures = []
+        self._executor = ThreadPoolExecutor(max_workers=self.n_workers, thread_name_prefix='consbind-writer')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, result, output_prefix, generate_pymol=False, generate_chimera=False, options=None,
+               callback=None, on_done=None):
+        """
+        Queue the files of one result for writing (blocks while the queue is full)
+
+        Parameters:
+        -----------
+        result : PocketResult
+            Result returned by predict() without an output prefix; it must not
+            be changed until it is written
+        output_prefix : str or Path
+            Prefix of the output files
+        generate_pymol, generate_chimera : bool
+            Also write visualization scripts
+        options : OutputOptions, optional
+            Which files to write and how
+        callback : callable, optional
+            Progress callback for the output stages, see ConSBind.api.predict
+            (called from a writer thread)
+        on_done : callable, optional
+            Called from a writer thread as on_done(result, errors) once the
+            result is written; errors lists the (output kind, exception) of
+            the files that failed
+
+        Returns:
+        --------
+        concurrent.futures.Future
+            Resolves to the errors list
+        """
+        from ConSBind.api import OutputOptions
+        from ConSBind.output.output import display_points
+
+        options = options or OutputOptions()
+        site_points = None
+        if result.pockets and 'pdb' in options.kinds(generate_pymol, generate_chimera):
+            site_points = display_points(result.pockets)
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, result, output_prefix, generate_pymol, generate_chimera,
+                                           options, callback, on_done, site_points)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _write(self, result, output_prefix, generate_pymol, generate_chimera, options, callback, on_done,
+               site_points):
+        """Write one result, reporting every file that fails (runs in a writer thread)"""
+        from ConSBind.api import write_outputs
+
+        errors = []
+        try:
+            write_outputs(result, output_prefix, generate_pymol=generate_pymol, generate_chimera=generate_chimera,
+                          callback=callback, options=options, errors=errors, site_points=site_points)
+        except Exception as e:
+            errors.append(('output', e))
+
+        for kind, error in errors:
+            logger.error(f"Error writing {kind} output for {result.pdb_id}: {str(error)}")
+            with self._lock:
+                self.failures.append((result.pdb_id, kind, str(error)))
+
+        if on_done is not None:
+            try:
+                on_done(result, errors)
+            except Exception as e:
+                logger.error(f"Error reporting written outputs for {result.pdb_id}: {str(e)}")
+        return errors
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def flush(self):
+        """Wait until every submitted result is written"""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+
+    def close(self):
+        """Write everything still pending and stop the threads"""
+        self.flush()
+        self._executor.shutdown(wait=True)
+        if self.failures:
+            logger.warning(f"{len(self.failures)} output files could not be written")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Prefetching Pipeline Module
+===========================
+This module processes a list of structure files as three overlapping stages
+connected by bounded queues:
+
+    parse   (thread)       reads and parses the next structures ahead of time
+    compute (main thread)  finds, combines and scores the pockets
+    output  (thread)       writes the prediction files and the results store
+
+Reading, DSSP and file writes mostly wait on the disk or on subprocesses,
+so they run while the compute stage works on another structure. The queue
+size bounds how many parsed structures are held in memory at once.
+"""
+
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+
+from ConSBind.api import PredictionParams, predict, write_outputs
+from ConSBind.input.file_handler import convert_ent_to_pdb
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+# Marks the end of a queue
+_DONE = object()
+
+
+def _put(item_queue, item, stop=None, consumer=None):
+    """Put an item on a bounded queue, giving up if the pipeline is stopped or the consumer thread died"""
+    while (stop is None or not stop.is_set()) and (consumer is None or consumer.is_alive()):
+        try:
+            item_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _parse_stage(pdb_files, parsed, stop):
+    """Parse structures ahead of the compute stage"""
+    from ConSBind.core.structure import ProteinStructure
+
+    for pdb_file in pdb_files:
+        if stop.is_set():
+            break
+        start = time.perf_counter()
+        try:
+            path = Path(pdb_file)
+            if path.suffix.lower() == '.ent':
+                path = convert_ent_to_pdb(path)
+            item = (pdb_file, ProteinStructure(str(path)), None, time.perf_counter() - start)
+        except Exception as e:
+            item = (pdb_file, None, e, 0.0)
+        if not _put(parsed, item, stop):
+            break
+    _put(parsed, _DONE, stop)
+
+def _structure_callback(callback, pdb_file):
+    """Progress callback for one structure, whose events carry its file name"""
+    if callback is None:
+        return None
+    return lambda event: callback({'structure': Path(pdb_file).name, **event})
+
+def _output_stage(results, output_base_path, generate_pymol, generate_chimera, store, on_done, callback=None,
+                  output_options=None):
+    """Write prediction files as results come out of the compute stage"""
+    while True:
+        item = results.get()
+        if item is _DONE:
+            break
+        pdb_file, result, error = item
+        if error is None:
+            try:
+                pdb_id = result.pdb_id
+                write_outputs(result, Path(output_base_path) / pdb_id / pdb_id,
+                              generate_pymol=generate_pymol, generate_chimera=generate_chimera,
+                              callback=_structure_callback(callback, pdb_file), options=output_options)
+                if store is not None:
+                    store.add(result)
+            except Exception as e:
+                error = e
+        if on_done is not None:
+            try:
+                on_done(pdb_file, result, error)
+            except Exception as e:
+                logger.error(f"Error reporting {Path(pdb_file).name}: {str(e)}")
+
+def run_pipeline(pdb_files, output_base_path, params=None, prefetch=2, generate_pymol=False,
+                 generate_chimera=False, store=None, on_done=None, callback=None, output_options=None):
+    """
+    Predict binding sites for many structure files with overlapped I/O
+
+    Parameters:
+    -----------
+    pdb_files : list
+        PDB/ENT files to process, in order
+    output_base_path : str or Path
+        Output directory; each structure is written to output_base_path/<pdb_id>/
+    params : PredictionParams, optional
+        Prediction parameters shared by all structures
+    prefetch : int
+        Number of parsed structures (and of results waiting to be written)
+        held in each queue (default: 2)
+    generate_pymol, generate_chimera : bool
+        Also write visualization scripts
+    store : ResultsStore, optional
+        Consolidated results store the predicted sites are added to
+    on_done : callable, optional
+        Called from the output thread as on_done(pdb_file, result, error)
+        once a structure is finished; result is None and error is the
+        exception if it failed
+    callback : callable, optional
+        Progress callback, see ConSBind.api.predict; called from the compute
+        and output threads, and events also carry the 'structure' key (the
+        file name)
+    output_options : OutputOptions, optional
+        Which files to write and how
+
+    Returns:
+    --------
+    int
+        Number of structures processed successfully
+    """
+    params = params or PredictionParams()
+    parsed = queue.Queue(maxsize=max(1, prefetch))
+    results = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    success_count = 0
+
+    def count_done(pdb_file, result, error):
+        nonlocal success_count
+        if error is None:
+            success_count += 1
+        else:
+            logger.error(f"Error processing {Path(pdb_file).name}: {str(error)}")
+        if on_done is not None:
+            on_done(pdb_file, result if error is None else None, error)
+
+    parser_thread = threading.Thread(target=_parse_stage, args=(pdb_files, parsed, stop),
+                                     name='consbind-parse', daemon=True)
+    writer_thread = threading.Thread(target=_output_stage,
+                                     args=(results, output_base_path, generate_pymol, generate_chimera,
+                                           store, count_done, callback, output_options),
+                                     name='consbind-output', daemon=True)
+    parser_thread.start()
+    writer_thread.start()
+
+    try:
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                break
+            pdb_file, protein, error, load_time = item
+            result = None
+            if error is None:
+                try:
+                    result = predict(protein, params, callback=_structure_callback(callback, pdb_file))
+                    result.timings = {'load': load_time, **result.timings}
+                except Exception as e:
+                    error = e
+            if not _put(results, (pdb_file, result, error), stop, writer_thread):
+                raise RuntimeError("The output stage stopped unexpectedly")
+    finally:
+        # Stop the parse stage early if the compute stage was interrupted
+        stop.set()
+        _put(results, _DONE, consumer=writer_thread)
+        writer_thread.join()
+        parser_thread.join()
+
+    return success_count
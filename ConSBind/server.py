@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Prediction Server Module
+========================
+This module runs ConSBind as a long-lived local service, so interactive
+tools do not pay the interpreter start-up, library imports and logging
+setup on every prediction. Worker processes are started and warmed up
+once, then reused by all requests.
+
+The service speaks JSON over HTTP on localhost:
+
+    GET  /health   -> {"status": "ok", "workers": 4, "active": 1, ...}
+    POST /predict  -> PocketResult.to_dict() of the submitted structure
+
+A /predict request body holds either the path of a structure readable by
+the server or its PDB text, plus optional prediction parameters:
+
+    {"path": "/data/1abc.pdb", "params": {"probe_radius": 1.2}}
+    {"pdb": "ATOM ...", "pdb_id": "1abc", "output_dir": "results"}
+
+Requests beyond the concurrency limit are rejected with 503 instead of
+queueing without bound.
+
+Usage:
+    consbind-server --port 8765 --workers 4
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from ConSBind.api import PredictionParams
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_SIZE = 256 * 1024 * 1024
+
+# Accepted values of the parameters that are chosen from a list (as on the command line)
+PARAM_CHOICES = {
+    'protein_type': ('enzyme', 'transporter', 'receptor', 'unknown'),
+    'cavity_search': ('uniform', 'adaptive', 'edt')
+}
+
+
+def _warm_worker():
+    """Import the prediction pipeline and its lazily imported dependencies when a worker starts"""
+    import ConSBind.core.structure, ConSBind.core.finder, ConSBind.core.scoring, ConSBind.output.output  # noqa: F401
+    import Bio.PDB, Bio.PDB.DSSP, scipy.spatial, scipy.spatial.distance, scipy.cluster.hierarchy  # noqa: F401
+    try:
+        import sklearn.cluster  # noqa: F401
+    except ImportError:
+        pass
+
+def _coerce_params(params):
+    """
+    Convert request parameters to the types of the PredictionParams fields
+
+    Numbers may be sent as JSON numbers or numeric strings; optional fields
+    also accept null.
+
+    Returns:
+    --------
+    dict
+        The converted parameters
+
+    Raises:
+    -------
+    ValueError
+        If a value does not fit its field
+    """
+    coerced = {}
+    for name, value in params.items():
+        field_type = PredictionParams.__annotations__[name]
+        optional = type(None) in getattr(field_type, '__args__', ())
+        if optional:
+            field_type = field_type.__args__[0]
+
+        if value is None and optional:
+            coerced[name] = None
+            continue
+        if field_type is str:
+            if not isinstance(value, str):
+                raise ValueError(f"'{name}' must be a string")
+            if name in PARAM_CHOICES and value not in PARAM_CHOICES[name]:
+                raise ValueError(f"'{name}' must be one of {', '.join(PARAM_CHOICES[name])}")
+            coerced[name] = value
+            continue
+
+        try:
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError
+            number = float(value)
+            if not math.isfinite(number) or (field_type is int and not number.is_integer()):
+                raise ValueError
+        except ValueError:
+            kind = 'an integer' if field_type is int else 'a number'
+            raise ValueError(f"'{name}' must be {kind}") from None
+        coerced[name] = field_type(number)
+    return coerced
+
+def _worker_ready():
+    """No-op task used to make sure every worker has started"""
+    return os.getpid()
+
+def _predict_task(request):
+    """
+    Run one prediction in a worker process
+
+    Parameters:
+    -----------
+    request : dict
+        Decoded /predict request body
+
+    Returns:
+    --------
+    dict
+        PocketResult.to_dict() of the prediction
+    """
+    from ConSBind.api import predict
+
+    params = PredictionParams(**request.get('params', {}))
+    output_dir = request.get('output_dir')
+
+    if 'path' in request:
+        path = Path(request['path'])
+        output_prefix = Path(output_dir) / path.stem / path.stem if output_dir else None
+        return predict(path, params, output_prefix=output_prefix).to_dict()
+
+    # Structure sent as text: parse it from a temporary file named after its id
+    pdb_id = Path(request.get('pdb_id', 'structure')).name
+    with tempfile.TemporaryDirectory(prefix='consbind_') as tmp_dir:
+        path = Path(tmp_dir) / f"{pdb_id}.pdb"
+        path.write_text(request['pdb'])
+        output_prefix = Path(output_dir) / pdb_id / pdb_id if output_dir else None
+        return predict(path, params, output_prefix=output_prefix).to_dict()
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler for /health and /predict"""
+
+    server_version = 'ConSBind'
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._send_json(200, self.server.prediction_server.health())
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/predict':
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {'error': "Invalid Content-Length header"})
+            return
+        if length > MAX_BODY_SIZE:
+            self._send_json(413, {'error': f"Request body larger than {MAX_BODY_SIZE} bytes"})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError as e:
+            self._send_json(400, {'error': f"Invalid JSON: {str(e)}"})
+            return
+
+        status, payload = self.server.prediction_server.handle_predict(request)
+        self._send_json(status, payload)
+
+class PredictionServer:
+    """Local HTTP prediction service backed by a pool of warm worker processes"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_concurrent=None,
+                 timeout=None):
+        """
+        Parameters:
+        -----------
+        host : str
+            Interface to listen on (default: 127.0.0.1, local connections only)
+        port : int
+            Port to listen on; 0 picks a free port (default: 8765)
+        workers : int, optional
+            Number of worker processes (default: number of CPUs)
+        max_concurrent : int, optional
+            Maximum number of predictions accepted at once, running or waiting
+            for a worker; further requests get a 503 (default: 2 * workers)
+        timeout : float, optional
+            Seconds to wait for a prediction before answering 504; a job that is
+            already running keeps its slot until it finishes (default: no limit)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrent = max_concurrent or 2 * self.workers
+        self.timeout = timeout
+        self.executor = None
+        self.httpd = ThreadingHTTPServer((host, port), PredictionRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.prediction_server = self
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._served = 0
+        self._started = None
+        self._thread = None
+
+    @property
+    def address(self):
+        """(host, port) the server is listening on"""
+        return self.httpd.server_address[:2]
+
+    @property
+    def url(self):
+        """Base URL of the server"""
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def start_workers(self):
+        """Start the worker pool and wait until every worker has imported the pipeline"""
+        if self.executor is None:
+            start = time.perf_counter()
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+            for future in [self.executor.submit(_worker_ready) for _ in range(self.workers)]:
+                future.result()
+            self._started = time.time()
+            logger.info(f"Started {self.workers} warm workers in {time.perf_counter() - start:.1f} s")
+
+    def health(self):
+        """Status of the service"""
+        with self._lock:
+            active, served = self._active, self._served
+        return {
+            'status': 'ok' if self.executor is not None else 'starting',
+            'workers': self.workers,
+            'active': active,
+            'max_concurrent': self.max_concurrent,
+            'served': served,
+            'uptime': time.time() - self._started if self._started else 0.0,
+            'pid': os.getpid()
+        }
+
+    def handle_predict(self, request):
+        """
+        Run a prediction request within the concurrency limit
+
+        Returns:
+        --------
+        tuple
+            (HTTP status, JSON payload)
+        """
+        if not isinstance(request, dict) or ('path' not in request and 'pdb' not in request):
+            return 400, {'error': "Request must contain 'path' or 'pdb'"}
+        params = request.get('params', {})
+        if not isinstance(params, dict):
+            return 400, {'error': "'params' must be an object"}
+        unknown = set(params) - set(PredictionParams._fields)
+        if unknown:
+            return 400, {'error': f"Unknown parameters: {', '.join(sorted(unknown))}"}
+        try:
+            request = {**request, 'params': _coerce_params(params)}
+        except ValueError as e:
+            return 400, {'error': f"Invalid parameter: {str(e)}"}
+        if 'path' in request and not isinstance(request['path'], str):
+            return 400, {'error': "'path' must be a string"}
+        if 'pdb' in request and not isinstance(request['pdb'], str):
+            return 400, {'error': "'pdb' must be a string"}
+        if 'path' in request and not Path(request['path']).is_file():
+            return 400, {'error': f"File not found: {request['path']}"}
+
+        if not self._slots.acquire(blocking=False):
+            return 503, {'error': f"Server busy: {self.max_concurrent} predictions already in progress"}
+
+        with self._lock:
+            self._active += 1
+        try:
+            future = self.executor.submit(_predict_task, request)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the job ends, not until the request is answered:
+        # a job that timed out keeps its worker busy until it finishes
+        future.add_done_callback(self._release)
+
+        try:
+            start = time.perf_counter()
+            result = future.result(timeout=self.timeout)
+            with self._lock:
+                self._served += 1
+            logger.info(f"Predicted {len(result['sites'])} sites for {result['pdb_id']} "
+                        f"in {time.perf_counter() - start:.2f} s")
+            return 200, result
+        except FutureTimeoutError:
+            # Only drops the job if it is still waiting for a worker
+            future.cancel()
+            return 504, {'error': f"Prediction did not finish within {self.timeout} s"}
+        except Exception as e:
+            logger.error(f"Prediction failed: {str(e)}")
+            return 500, {'error': str(e)}
+
+    def _release(self, future=None):
+        """Free the concurrency slot of a finished (or cancelled) prediction"""
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def serve_forever(self):
+        """Start the workers and serve requests until shutdown() is called"""
+        self.start_workers()
+        logger.info(f"ConSBind server listening on {self.url}")
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Serve requests from a background thread and return once the workers are ready"""
+        self.start_workers()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """Stop serving requests and stop the worker pool"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+class ServerError(RuntimeError):
+    """Error answered by the prediction server"""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+class PredictionClient:
+    """Client for a running PredictionServer"""
+
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=None):
+        """
+        Parameters:
+        -----------
+        url : str
+            Base URL of the server
+        timeout : float, optional
+            Seconds to wait for an answer (default: no limit)
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, endpoint, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(f"{self.url}{endpoint}", data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise ServerError(e.code, message) from None
+
+    def health(self):
+        """Return the server status dictionary"""
+        return self._request('/health')
+
+    def predict(self, path=None, pdb_text=None, pdb_id=None, params=None, output_dir=None):
+        """
+        Predict binding sites on the server
+
+        Parameters:
+        -----------
+        path : str or Path, optional
+            Structure file readable by the server
+        pdb_text : str, optional
+            PDB file contents, sent instead of a path
+        pdb_id : str, optional
+            Identifier used for pdb_text (default: 'structure')
+        params : PredictionParams or dict, optional
+            Prediction parameters
+        output_dir : str, optional
+            If given, the server also writes the prediction files to output_dir/<pdb_id>/
+
+        Returns:
+        --------
+        dict
+            PocketResult.to_dict() of the prediction
+        """
+        if (path is None) == (pdb_text is None):
+            raise ValueError("Give exactly one of path or pdb_text")
+
+        payload = {}
+        if path is not None:
+            payload['path'] = str(Path(path).resolve())
+        else:
+            payload['pdb'] = pdb_text
+            if pdb_id is not None:
+                payload['pdb_id'] = pdb_id
+        if params is not None:
+            payload['params'] = params._asdict() if hasattr(params, '_asdict') else dict(params)
+        if output_dir is not None:
+            payload['output_dir'] = str(Path(output_dir).resolve())
+        return self._request('/predict', payload)
+
+def main():
+    """Command line entry point of the prediction server"""
+    parser = argparse.ArgumentParser(description='Run ConSBind as a local prediction service')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help=f'Interface to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--max_concurrent', type=int, default=None,
+                        help='Maximum number of predictions accepted at once (default: 2 * workers)')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Seconds before a prediction is answered with 504 (default: no limit)')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s',
+                                           datefmt='%Y-%m-%d %H:%M:%S'))
+    logger.addHandler(handler)
+
+    server = PredictionServer(args.host, args.port, args.workers, args.max_concurrent, args.timeout)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
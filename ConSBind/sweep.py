@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parameter Sweep Module
+======================
+This module runs every combination of a parameter grid over a set of
+structures. Each structure is parsed once, and the stages that do not
+depend on a parameter are shared between the combinations:
+
+    - parsing, DSSP and atom indexes: shared by all combinations
+    - geometric pockets: shared by combinations with the same probe_radius, min_size,
+      cavity_search and region (chains, around, radius, interface)
+    - energy pockets: shared by combinations with the same grid_spacing and region
+    - tiled searches (tile_size): both stages at once, shared by combinations
+      with the same values of all the parameters above and the tiling
+    - combined pockets: shared by combinations that only differ in protein_type
+
+Structures are processed in parallel, one worker per structure. With
+fewer structures than workers, the distinct geometric, energy and tiled
+searches of each structure are spread over the workers instead, which
+share the parsed structure (see ConSBind.core.shared); combining and
+scoring then run in the main process.
+"""
+
+import os
+import csv
+import time
+import itertools
+import logging
+from pathlib import Path
+
+from ConSBind.api import PredictionParams, PocketResult, complete_pockets
+from ConSBind.output.store import format_residues
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+SWEEP_COLUMNS = ['pdb_id'] + list(PredictionParams._fields) + [
+    'runtime', 'parse_time', 'geometric_time', 'energy_time', 'combine_time', 'scoring_time',
+    'n_sites', 'top_score', 'precision', 'recall', 'f1_score', 'residues'
+]
+
+
+def parameter_grid(grid):
+    """
+    Expand a parameter grid into the list of all parameter combinations
+
+    Parameters:
+    -----------
+    grid : dict
+        Parameter name -> list of values, e.g. {'probe_radius': [1.2, 1.4], 'min_size': [3, 5]}.
+        Parameters that are not listed keep their default value.
+
+    Returns:
+    --------
+    list
+        PredictionParams for every combination
+    """
+    unknown = set(grid) - set(PredictionParams._fields)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+
+    names = list(grid)
+    values = [grid[name] if isinstance(grid[name], (list, tuple)) else [grid[name]] for name in names]
+    return [PredictionParams(**dict(zip(names, combination))) for combination in itertools.product(*values)]
+
+def residue_metrics(predicted, known):
+    """Precision, recall and F1 of predicted against known (chain, residue number) pairs"""
+    predicted, known = set(predicted), set(known)
+    true_positives = len(predicted & known)
+    precision = true_positives / len(predicted) if predicted else 0.0
+    recall = true_positives / len(known) if known else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
+    return precision, recall, f1
+
+def _stage_keys(params):
+    """Cache keys of the region, geometric and energy stages a combination uses"""
+    region_key = (params.chains, params.around, params.radius, params.interface)
+    geometric_key = (params.probe_radius, params.min_size, params.cavity_search, region_key)
+    energy_key = (params.grid_spacing, region_key)
+    if params.tile_size:
+        tile_key = (params.tile_size, params.tile_overlap)
+        geometric_key, energy_key = geometric_key + tile_key, energy_key + tile_key
+    return region_key, geometric_key, energy_key
+
+def _search_stage(protein, task):
+    """Run one pocket search stage of a sweep and time it (runs in worker processes)"""
+    from ConSBind.core.finder import ConsensusPocketFinder
+    from ConSBind.core.region import Region
+    from ConSBind.core.tiling import find_pockets_tiled
+
+    stage, params = task
+    pocket_finder = ConsensusPocketFinder()
+    region = Region.from_params(protein, params)
+    start = time.perf_counter()
+    if stage == 'tiled':
+        found = find_pockets_tiled(protein, params, region=region, tile_size=params.tile_size,
+                                   overlap=params.tile_overlap)
+    elif stage == 'geometric':
+        found = pocket_finder.find_pockets_geometric(protein, probe_radius=params.probe_radius,
+                                                     min_size=params.min_size,
+                                                     cavity_search=params.cavity_search, region=region)
+    else:
+        found = pocket_finder.find_pockets_energy(protein, grid_spacing=params.grid_spacing, region=region)
+    return found, time.perf_counter() - start
+
+def sweep_structure(structure_path, combinations, known_residues=None, n_workers=1):
+    """
+    Run all parameter combinations on one structure, reusing shared stages
+
+    Parameters:
+    -----------
+    structure_path : str or Path
+        PDB/ENT file to process
+    combinations : list
+        PredictionParams to evaluate
+    known_residues : list, optional
+        Known binding site (chain, residue number) pairs used for accuracy columns
+    n_workers : int
+        Number of worker processes the distinct search stages are spread over;
+        None uses all cores (default: 1, all stages run in this process)
+
+    Returns:
+    --------
+    list
+        One row dictionary per combination (see SWEEP_COLUMNS). The runtime of a
+        row is the time the combination would take on its own: the durations of
+        the stages it uses, whether they were computed for it or reused.
+    """
+    from ConSBind.core.structure import ProteinStructure
+    from ConSBind.core.finder import ConsensusPocketFinder
+    from ConSBind.core.scoring import final_scoring
+    from ConSBind.core.region import Region
+    from ConSBind.core.tiling import find_pockets_tiled
+    
+    start = time.perf_counter()
+    protein = ProteinStructure(str(structure_path))
+    parse_time = time.perf_counter() - start
+
+    pocket_finder = ConsensusPocketFinder()
+    region_cache, geometric_cache, energy_cache, combined_cache = {}, {}, {}, {}
+
+    def cached(cache, key, func, *args, **kwargs):
+        if key not in cache:
+            stage_start = time.perf_counter()
+            cache[key] = (func(*args, **kwargs), time.perf_counter() - stage_start)
+        return cache[key]
+
+    if n_workers is None or n_workers > 1:
+        # Run every distinct search stage once, in parallel, and fill the caches with the results
+        from ConSBind.core.shared import map_structure
+
+        stages = {}
+        for params in combinations:
+            _, geometric_key, energy_key = _stage_keys(params)
+            if params.tile_size:
+                stages.setdefault(('tiled', geometric_key + energy_key), params)
+            else:
+                stages.setdefault(('geometric', geometric_key), params)
+                stages.setdefault(('energy', energy_key), params)
+        found = map_structure(_search_stage, protein, [(stage, params) for (stage, _), params in stages.items()],
+                              n_workers=n_workers)
+        for (stage, key), stage_result in zip(stages, found):
+            (energy_cache if stage == 'energy' else geometric_cache)[key] = stage_result
+
+    rows = []
+    for params in combinations:
+        region_key, geometric_key, energy_key = _stage_keys(params)
+        if region_key not in region_cache:
+            region_cache[region_key] = Region.from_params(protein, params)
+        region = region_cache[region_key]
+
+        if params.tile_size:
+            # Tiles search both stages at once; their time is counted as geometric
+            (geometric_pockets, energy_pockets), geometric_time = cached(
+                geometric_cache, geometric_key + energy_key, find_pockets_tiled, protein, params,
+                region=region, tile_size=params.tile_size, overlap=params.tile_overlap
+            )
+            energy_time = 0.0
+        else:
+            geometric_pockets, geometric_time = cached(
+                geometric_cache, geometric_key, pocket_finder.find_pockets_geometric,
+                protein, probe_radius=params.probe_radius, min_size=params.min_size,
+                cavity_search=params.cavity_search, region=region
+            )
+            energy_pockets, energy_time = cached(
+                energy_cache, energy_key, pocket_finder.find_pockets_energy,
+                protein, grid_spacing=params.grid_spacing, region=region
+            )
+        combined_pockets, combine_time = cached(
+            combined_cache, (geometric_key, energy_key), pocket_finder.combine_pockets,
+            protein, geometric_pockets, energy_pockets
+        )
+
+        # Scoring adjusts pocket scores in place, so each combination scores its own copies
+        scoring_start = time.perf_counter()
+        pockets = final_scoring([pocket.copy() for pocket in combined_pockets], params.protein_type)
+        complete_pockets(pockets)
+        scoring_time = time.perf_counter() - scoring_start
+
+        result = PocketResult(protein.pdb_id, pockets, protein)
+        residues = [(chain, resid, resname) for site in result.sites for chain, resid, resname in site['residues']]
+        row = {
+            'pdb_id': protein.pdb_id,
+            **params._asdict(),
+            'runtime': parse_time + geometric_time + energy_time + combine_time + scoring_time,
+            'parse_time': parse_time,
+            'geometric_time': geometric_time,
+            'energy_time': energy_time,
+            'combine_time': combine_time,
+            'scoring_time': scoring_time,
+            'n_sites': len(pockets),
+            'top_score': pockets[0]['final_score'] if pockets else None,
+            'precision': None,
+            'recall': None,
+            'f1_score': None,
+            'residues': format_residues(sorted(set(residues)))
+        }
+        if known_residues:
+            predicted = [(chain, resid) for chain, resid, _ in residues]
+            row['precision'], row['recall'], row['f1_score'] = residue_metrics(predicted, known_residues)
+        rows.append(row)
+
+    logger.info(f"Swept {len(combinations)} parameter combinations on {protein.pdb_id} "
+                f"in {time.perf_counter() - start:.1f} s")
+    return rows
+
+def _sweep_task(task):
+    """Top-level wrapper of sweep_structure for worker processes"""
+    structure_path, combinations, known_residues, n_workers = task
+    try:
+        return sweep_structure(structure_path, combinations, known_residues, n_workers)
+    except Exception as e:
+        logger.error(f"Error sweeping {Path(structure_path).name}: {str(e)}")
+        return []
+
+def run_sweep(structure_paths, grid, known_sites=None, n_workers=1):
+    """
+    Run a parameter sweep over a set of structures
+
+    Parameters:
+    -----------
+    structure_paths : list
+        PDB/ENT files to process
+    grid : dict
+        Parameter grid, see parameter_grid()
+    known_sites : dict, optional
+        Structure id (file stem, case-insensitive) -> known (chain, residue number) pairs
+    n_workers : int
+        Number of worker processes; None uses all cores (default: 1). With
+        fewer structures than workers, the search stages of each structure
+        are spread over the workers instead of the structures
+
+    Returns:
+    --------
+    list
+        One row per structure and parameter combination
+    """
+    combinations = parameter_grid(grid)
+    known_sites = {str(key).lower(): [tuple(residue) for residue in residues]
+                   for key, residues in (known_sites or {}).items()}
+    tasks = [(str(path), combinations, known_sites.get(Path(path).stem.lower()), 1)
+             for path in structure_paths]
+    logger.info(f"Sweeping {len(combinations)} parameter combinations over {len(tasks)} structures")
+
+    rows = []
+    if (n_workers is None or n_workers > 1) and len(tasks) < (n_workers or os.cpu_count() or 1):
+        # Too few structures to keep the workers busy: spread each structure's stages instead
+        for path, structure_combinations, known_residues, _ in tasks:
+            rows.extend(_sweep_task((path, structure_combinations, known_residues, n_workers)))
+    elif n_workers is None or n_workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            for structure_rows in executor.map(_sweep_task, tasks):
+                rows.extend(structure_rows)
+    else:
+        for task in tasks:
+            rows.extend(_sweep_task(task))
+    return rows
+
+def summarize_sweep(rows):
+    """
+    Aggregate sweep rows per parameter combination and flag the Pareto front
+
+    A combination is Pareto-optimal if no other combination is at least as
+    fast and at least as accurate (mean F1, or mean number of sites when no
+    ground truth was given) while being strictly better in one of them.
+
+    Returns:
+    --------
+    list
+        One dictionary per combination with the parameters, 'mean_runtime',
+        'mean_f1_score', 'mean_sites' and 'pareto', sorted by mean runtime
+    """
+    groups = {}
+    for row in rows:
+        key = tuple(row[name] for name in PredictionParams._fields)
+        groups.setdefault(key, []).append(row)
+
+    summary = []
+    for key, group in groups.items():
+        f1_scores = [row['f1_score'] for row in group if row['f1_score'] is not None]
+        summary.append({
+            **dict(zip(PredictionParams._fields, key)),
+            'structures': len(group),
+            'mean_runtime': sum(row['runtime'] for row in group) / len(group),
+            'mean_f1_score': sum(f1_scores) / len(f1_scores) if f1_scores else None,
+            'mean_sites': sum(row['n_sites'] for row in group) / len(group)
+        })
+
+    accuracy = 'mean_f1_score' if all(s['mean_f1_score'] is not None for s in summary) else 'mean_sites'
+    for entry in summary:
+        entry['pareto'] = not any(
+            other['mean_runtime'] <= entry['mean_runtime'] and other[accuracy] >= entry[accuracy] and
+            (other['mean_runtime'] < entry['mean_runtime'] or other[accuracy] > entry[accuracy])
+            for other in summary
+        )
+
+    summary.sort(key=lambda entry: entry['mean_runtime'])
+    return summary
+
+def save_sweep(rows, output_file):
+    """Write sweep rows (or a summary) to a CSV file and return its path"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    fieldnames = list(rows[0]) if rows else SWEEP_COLUMNS
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    logger.info(f"Sweep table saved to {output_file}")
+    return output_file
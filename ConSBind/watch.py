@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Watch Mode Module
+=================
+This module watches a directory for new structure files and predicts their
+binding sites as they arrive, instead of reprocessing the whole directory
+on a schedule.
+
+A file is picked up once its size and modification time have not changed
+for a few seconds. Files with other extensions are ignored, so writers can
+also copy to a temporary name and rename atomically ('x.pdb.part' ->
+'x.pdb'). Each file version becomes a job in an on-disk spool:
+
+    spool/pending/   jobs waiting for a worker
+    spool/running/   jobs being processed
+    spool/done/      finished jobs, with their output files
+    spool/failed/    failed jobs, with the error
+
+Jobs move between states with os.replace, so the spool survives restarts:
+jobs left in running/ by a crash are queued again, and files that already
+have a done/ or failed/ job are not processed twice.
+
+Results are written with the same layout as a directory run:
+    results/dir_basename/pdb_basename/pdb_basename_predictions.txt
+"""
+
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from ConSBind.api import PredictionParams
+from ConSBind.input.file_handler import create_output_path
+
+# Use the same logger as main to prevent duplicate messages
+logger = logging.getLogger('ConSBind')
+
+PDB_EXTENSIONS = ('.pdb', '.ent')
+JOB_STATES = ('pending', 'running', 'done', 'failed')
+
+
+def _write_json(path, data):
+    """Write a JSON file atomically (temporary file, fsync, os.replace)"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class JobSpool:
+    """Durable on-disk job queue with one JSON file per job"""
+
+    def __init__(self, spool_dir):
+        """
+        Parameters:
+        -----------
+        spool_dir : str or Path
+            Spool directory; the state subdirectories are created if needed
+        """
+        self.spool_dir = Path(spool_dir)
+        self.dirs = {state: self.spool_dir / state for state in JOB_STATES}
+        for directory in self.dirs.values():
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def job_id(path):
+        """Identifier of one version of a file: name, size and modification time"""
+        stat = Path(path).stat()
+        return f"{Path(path).name}-{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _job_file(self, state, job_id):
+        return self.dirs[state] / f"{job_id}.json"
+
+    def state(self, job_id):
+        """Current state of a job, or None if it is unknown"""
+        for state in JOB_STATES:
+            if self._job_file(state, job_id).exists():
+                return state
+        return None
+
+    def submit(self, path):
+        """
+        Queue a structure file
+
+        Returns:
+        --------
+        str or None
+            Job id, or None if this version of the file was already queued or processed
+        """
+        path = Path(path).resolve()
+        job_id = self.job_id(path)
+        if self.state(job_id) is not None:
+            return None
+
+        _write_json(self._job_file('pending', job_id), {
+            'job_id': job_id,
+            'source': str(path),
+            'pdb_id': path.stem,
+            'submitted': time.time()
+        })
+        return job_id
+
+    def claim(self):
+        """
+        Move the oldest pending job to running
+
+        Returns:
+        --------
+        dict or None
+            The job, or None if no job is pending
+        """
+        pending = sorted(self.dirs['pending'].glob('*.json'), key=lambda p: (p.stat().st_mtime_ns, p.name))
+        for job_file in pending:
+            running_file = self.dirs['running'] / job_file.name
+            try:
+                os.replace(job_file, running_file)
+            except FileNotFoundError:
+                continue  # Claimed by another process
+            with open(running_file, 'r') as f:
+                job = json.load(f)
+            job['started'] = time.time()
+            return job
+        return None
+
+    def finish(self, job, error=None, **info):
+        """Record the outcome of a running job and move it to done or failed"""
+        state = 'failed' if error is not None else 'done'
+        job = {**job, **info, 'finished': time.time()}
+        if error is not None:
+            job['error'] = error
+        _write_json(self._job_file(state, job['job_id']), job)
+        self._job_file('running', job['job_id']).unlink(missing_ok=True)
+
+    def recover(self):
+        """Queue again the jobs left running by an interrupted watcher; returns their number"""
+        recovered = 0
+        for job_file in self.dirs['running'].glob('*.json'):
+            os.replace(job_file, self.dirs['pending'] / job_file.name)
+            recovered += 1
+        return recovered
+
+    def counts(self):
+        """Number of jobs in each state"""
+        return {state: len(list(directory.glob('*.json'))) for state, directory in self.dirs.items()}
+
+class FileWatcher:
+    """Polls a directory and reports structure files once they are complete"""
+
+    def __init__(self, watch_dir, stable_seconds=2.0):
+        """
+        Parameters:
+        -----------
+        watch_dir : str or Path
+            Directory to watch (not recursive)
+        stable_seconds : float
+            Time a file's size and modification time must stay unchanged
+            before it is considered complete (default: 2.0)
+        """
+        self.watch_dir = Path(watch_dir)
+        self.stable_seconds = stable_seconds
+        self._seen = {}
+        self._reported = {}
+
+    def is_candidate(self, path):
+        """Structure files only; hidden and partial files (e.g. 'x.pdb.part') are skipped"""
+        return path.suffix.lower() in PDB_EXTENSIONS and not path.name.startswith('.')
+
+    def poll(self):
+        """
+        Scan the directory once
+
+        Returns:
+        --------
+        list
+            Paths that became complete since the last poll
+        """
+        now = time.monotonic()
+        ready = []
+        present = set()
+
+        for path in self.watch_dir.iterdir():
+            if not self.is_candidate(path):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Removed or renamed during the scan
+            if not path.is_file():
+                continue
+
+            present.add(path)
+            version = (stat.st_size, stat.st_mtime_ns)
+            if self._reported.get(path) == version:
+                continue
+
+            seen_version, since = self._seen.get(path, (None, now))
+            if seen_version != version:
+                self._seen[path] = (version, now)
+                since = now
+            if stat.st_size > 0 and now - since >= self.stable_seconds:
+                ready.append(path)
+                self._reported[path] = version
+                del self._seen[path]
+
+        # Forget files that disappeared
+        for path in set(self._seen) - present:
+            del self._seen[path]
+        for path in set(self._reported) - present:
+            del self._reported[path]
+
+        return sorted(ready)
+
+    @property
+    def waiting(self):
+        """Number of files seen but not yet complete"""
+        return len(self._seen)
+
+def process_job(job, output_base_path, params=None, generate_pymol=False, generate_chimera=False,
+                output_options=None):
+    """
+    Predict binding sites for one spooled job (runs in a worker process)
+
+    Returns:
+    --------
+    dict
+        Number of sites, output files and stage timings
+    """
+    from ConSBind.api import predict
+
+    pdb_id = job['pdb_id']
+    output_prefix = Path(output_base_path) / pdb_id / pdb_id
+    result = predict(job['source'], params, output_prefix=output_prefix,
+                     generate_pymol=generate_pymol, generate_chimera=generate_chimera,
+                     output_options=output_options)
+    return {
+        'sites': len(result),
+        'output_files': {kind: str(path) for kind, path in result.output_files.items()},
+        'timings': result.timings
+    }
+
+def watch_directory(watch_dir, output_dir='results', params=None, workers=1, spool_dir=None,
+                    poll_interval=2.0, stable_seconds=2.0, generate_pymol=False,
+                    generate_chimera=False, once=False, output_options=None):
+    """
+    Watch a directory and predict binding sites for every new structure file
+
+    Parameters:
+    -----------
+    watch_dir : str or Path
+        Directory where structure files are dropped
+    output_dir : str or Path
+        Base output directory; results go to output_dir/<watch_dir name>/<pdb_id>/
+    params : PredictionParams, optional
+        Prediction parameters
+    workers : int
+        Maximum number of structures processed at once (default: 1)
+    spool_dir : str or Path, optional
+        Job spool directory (default: output_dir/<watch_dir name>/.spool)
+    poll_interval : float
+        Seconds between directory scans (default: 2.0)
+    stable_seconds : float
+        Seconds a file must stay unchanged before it is queued (default: 2.0)
+    generate_pymol, generate_chimera : bool
+        Also write visualization scripts
+    once : bool
+        Process the files present now, then return instead of watching forever
+    output_options : OutputOptions, optional
+        Which files to write and how
+
+    Returns:
+    --------
+    dict
+        Number of jobs in each spool state when the watcher stopped
+    """
+    watch_dir = Path(watch_dir)
+    if not watch_dir.is_dir():
+        raise ValueError(f"Invalid directory: {watch_dir}")
+
+    params = params or PredictionParams()
+    output_base_path = create_output_path(watch_dir, Path(output_dir))
+    spool = JobSpool(spool_dir or output_base_path / '.spool')
+    watcher = FileWatcher(watch_dir, stable_seconds=stable_seconds)
+
+    recovered = spool.recover()
+    if recovered:
+        logger.info(f"Re-queued {recovered} interrupted jobs")
+    logger.info(f"Watching {watch_dir} with {workers} workers, results in {output_base_path}")
+
+    in_flight = {}
+
+    def collect(done):
+        for future in done:
+            job = in_flight.pop(future)
+            try:
+                info = future.result()
+                spool.finish(job, **info)
+                logger.info(f"{job['pdb_id']}: {info['sites']} sites "
+                            f"({time.time() - job['submitted']:.1f} s after arrival)")
+            except Exception as e:
+                spool.finish(job, error=str(e))
+                logger.error(f"Error processing {job['pdb_id']}: {str(e)}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                for path in watcher.poll():
+                    job_id = spool.submit(path)
+                    if job_id is not None:
+                        logger.info(f"Queued {path.name}")
+
+                # Keep at most `workers` jobs in flight; the rest wait on disk
+                while len(in_flight) < workers:
+                    job = spool.claim()
+                    if job is None:
+                        break
+                    future = executor.submit(process_job, job, output_base_path, params,
+                                             generate_pymol, generate_chimera, output_options)
+                    in_flight[future] = job
+
+                if once and not in_flight and not watcher.waiting and spool.counts()['pending'] == 0:
+                    break
+
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    collect(done)
+                else:
+                    time.sleep(poll_interval)
+
+        except KeyboardInterrupt:
+            # Interrupted jobs stay in running/ and are queued again on the next start
+            logger.info(f"Stopping, {len(in_flight)} running jobs will be re-queued on the next start")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    counts = spool.counts()
+    logger.info(f"Spool: {counts['done']} done, {counts['failed']} failed, {counts['pending']} pending")
+    return counts
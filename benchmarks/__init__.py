@@ -0,0 +1 @@
+"""Benchmarking utilities for the ConSBind predictor."""
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import-Time Benchmark
+=====================
+Measures the start-up cost of the command line and the package with
+`python -X importtime` in a fresh interpreter, checks it against a time
+budget, and checks that heavy dependencies are not pulled in at import.
+Exits with status 1 when a budget is exceeded, so it can run in CI.
+
+Usage:
+    python -m benchmarks.importtime --repeats 5 --top 10
+"""
+
+import sys
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Module -> cumulative import time budget in seconds
+BUDGETS = {
+    'main': 0.4,
+    'ConSBind': 0.3,
+    'ConSBind.server': 0.4
+}
+
+# Dependencies that only the pipeline stages needing them should import
+LAZY_MODULES = ['Bio', 'scipy.stats', 'scipy.cluster', 'scipy.spatial', 'sklearn', 'tqdm']
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter and parse the -X importtime report
+
+    Parameters:
+    -----------
+    module : str
+        Module to import
+
+    Returns:
+    --------
+    dict
+        Imported module name -> (self seconds, cumulative seconds)
+    """
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr}")
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+def check_module(module, budget, repeats=3, top=10):
+    """
+    Measure the import time of a module and check it against its budget
+
+    Returns:
+    --------
+    dict
+        'module', 'seconds' (best of the repeats), 'budget', 'eager' (heavy
+        modules imported anyway), 'slowest' (top modules by self time) and 'ok'
+    """
+    runs = [import_times(module) for _ in range(repeats)]
+    best = min(runs, key=lambda times: times[module][1])
+    seconds = best[module][1]
+
+    eager = sorted(lazy for lazy in LAZY_MODULES
+                   if any(name == lazy or name.startswith(lazy + '.') for name in best))
+    slowest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:top]
+
+    return {
+        'module': module,
+        'seconds': seconds,
+        'budget': budget,
+        'eager': eager,
+        'slowest': [(name, self_time) for name, (self_time, _) in slowest],
+        'ok': seconds <= budget and not eager
+    }
+
+def main():
+    """Run the import-time benchmark"""
+    parser = argparse.ArgumentParser(description='Import-time benchmark with a start-up budget')
+    parser.add_argument('--modules', nargs='+', default=list(BUDGETS),
+                        help=f"Modules to import (default: {' '.join(BUDGETS)})")
+    parser.add_argument('--budget', type=float, default=None,
+                        help='Budget in seconds for every module (default: per-module budgets)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Fresh interpreters per module; the fastest is kept (default: 3)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of slowest imports to list (default: 10)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    failed = False
+    for module in args.modules:
+        budget = args.budget if args.budget is not None else BUDGETS.get(module, 0.5)
+        result = check_module(module, budget, repeats=args.repeats, top=args.top)
+
+        status = 'OK' if result['ok'] else 'FAIL'
+        logger.info(f"{status:<4s} import {module}: {result['seconds']:.3f} s (budget {budget:.3f} s)")
+        for name, self_time in result['slowest']:
+            logger.info(f"       {self_time * 1000:8.1f} ms  {name}")
+        if result['eager']:
+            logger.error(f"import {module} eagerly loads: {', '.join(result['eager'])}")
+        failed = failed or not result['ok']
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
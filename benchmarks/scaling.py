@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scaling Benchmark
+=================
+Measures wall time and peak memory of each pipeline stage against the
+number of atoms, using synthetic assemblies built from a bundled structure.
+
+Usage:
+    python -m benchmarks.scaling --sizes 2000 10000 50000 --output scaling.csv
+"""
+
+import os
+import csv
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+from pathlib import Path
+
+from benchmarks.synthetic import generate_assembly
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['parse', 'surface', 'cavities', 'energy', 'combine', 'scoring']
+
+DEFAULT_TEMPLATE = Path(__file__).resolve().parent.parent / 'data' / 'tutorial' / 'pdb1hsg.ent'
+
+
+def measure(func, *args, **kwargs):
+    """
+    Run a function and record its wall time (memory is not traced, so the
+    time is not inflated by tracemalloc)
+
+    Returns:
+    --------
+    tuple
+        (result, seconds)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def measure_memory(func, *args, **kwargs):
+    """
+    Run a function while tracing its peak memory (its wall time is not representative)
+
+    Returns:
+    --------
+    tuple
+        (result, peak_mb)
+    """
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 1e6
+
+def _stage_pass(pdb_file, stages, probe, probe_radius, grid_spacing, min_size):
+    """
+    Run the stages once on a freshly parsed structure, each through probe(func, ...)
+
+    Returns:
+    --------
+    list
+        (stage, measured value, count) for every stage run
+    """
+    from ConSBind.core.structure import ProteinStructure
+    from ConSBind.core.finder import ConsensusPocketFinder
+    from ConSBind.core.scoring import final_scoring
+
+    measured = []
+    finder = ConsensusPocketFinder()
+
+    protein, value = probe(ProteinStructure, str(pdb_file))
+    measured.append(('parse', value, sum(1 for _ in protein.model.get_atoms())))
+
+    cavities, energy_pockets, pockets = [], [], []
+    if 'surface' in stages:
+        surface, value = probe(protein.get_surface_atoms)
+        measured.append(('surface', value, len(surface)))
+    if 'cavities' in stages:
+        cavities, value = probe(protein.get_cavities, probe_radius=probe_radius, min_cavity_size=min_size)
+        measured.append(('cavities', value, len(cavities)))
+    if 'energy' in stages:
+        energy_pockets, value = probe(finder.find_pockets_energy, protein, grid_spacing=grid_spacing)
+        measured.append(('energy', value, len(energy_pockets)))
+    if 'combine' in stages:
+        pockets, value = probe(finder.combine_pockets, protein, cavities, energy_pockets)
+        measured.append(('combine', value, len(pockets)))
+    if 'scoring' in stages:
+        pockets, value = probe(final_scoring, pockets, 'unknown')
+        measured.append(('scoring', value, len(pockets)))
+    return measured
+
+def run_stages(pdb_file, stages=STAGES, probe_radius=1.4, grid_spacing=1.0, min_size=5):
+    """
+    Run the pipeline stages on one structure and time each of them
+
+    The stages run twice on separately parsed copies of the structure: once
+    untraced for the wall times, then under tracemalloc for the peak memory.
+    Both passes start from the same random state.
+
+    Parameters:
+    -----------
+    pdb_file : str or Path
+        Structure to process
+    stages : list
+        Stages to run; 'parse' always runs because the others depend on it
+
+    Returns:
+    --------
+    list
+        One dictionary per stage with 'stage', 'seconds', 'peak_mb' and 'count'
+    """
+    state = np.random.get_state()
+    timings = _stage_pass(pdb_file, stages, measure, probe_radius, grid_spacing, min_size)
+    np.random.set_state(state)
+    peaks = _stage_pass(pdb_file, stages, measure_memory, probe_radius, grid_spacing, min_size)
+
+    return [{'stage': stage, 'seconds': seconds, 'peak_mb': peak_mb, 'count': count}
+            for (stage, seconds, count), (_, peak_mb, _) in zip(timings, peaks)]
+
+def scaling_exponents(results):
+    """
+    Estimate the empirical complexity of each stage as the slope of
+    log(time) against log(atoms)
+
+    Returns:
+    --------
+    dict
+        Stage name -> fitted exponent (only stages measured at 2+ sizes)
+    """
+    exponents = {}
+    for stage in STAGES:
+        points = [(r['atoms'], r['seconds']) for r in results
+                  if r['stage'] == stage and r['seconds'] > 0]
+        if len(points) >= 2:
+            x, y = np.log(np.array(points, dtype=float)).T
+            exponents[stage] = float(np.polyfit(x, y, 1)[0])
+    return exponents
+
+def plot_results(results, plot_file):
+    """Plot time and peak memory per stage against atom count (requires matplotlib)"""
+    try:
+        import matplotlib # type: ignore
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt # type: ignore
+    except ImportError:
+        logger.warning("matplotlib is not installed, skipping plot")
+        return None
+
+    fig, (ax_time, ax_mem) = plt.subplots(1, 2, figsize=(12, 5))
+    for stage in STAGES:
+        rows = [r for r in results if r['stage'] == stage]
+        if not rows:
+            continue
+        atoms = [r['atoms'] for r in rows]
+        ax_time.loglog(atoms, [r['seconds'] for r in rows], marker='o', label=stage)
+        ax_mem.loglog(atoms, [r['peak_mb'] for r in rows], marker='o', label=stage)
+
+    ax_time.set_xlabel('Atoms'); ax_time.set_ylabel('Time (s)'); ax_time.legend()
+    ax_mem.set_xlabel('Atoms'); ax_mem.set_ylabel('Peak traced memory (MB)'); ax_mem.legend()
+    fig.tight_layout()
+    fig.savefig(plot_file, dpi=120)
+    plt.close(fig)
+    return plot_file
+
+def main():
+    """Run the scaling benchmark"""
+    parser = argparse.ArgumentParser(description='Scaling benchmark on synthetic assemblies')
+    parser.add_argument('--template', default=str(DEFAULT_TEMPLATE),
+                        help='Template structure to tile (default: data/tutorial/pdb1hsg.ent)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 5000, 10000, 20000],
+                        help='Target atom counts (default: 2000 5000 10000 20000)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help='Stages to measure (default: all)')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='Repetitions per size (default: 1)')
+    parser.add_argument('--workdir', default=None,
+                        help='Directory for generated structures (default: temporary directory)')
+    parser.add_argument('--output', default='scaling.csv',
+                        help='CSV file for the measurements (default: scaling.csv)')
+    parser.add_argument('--plot', default=None,
+                        help='Optional image file for a time/memory plot')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the rigid transformations (default: 0)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger('ConSBind').setLevel(logging.WARNING)
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='consbind_scaling_'))
+    template_name = Path(args.template).stem
+
+    results = []
+    for size in sorted(args.sizes):
+        pdb_file, n_atoms, n_copies = generate_assembly(
+            args.template, size, workdir / f"{template_name}_x{size}.pdb", seed=args.seed
+        )
+        for repeat in range(args.repeats):
+            for row in run_stages(pdb_file, stages=args.stages):
+                row.update({'atoms': n_atoms, 'copies': n_copies, 'repeat': repeat})
+                results.append(row)
+                logger.info(f"{n_atoms:>8d} atoms | {row['stage']:<9s} | {row['seconds']:9.3f} s | "
+                            f"{row['peak_mb']:9.1f} MB | count={row['count']}")
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['atoms', 'copies', 'repeat', 'stage', 'seconds', 'peak_mb', 'count'])
+        writer.writeheader()
+        writer.writerows(results)
+    logger.info(f"Measurements saved to {os.path.abspath(args.output)}")
+
+    for stage, exponent in scaling_exponents(results).items():
+        logger.info(f"Empirical complexity of {stage}: O(n^{exponent:.2f})")
+
+    if args.plot and plot_results(results, args.plot):
+        logger.info(f"Plot saved to {args.plot}")
+
+if __name__ == "__main__":
+    main()
@@ -33,23 +33,24 @@ Output Directory Structure:
  """
 
 import os
+import re
 import sys
+import json
 import logging
 import argparse
 from pathlib import Path
-from tqdm import tqdm
-from tqdm.contrib.logging import logging_redirect_tqdm
-from colorama import Fore, Style, init
+from colorama import Fore, Style
 
-from ConSBind.core.structure import ProteinStructure
-from ConSBind.core.finder import ConsensusPocketFinder
-from ConSBind.core.scoring import final_scoring
-from ConSBind.output.output import save_predictions, save_pymol, save_chimera
+from ConSBind.api import predict, PredictionParams, OutputOptions
+from ConSBind.sweep import run_sweep, summarize_sweep, save_sweep
+from ConSBind.watch import watch_directory
+from ConSBind.pipeline import run_pipeline
+from ConSBind.input.archive import pack_corpus, predict_archive, CorpusArchive
+from ConSBind.output.store import ResultsStore, STORE_FORMATS
+from ConSBind.output.progress import JsonProgress
+from ConSBind.output.writer import BackgroundWriter
 from ConSBind.input.file_handler import detect_input_type, find_pdb_files, create_output_path
 
-# Initialize colorama for cross-platform colored terminal output
-init(autoreset=True)
-
 # Configure logging
 class ColoredFormatter(logging.Formatter):
     COLORS = {
@@ -70,6 +71,13 @@ class ColoredFormatter(logging.Formatter):
                 record.msg = f"{Fore.RED}{record.msg}{Style.RESET_ALL}"
         return super().format(record)
 
+# Plain formatter for headless runs: no colours, also in messages that embed them
+class PlainFormatter(logging.Formatter):
+    ANSI_CODES = re.compile(r'\x1b\[[0-9;]*m')
+    
+    def format(self, record):
+        return self.ANSI_CODES.sub('', super().format(record))
+
 # Custom handler for tqdm compatibility
 class TqdmLoggingHandler(logging.StreamHandler):
     def __init__(self):
@@ -77,38 +85,77 @@ class TqdmLoggingHandler(logging.StreamHandler):
     
     def emit(self, record):
         try:
+            from tqdm import tqdm
             msg = self.format(record)
             tqdm.write(msg)
             self.flush()
         except Exception:
             self.handleError(record)
 
-# Configure tqdm to work with logging
-tqdm.set_lock(tqdm.get_lock())
-
-# Set up the logger
 logger = logging.getLogger('ConSBind')
-logger.setLevel(logging.INFO)
-logger.propagate = False  # Prevent propagation to root logger
 
-# Remove existing handlers
-for handler in logger.handlers:
-    logger.removeHandler(handler)
+def setup_logging(progress='bar'):
+    """
+    Set up logging (called by main, not at import)
+    
+    With progress='bar' log records are colored and tqdm-compatible; with
+    progress='json' they are plain text on stderr, so stdout only carries
+    the JSON progress events.
+    """
+    # Set up the logger
+    logger.setLevel(logging.INFO)
+    logger.propagate = False  # Prevent propagation to root logger
+    
+    # Remove existing handlers
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    
+    if progress == 'json':
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(PlainFormatter(fmt='%(asctime)s - %(levelname)s - %(message)s',
+                                            datefmt='%Y-%m-%d %H:%M:%S'))
+        logger.addHandler(handler)
+        return
+    
+    from tqdm import tqdm
+    from colorama import init
+    
+    # Initialize colorama for cross-platform colored terminal output
+    init(autoreset=True)
+    
+    # Configure tqdm to work with logging
+    tqdm.set_lock(tqdm.get_lock())
+    
+    # Create custom tqdm-compatible handler with colored formatter
+    tqdm_handler = TqdmLoggingHandler()
+    tqdm_handler.setLevel(logging.INFO)
+    formatter = ColoredFormatter(
+        fmt=f'{Fore.LIGHTBLACK_EX}%(asctime)s{Style.RESET_ALL} - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    tqdm_handler.setFormatter(formatter)
+    logger.addHandler(tqdm_handler)
+    
+    # Configure other loggers to prevent duplicate messages
+    logging.getLogger('tqdm').setLevel(logging.WARNING)  # Reduce tqdm log noise
 
-# Create custom tqdm-compatible handler with colored formatter
-tqdm_handler = TqdmLoggingHandler()
-tqdm_handler.setLevel(logging.INFO)
-formatter = ColoredFormatter(
-    fmt=f'{Fore.LIGHTBLACK_EX}%(asctime)s{Style.RESET_ALL} - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-tqdm_handler.setFormatter(formatter)
-logger.addHandler(tqdm_handler)
+def progress_bar(args, **kwargs):
+    """tqdm progress bar, disabled (nothing is rendered) with --progress json"""
+    from tqdm import tqdm
+    return tqdm(bar_format="{l_bar}{bar:30}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
+                position=0, leave=True, dynamic_ncols=True, file=sys.stdout,
+                disable=args.progress == 'json', **kwargs)
 
-# Configure other loggers to prevent duplicate messages
-logging.getLogger('tqdm').setLevel(logging.WARNING)  # Reduce tqdm log noise
+def output_selection(value):
+    """argparse type for --outputs"""
+    try:
+        OutputOptions.parse_outputs(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
 
-def process_single_pdb(pdb_file, output_path, args):
+def process_single_pdb(pdb_file, output_path, args, store=None, progress=None, writer=None):
     """
     Process a single PDB file for binding site prediction
     
@@ -120,12 +167,19 @@ def process_single_pdb(pdb_file, output_path, args):
         Path for output files
     args : argparse.Namespace
         Command line arguments
+    store : ResultsStore, optional
+        Consolidated results store the predicted sites are added to
+    progress : JsonProgress, optional
+        Receives the stage events as JSON lines instead of a progress bar
+    writer : BackgroundWriter, optional
+        Writes the output files in the background instead of before returning
     
     Returns:
     --------
     bool
         Success or failure
     """
+    
     try:
         pdb_basename = os.path.basename(pdb_file)
         
@@ -144,84 +198,69 @@ def process_single_pdb(pdb_file, output_path, args):
             "Finding geometric pockets",
             "Finding energy-based pockets",
             "Combining results",
-            "Scoring pockets",
-            "Saving predictions"
+            "Scoring pockets"
         ]
         
-        if args.generate_pymol:
-            steps.append("Generating PyMOL visualization")
+        if args.tile_size:
+            steps[1:3] = ["Searching tiles"]
         
-        if args.generate_chimera:
-            steps.append("Generating Chimera visualization")
+        output_options = OutputOptions.from_args(args)
+        output_steps = {
+            'table': "Saving predictions",
+            'pdb': "Writing predicted PDB",
+            'pymol': "Generating PyMOL visualization",
+            'chimera': "Generating Chimera visualization"
+        }
+        if writer is None:
+            steps.extend(output_steps[kind] for kind in output_options.kinds(args.generate_pymol, args.generate_chimera))
+        
+        # Stage names reported by the library API, mapped to progress descriptions
+        descriptions = {
+            'load': f"Loading {pdb_basename}",
+            'geometric': f"Finding geometric pockets in {pdb_basename}",
+            'energy': f"Finding energy-based pockets in {pdb_basename}",
+            'tiles': f"Searching tiles of {pdb_basename}",
+            'combine': f"Combining results for {pdb_basename}",
+            'scoring': f"Scoring pockets for {pdb_basename}",
+            'predictions': f"Saving predictions for {pdb_basename}",
+            'pdb': f"Writing predicted PDB for {pdb_basename}",
+            'pymol': f"Generating PyMOL script for {pdb_basename}",
+            'chimera': f"Generating Chimera script for {pdb_basename}"
+        }
         
         # Initialize progress bar with position=0 to keep it at the bottom
-        with tqdm(total=len(steps), desc=f"Processing {pdb_basename}", 
-                  bar_format="{l_bar}{bar:30}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
-                  position=0, leave=True, dynamic_ncols=True, 
-                  file=sys.stdout) as pbar:
+        with progress_bar(args, total=len(steps), desc=f"Processing {pdb_basename}") as pbar:
             
-                # Load protein structure
-                pbar.set_description(f"Loading {pdb_basename}")
-                protein = ProteinStructure(pdb_file)
-                pbar.update(1)
-                
-                # Create consensus pocket finder
-                pocket_finder = ConsensusPocketFinder()
-                
-                # Find pockets using geometric approach
-                pbar.set_description(f"Finding geometric pockets in {pdb_basename}")
-                geometric_pockets = pocket_finder.find_pockets_geometric(
-                    protein, 
-                    probe_radius=args.probe_radius,
-                    min_size=args.min_size
-                )
-                pbar.update(1)
-                
-                # Find pockets using energy-based approach
-                pbar.set_description(f"Finding energy-based pockets in {pdb_basename}")
-                energy_pockets = pocket_finder.find_pockets_energy(
-                    protein,
-                    grid_spacing=args.grid_spacing
-                )
-                pbar.update(1)
-                
-                # Combine results
-                pbar.set_description(f"Combining results for {pdb_basename}")
-                consensus_pockets = pocket_finder.combine_pockets(protein, geometric_pockets, energy_pockets)
-                pbar.update(1)
+                def update_progress(event):
+                    if event['status'] == 'start':
+                        pbar.set_description(descriptions[event['stage']])
+                    else:
+                        pbar.update(1)
                 
-                # Adjust scores based on protein function
-                pbar.set_description(f"Scoring pockets for {pdb_basename}")
-                consensus_pockets = final_scoring(consensus_pockets, args.protein_type)
-                
-                # Ensure every pocket has a final score for proper sorting 
-                for pocket in consensus_pockets:
-                    if 'final_score' not in pocket:
-                        pocket['final_score'] = pocket['consensus_score'] * 3.0 + pocket.get('score', 0) * 1.0
-                        
-                    # Ensure methods list exists
-                    if 'methods' not in pocket:
-                        pocket['methods'] = [pocket.get('method', 'unknown')]
-                pbar.update(1)
+                callback = progress.bind(pdb_basename) if progress is not None else update_progress
+                result = predict(pdb_file, PredictionParams.from_args(args),
+                                 output_prefix=output_prefix if writer is None else None,
+                                 generate_pymol=args.generate_pymol, generate_chimera=args.generate_chimera,
+                                 callback=callback, workers=args.workers, output_options=output_options)
+                consensus_pockets = result.pockets
                 
                 if not consensus_pockets:
                     logger.warning(f"No binding sites found for {pdb_basename}")
-                else:
-                    # Save predictions
-                    pbar.set_description(f"Saving predictions for {pdb_basename}")
-                    output_file, output_pdb = save_predictions(consensus_pockets, protein, output_prefix)
-                    pbar.update(1)
-                    
-                    # Generate visualization scripts
-                    if args.generate_pymol:
-                        pbar.set_description(f"Generating PyMOL script for {pdb_basename}")
-                        pymol_script = save_pymol(consensus_pockets, protein, output_prefix, output_pdb)
-                        pbar.update(1)
-                        
-                    if args.generate_chimera:
-                        pbar.set_description(f"Generating Chimera script for {pdb_basename}")
-                        chimera_script = save_chimera(consensus_pockets, protein, output_prefix, output_pdb)
-                        pbar.update(1)
+                
+                if store is not None:
+                    store.add(result)
+                
+                if writer is not None:
+                    # Report the structure once its files are written
+                    on_written = None
+                    if progress is not None:
+                        on_written = lambda result, errors: progress.file_done(
+                            pdb_basename, result, '; '.join(f"{kind}: {error}" for kind, error in errors) or None)
+                    writer.submit(result, output_prefix, generate_pymol=args.generate_pymol,
+                                  generate_chimera=args.generate_chimera, options=output_options,
+                                  callback=callback if progress is not None else None, on_done=on_written)
+                elif progress is not None:
+                    progress.file_done(pdb_basename, result)
         
         # Summary of results
         if consensus_pockets:
@@ -233,8 +272,69 @@ def process_single_pdb(pdb_file, output_path, args):
         
     except Exception as e:
         logger.error(f"Error processing {pdb_basename}: {str(e)}")
+        if progress is not None:
+            progress.file_done(pdb_basename, error=e)
         return False
 
+def run_archive(archive_path, base_output_dir, args, progress=None):
+    """Predict binding sites for every structure of a corpus archive"""
+    output_base_path = create_output_path(archive_path, base_output_dir)
+    n_structures = len(CorpusArchive(archive_path))
+    logger.info(f"Input archive: {Fore.CYAN}{archive_path.name}{Style.RESET_ALL} "
+                f"with {Fore.YELLOW}{n_structures}{Style.RESET_ALL} structures")
+    
+    store = None
+    if args.results_store != 'none':
+        store = ResultsStore(include_points=args.store_points, include_descriptors=args.store_descriptors)
+    
+    with progress_bar(args, total=n_structures, desc="Overall progress") as master_pbar:
+        def structure_done(pdb_id, result, error):
+            if progress is not None:
+                progress.file_done(pdb_id, result, error)
+            master_pbar.update(1)
+        
+        success_count = predict_archive(archive_path, output_base_path, PredictionParams.from_args(args),
+                                        n_workers=args.workers, generate_pymol=args.generate_pymol,
+                                        generate_chimera=args.generate_chimera, store=store,
+                                        on_done=structure_done, output_options=OutputOptions.from_args(args))
+    
+    if store is not None:
+        store_path = store.save(output_base_path / f"{archive_path.stem}_sites", args.results_store)
+        logger.info(f"Consolidated results saved to: {Fore.BLUE}{store_path}{Style.RESET_ALL}")
+    
+    logger.info(f"{Fore.GREEN}Successfully processed {Fore.YELLOW}{success_count}{Fore.GREEN} out of {Fore.YELLOW}{n_structures}{Fore.GREEN} structures{Style.RESET_ALL}")
+    logger.info(f"Results saved to: {Fore.BLUE}{output_base_path}{Style.RESET_ALL}")
+    if success_count == 0:
+        raise ValueError("Failed to process any structures")
+
+def run_parameter_sweep(input_type, input_path, base_output_dir, args):
+    """Run a parameter sweep over the input structures and save the result tables"""
+    with open(args.sweep, 'r') as f:
+        grid = json.load(f)
+    
+    known_sites = None
+    if args.known_sites:
+        with open(args.known_sites, 'r') as f:
+            known_sites = json.load(f)
+    
+    pdb_files = [input_path] if input_type == 'file' else find_pdb_files(input_path)
+    if not pdb_files:
+        raise ValueError(f"No PDB files found in directory: {input_path.name}")
+    
+    rows = run_sweep(pdb_files, grid, known_sites=known_sites, n_workers=args.workers)
+    summary = summarize_sweep(rows)
+    
+    output_base_path = create_output_path(input_path, base_output_dir)
+    save_sweep(rows, output_base_path / f"{input_path.stem}_sweep.csv")
+    save_sweep(summary, output_base_path / f"{input_path.stem}_sweep_summary.csv")
+    
+    for entry in summary:
+        if entry['pareto']:
+            params = ', '.join(f"{name}={entry[name]}" for name in PredictionParams._fields
+                               if entry[name] is not None)
+            logger.info(f"Pareto-optimal: {Fore.YELLOW}{params}{Style.RESET_ALL} "
+                        f"({entry['mean_runtime']:.1f} s per structure)")
+
 def main():
     """Main function for binding site prediction"""
     parser = argparse.ArgumentParser(
@@ -245,7 +345,7 @@ def main():
     )
     
     # Input argument - automatically detects file or directory
-    parser.add_argument('input_path', help='Input PDB file or directory containing PDB files')
+    parser.add_argument('input_path', help='Input PDB file, directory containing PDB files, or corpus archive')
     
     # Output options
     parser.add_argument('--output_dir', default='results', 
@@ -254,6 +354,35 @@ def main():
                         help='Generate PyMOL visualization script (default: False)')
     parser.add_argument('--generate_chimera', action='store_true', default=False,
                         help='Generate UCSF Chimera visualization script (default: False)')
+    parser.add_argument('--outputs', type=output_selection, default='table,pdb',
+                        help='Comma-separated output files to write: table, pdb, pymol, chimera '
+                             '(default: table,pdb; --generate_pymol/--generate_chimera add the scripts)')
+    parser.add_argument('--sidecar', action='store_true', default=False,
+                        help='Write the pdb output as a sidecar with only the binding site records '
+                             '(_sites.pdb) instead of a copy of the input structure (default: False)')
+    parser.add_argument('--gzip', action='store_true', default=False,
+                        help='Gzip-compress all text outputs (default: False)')
+    parser.add_argument('--results_store', choices=STORE_FORMATS + ['none'], default='npz',
+                        help='Format of the consolidated site table written for directory runs (default: npz)')
+    parser.add_argument('--store_points', action='store_true', default=False,
+                        help='Include the pocket points in the consolidated results store (default: False)')
+    parser.add_argument('--store_descriptors', action='store_true', default=False,
+                        help='Include the pocket descriptor columns (residue types, fractions, volume, '
+                             'hydrophobicity, catalytic patterns) in the consolidated results store (default: False)')
+    parser.add_argument('--progress', choices=['bar', 'json'], default='bar',
+                        help='Progress reporting: colored progress bars, or one JSON line per stage event on '
+                             'stdout with plain logs on stderr, for headless batch runs (default: bar)')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='For directory runs, parse up to N structures ahead and write outputs in the '
+                             'background while pockets are computed; 0 processes files one by one (default: 0)')
+    parser.add_argument('--write_workers', type=int, default=0,
+                        help='For directory runs, write output files in N background threads while the next '
+                             'structure is processed (default: 0, write before moving on)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes for sweep, watch, archive, packing and tiled runs (default: 1)')
+    parser.add_argument('--pack_archive', metavar='ARCHIVE', default=None,
+                        help='Pack the input structures into a memory-mapped corpus archive (.cbarc) and exit; '
+                             'pass the archive as input_path to process it without parsing')
     
     # Prediction parameters
     predict_group = parser.add_argument_group('Prediction Parameters')
@@ -261,6 +390,10 @@ def main():
                         help='Minimum pocket size (default: 5)')
     predict_group.add_argument('--probe_radius', type=float, default=1.4, 
                         help='Probe radius for cavity detection (default: 1.4)')
+    predict_group.add_argument('--cavity_search', choices=['uniform', 'adaptive', 'edt'], default='uniform',
+                        help='Cavity grid search: uniform random sample of the whole grid, adaptive '
+                             'coarse-to-fine search that only tests candidate regions, or edt distance '
+                             'transform of the whole grid (default: uniform)')
     predict_group.add_argument('--grid_spacing', type=float, default=1.0, 
                         help='Grid spacing for energy calculations (default: 1.0)')
     predict_group.add_argument('--consensus_threshold', type=float, default=1.5, 
@@ -270,7 +403,49 @@ def main():
                         default='unknown', 
                         help='Type of protein for specialized detection (default: unknown)')
     
+    # Region selection
+    region_group = parser.add_argument_group('Region Selection')
+    region_group.add_argument('--chains', default=None,
+                        help='Only search pockets on these chains, e.g. A or A,B')
+    region_group.add_argument('--around', metavar='RESID', default=None,
+                        help='Only search pockets around one residue or ligand, given as CHAIN:NUMBER (e.g. A:25)')
+    region_group.add_argument('--radius', type=float, default=8.0,
+                        help='Radius around --around and contact distance for --interface in Å (default: 8.0)')
+    region_group.add_argument('--interface', metavar='CHAINS', default=None,
+                        help='Only search pockets at the interface of two chain groups, e.g. A,B or H+L,A')
+    
+    # Tiling
+    tiling_group = parser.add_argument_group('Tiling')
+    tiling_group.add_argument('--tile_size', type=float, default=None,
+                        help='Search very large assemblies as independent cubic tiles of this edge in Å (e.g. 40), '
+                             'in parallel with --workers (default: off)')
+    tiling_group.add_argument('--tile_overlap', type=float, default=8.0,
+                        help='Distance by which each tile extends into its neighbours in Å (default: 8.0)')
+    
+    # Parameter sweep
+    sweep_group = parser.add_argument_group('Parameter Sweep')
+    sweep_group.add_argument('--sweep', metavar='GRID_JSON', default=None,
+                        help='Run every combination of a JSON parameter grid, e.g. {"probe_radius": [1.2, 1.4]}, '
+                             'and write one table instead of predictions; --workers runs structures in parallel, '
+                             'or the distinct search stages of each structure when there are fewer structures '
+                             'than workers')
+    sweep_group.add_argument('--known_sites', metavar='SITES_JSON', default=None,
+                        help='JSON mapping structure ids to known [chain, residue] pairs, for sweep accuracy columns')
+    
+    # Watch mode
+    watch_group = parser.add_argument_group('Watch Mode')
+    watch_group.add_argument('--watch', action='store_true', default=False,
+                        help='Watch the input directory and process new structure files as they arrive')
+    watch_group.add_argument('--poll_interval', type=float, default=2.0,
+                        help='Seconds between directory scans (default: 2.0)')
+    watch_group.add_argument('--stable_seconds', type=float, default=2.0,
+                        help='Seconds a file must stay unchanged before it is processed (default: 2.0)')
+    watch_group.add_argument('--once', action='store_true', default=False,
+                        help='Process the files present now and exit instead of watching forever')
+    
     args = parser.parse_args()
+    setup_logging(args.progress)
+    progress = JsonProgress() if args.progress == 'json' else None
     
     # Create the base results directory
     base_output_dir = Path(args.output_dir)
@@ -279,7 +454,29 @@ def main():
         # Automatically detect if input is a file or directory
         input_type, input_path = detect_input_type(args.input_path)
         
-        if input_type == 'file':
+        if args.pack_archive:
+            pdb_files = [input_path] if input_type == 'file' else find_pdb_files(input_path, convert=False)
+            if not pdb_files:
+                raise ValueError(f"No PDB files found in directory: {input_path.name}")
+            archive_path = pack_corpus(pdb_files, args.pack_archive, n_workers=args.workers)
+            logger.info(f"Corpus archive saved to: {Fore.BLUE}{archive_path}{Style.RESET_ALL}")
+        
+        elif input_type == 'archive':
+            run_archive(input_path, base_output_dir, args, progress)
+        
+        elif args.sweep:
+            run_parameter_sweep(input_type, input_path, base_output_dir, args)
+        
+        elif args.watch:
+            if input_type != 'directory':
+                raise ValueError(f"Watch mode needs a directory: {args.input_path}")
+            watch_directory(input_path, base_output_dir, PredictionParams.from_args(args),
+                            workers=args.workers, poll_interval=args.poll_interval,
+                            stable_seconds=args.stable_seconds, generate_pymol=args.generate_pymol,
+                            generate_chimera=args.generate_chimera, once=args.once,
+                            output_options=OutputOptions.from_args(args))
+        
+        elif input_type == 'file':
             # Process a single PDB file
             file_basename = input_path.name
             logger.info(f"Input: {Fore.CYAN}{file_basename}{Style.RESET_ALL}")
@@ -287,7 +484,7 @@ def main():
             # Create output directory structure
             output_path = create_output_path(input_path, base_output_dir)
             
-            success = process_single_pdb(str(input_path), output_path, args)
+            success = process_single_pdb(str(input_path), output_path, args, progress=progress)
             if not success:
                 sys.exit(1)
                 
@@ -299,8 +496,8 @@ def main():
             # Create output directory structure
             output_base_path = create_output_path(input_path, base_output_dir)
             
-            # Find all PDB files in the directory
-            pdb_files = find_pdb_files(input_path)
+            # Find all PDB files in the directory (.ent files are converted by the prefetch stage)
+            pdb_files = find_pdb_files(input_path, convert=args.prefetch == 0)
             
             if not pdb_files:
                 logger.error(f"No PDB files found in directory: {dir_basename}")
@@ -309,25 +506,60 @@ def main():
             # Display summary of files to be processed
             logger.info(f"Found {Fore.YELLOW}{len(pdb_files)}{Style.RESET_ALL} PDB files to process")
             
+            # Collect all sites of the run in one consolidated results store
+            store = None
+            if args.results_store != 'none':
+                store = ResultsStore(include_points=args.store_points, include_descriptors=args.store_descriptors)
+            
             # Process each PDB file with a master progress bar
             success_count = 0
-            # Process each PDB file with a master progress bar
-            success_count = 0
-            with tqdm(total=len(pdb_files), desc=f"Overall progress", 
-                     bar_format="{l_bar}{bar:30}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
-                     position=0, leave=True, dynamic_ncols=True,
-                     file=sys.stdout) as master_pbar:
+            with progress_bar(args, total=len(pdb_files), desc=f"Overall progress") as master_pbar:
                 
-                    for pdb_file in pdb_files:
-                        # Create output directory structure for each PDB file
-                        pdb_output_path = output_base_path / pdb_file.stem
+                    if args.prefetch > 0:
+                        # Overlap parsing and file writes with pocket detection
+                        def file_done(pdb_file, result, error):
+                            if result is not None:
+                                logger.info(f"Found {Fore.YELLOW}{len(result)}{Style.RESET_ALL} binding sites in "
+                                            f"{Fore.CYAN}{Path(pdb_file).name}{Style.RESET_ALL}")
+                            if progress is not None:
+                                progress.file_done(Path(pdb_file).name, result, error)
+                            master_pbar.update(1)
                         
-                        # Process the file
-                        if process_single_pdb(str(pdb_file), pdb_output_path, args):
-                            success_count += 1
+                        success_count = run_pipeline(pdb_files, output_base_path, PredictionParams.from_args(args),
+                                                     prefetch=args.prefetch, generate_pymol=args.generate_pymol,
+                                                     generate_chimera=args.generate_chimera, store=store,
+                                                     on_done=file_done, callback=progress,
+                                                     output_options=OutputOptions.from_args(args))
+                    else:
+                        # Write output files in background threads while the next file is processed
+                        writer = BackgroundWriter(args.write_workers) if args.write_workers > 0 else None
+                        try:
+                            for pdb_file in pdb_files:
+                                # Create output directory structure for each PDB file
+                                pdb_output_path = output_base_path / pdb_file.stem
+                                
+                                # Process the file
+                                if process_single_pdb(str(pdb_file), pdb_output_path, args, store, progress, writer):
+                                    success_count += 1
+                                
+                                # Update the master progress bar
+                                master_pbar.update(1)
+                        finally:
+                            if writer is not None:
+                                writer.close()
                         
-                        # Update the master progress bar
-                        master_pbar.update(1)
+                        # Structures whose files could not all be written did not succeed
+                        if writer is not None and writer.failures:
+                            failed = {}
+                            for pdb_id, kind, error in writer.failures:
+                                failed.setdefault(pdb_id, []).append(f"{kind}: {error}")
+                            for pdb_id, errors in failed.items():
+                                logger.error(f"Output files of {pdb_id} could not be written ({'; '.join(errors)})")
+                            success_count -= len(failed)
+            
+            if store is not None:
+                store_path = store.save(output_base_path / f"{dir_basename}_sites", args.results_store)
+                logger.info(f"Consolidated results saved to: {Fore.BLUE}{store_path}{Style.RESET_ALL}")
             
             # Final summary
             logger.info(f"{Fore.GREEN}Successfully processed {Fore.YELLOW}{success_count}{Fore.GREEN} out of {Fore.YELLOW}{len(pdb_files)}{Fore.GREEN} PDB files{Style.RESET_ALL}")